@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
 import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -38,6 +39,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'drf_spectacular',
@@ -48,6 +50,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.metrics.MetricsMiddleware',
+    'core.middleware.QueryStatsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -133,6 +137,69 @@ MEDIA_URL = '/static/media/'
 MEDIA_ROOT = '/vol/web/media'
 STATIC_ROOT = '/vol/web/static'
 
+# Background processing of uploaded vehicle images, see vehicle.images.
+# Images larger than MAX_DIMENSION pixels on either side are scaled down.
+
+VEHICLE_IMAGE_PROCESSING = {
+    'ASYNC': True,
+    'MAX_WORKERS': int(os.environ.get('IMAGE_WORKERS', 2)),
+    'MAX_PENDING': int(os.environ.get('IMAGE_MAX_PENDING', 32)),
+    'MAX_DIMENSION': 2048,
+    'THUMBNAIL_SIZE': 320,
+    'JPEG_QUALITY': 85,
+}
+
+# Store vehicle images under the SHA-256 of their content so identical
+# uploads share one reference counted file, see core.storage.
+
+VEHICLE_IMAGE_CONTENT_ADDRESSED = bool(
+    int(os.environ.get('IMAGE_CONTENT_ADDRESSED', 0)))
+
+# Uploads are streamed to temporary files and aborted once they exceed
+# VEHICLE_IMAGE_UPLOAD['MAX_SIZE'] bytes, see vehicle.uploads.
+
+FILE_UPLOAD_HANDLERS = [
+    'vehicle.uploads.LimitedUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+VEHICLE_IMAGE_UPLOAD = {
+    'MAX_SIZE': int(os.environ.get('IMAGE_MAX_UPLOAD_SIZE', 25 * 1024 * 1024)),
+    'MAX_PIXELS': 40_000_000,
+    'FORMATS': ['JPEG', 'PNG', 'WEBP'],
+}
+
+# Tag and part name autocomplete, see vehicle.autocomplete. Results are
+# cached per process for at most MAX_USERS users.
+
+VEHICLE_AUTOCOMPLETE = {
+    'LIMIT': 10,
+    'MAX_LIMIT': 50,
+    'MAX_USERS': int(os.environ.get('AUTOCOMPLETE_CACHE_USERS', 256)),
+    'MAX_ENTRIES_PER_USER': 64,
+}
+
+# Count and time the queries of every request, see core.middleware.
+# HEADERS adds X-DB-Queries and Server-Timing to responses, by default
+# only with DEBUG.
+
+QUERY_STATS = {
+    'HEADERS': bool(int(os.environ.get('QUERY_STATS_HEADERS', DEBUG))),
+}
+
+# Prometheus metrics served at /metrics. With several worker processes
+# set METRICS_DIR to a directory they share, each writes its metrics
+# there at most every FLUSH_INTERVAL seconds. Only the comma separated
+# addresses and networks of METRICS_ALLOWED_IPS and staff users may read
+# them.
+
+METRICS = {
+    'DIR': os.environ.get('METRICS_DIR'),
+    'FLUSH_INTERVAL': 1.0,
+    'ALLOWED_IPS': os.environ.get(
+        'METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(','),
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -140,8 +207,68 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'core.User'
 
+# JSON is encoded and decoded with orjson when it is installed, see
+# core.renderers.
+
 REST_FRAMEWORK = {
-    'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema'
+    'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+
+# Caches
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+# The local memory backend is private to each process, so each worker
+# keeps its own cached responses. The user versions that invalidate them
+# live in the versions cache, which every worker must share: the default
+# file based cache is shared by the workers of one host, deployments on
+# several hosts should point RESPONSE_VERSION_CACHE_BACKEND and LOCATION
+# at a backend they all reach, such as memcached.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        'BACKEND': os.environ.get(
+            'RESPONSE_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': os.environ.get('RESPONSE_CACHE_LOCATION', 'responses'),
+        'TIMEOUT': int(os.environ.get('RESPONSE_CACHE_TIMEOUT', 300)),
+    },
+    'versions': {
+        'BACKEND': os.environ.get(
+            'RESPONSE_VERSION_CACHE_BACKEND',
+            'django.core.cache.backends.filebased.FileBasedCache',
+        ),
+        'LOCATION': os.environ.get(
+            'RESPONSE_VERSION_CACHE_LOCATION',
+            os.path.join(tempfile.gettempdir(), 'vehicle-api-versions'),
+        ),
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+}
+
+# Cache aliases of the per-user vehicle API response cache and of the
+# user versions keying it, see vehicle.cache.
+VEHICLE_RESPONSE_CACHE = 'responses'
+VEHICLE_RESPONSE_VERSION_CACHE = 'versions'
+
+# Cached token authentication, see user.authentication.
+# SHARED_CACHE names an entry of CACHES used as a cross-process tier.
+TOKEN_AUTH_CACHE = {
+    'MAX_ENTRIES': int(os.environ.get('TOKEN_AUTH_CACHE_MAX_ENTRIES', 1024)),
+    'TTL': int(os.environ.get('TOKEN_AUTH_CACHE_TTL', 60)),
+    'SHARED_CACHE': os.environ.get('TOKEN_AUTH_SHARED_CACHE'),
 }
 
 SPECTACULAR_SETTINGS = {
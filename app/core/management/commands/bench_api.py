@@ -0,0 +1,594 @@
+"""
+Django command to benchmark the API routes with seeded data.
+"""
+import io
+import json
+import math
+import queue
+import random
+import threading
+import time
+import uuid
+
+from PIL import Image
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+)
+from django.db import connection
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import (
+    FleetTotal,
+    User,
+    Vehicle,
+    Tag,
+    Part,
+)
+from user import urls as user_urls
+from vehicle import urls as vehicle_urls
+from vehicle.cache import invalidate_user
+from vehicle.images import get_processor
+
+
+PASSWORD = 'bench-password-123'
+
+# Response cache alias used unless --response-cache is given.
+UNCACHED = 'bench-uncached'
+
+MAKES = ('Mazda', 'BMW', 'Honda', 'Ford', 'Fiat', 'Volvo', 'Ducati', 'Audi')
+
+# Route name, HTTP method and the Command method preparing the request.
+SCENARIOS = (
+    ('vehicle:api-root', 'get', 'api_root'),
+    ('vehicle:vehicle-list', 'get', 'vehicle_list'),
+    ('vehicle:vehicle-list', 'post', 'vehicle_create'),
+    ('vehicle:vehicle-detail', 'get', 'vehicle_detail'),
+    ('vehicle:vehicle-detail', 'patch', 'vehicle_update'),
+    ('vehicle:vehicle-detail', 'delete', 'vehicle_delete'),
+    ('vehicle:vehicle-bulk', 'post', 'vehicle_bulk_create'),
+    ('vehicle:vehicle-bulk', 'patch', 'vehicle_bulk_update'),
+    ('vehicle:vehicle-bulk', 'delete', 'vehicle_bulk_delete'),
+    ('vehicle:vehicle-export', 'get', 'vehicle_export'),
+    ('vehicle:vehicle-summary', 'get', 'vehicle_summary'),
+    ('vehicle:vehicle-upload-image', 'post', 'vehicle_upload_image'),
+    ('vehicle:tag-list', 'get', 'tag_list'),
+    ('vehicle:tag-detail', 'patch', 'tag_update'),
+    ('vehicle:tag-detail', 'delete', 'tag_delete'),
+    ('vehicle:tag-autocomplete', 'get', 'tag_autocomplete'),
+    ('vehicle:part-list', 'get', 'part_list'),
+    ('vehicle:part-detail', 'patch', 'part_update'),
+    ('vehicle:part-detail', 'delete', 'part_delete'),
+    ('vehicle:part-autocomplete', 'get', 'part_autocomplete'),
+    ('user:create', 'post', 'user_create'),
+    ('user:token', 'post', 'user_token'),
+    ('user:me', 'get', 'user_me'),
+    ('user:me', 'patch', 'user_update'),
+)
+
+
+def route_names():
+    """Return the names of every route of the vehicle and user URLs."""
+    names = {
+        f'vehicle:{pattern.name}' for pattern in vehicle_urls.router.urls
+    }
+    names.update(f'user:{pattern.name}' for pattern in user_urls.urlpatterns)
+
+    return names
+
+
+def percentile(values, pct):
+    """Return the nearest rank percentile of sorted values."""
+    return values[max(0, math.ceil(pct / 100 * len(values)) - 1)]
+
+
+class Command(BaseCommand):
+    """Django command to measure latency and queries of every API route."""
+    help = (
+        'Seed users, vehicles, tags and parts, request every vehicle and '
+        'user API route at the given concurrency levels and report '
+        'latency percentiles, queries per request and throughput as JSON. '
+        'Writes to the configured default database: bench-* users and '
+        'their data are created and deleted again, so --allow-writes is '
+        'required. The response and autocomplete caches are disabled '
+        'unless --response-cache is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2)
+        parser.add_argument(
+            '--vehicles', type=int, default=500, help='Vehicles per user.')
+        parser.add_argument(
+            '--tags', type=int, default=20, help='Tags per user.')
+        parser.add_argument(
+            '--parts', type=int, default=50, help='Parts per user.')
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=50,
+            help='Requests per route and concurrency level.',
+        )
+        parser.add_argument(
+            '--concurrency',
+            default='1,4',
+            help='Comma separated numbers of concurrent clients.',
+        )
+        parser.add_argument(
+            '--route',
+            action='append',
+            default=[],
+            help='Only benchmark routes whose name contains this text.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--allow-writes',
+            action='store_true',
+            help='Confirm bench-* users may be written to the database.',
+        )
+        parser.add_argument(
+            '--response-cache',
+            action='store_true',
+            help='Keep the response and autocomplete caches enabled.',
+        )
+        parser.add_argument('--output', help='Write the report to a file.')
+
+    def seed_account(self, index, options):
+        """Create a user with tags, parts and linked vehicles."""
+        user = User.objects.create_user(
+            email=f'bench-{self.run_id}-{index}@example.com',
+            password=PASSWORD,
+            name=f'Bench {index}',
+        )
+        token = Token.objects.create(user=user)
+
+        Tag.objects.bulk_create([
+            Tag(user=user, name=f'tag {number}')
+            for number in range(options['tags'])
+        ])
+        Part.objects.bulk_create([
+            Part(
+                user=user,
+                name=f'part {number}',
+                price=self.random.randint(10, 5000),
+            )
+            for number in range(options['parts'])
+        ])
+        Vehicle.objects.bulk_create([
+            Vehicle(
+                user=user,
+                title=f'{self.random.choice(MAKES)} {number}',
+                description=f'Bench vehicle {number} of user {index}.',
+                year=self.random.randint(1950, 2024),
+                price=self.random.randint(500, 100000),
+            )
+            for number in range(options['vehicles'])
+        ], batch_size=1000)
+
+        account = {
+            'user': user,
+            'token': token.key,
+            'vehicle_ids': list(Vehicle.objects.filter(
+                user=user).values_list('id', flat=True)),
+            'tag_ids': list(Tag.objects.filter(
+                user=user).values_list('id', flat=True)),
+            'part_ids': list(Part.objects.filter(
+                user=user).values_list('id', flat=True)),
+        }
+
+        TagLink = Vehicle.tags.through
+        PartLink = Vehicle.parts.through
+        TagLink.objects.bulk_create([
+            TagLink(vehicle_id=vehicle_id, tag_id=tag_id)
+            for vehicle_id in account['vehicle_ids']
+            for tag_id in self.sample(account['tag_ids'], 3)
+        ], batch_size=5000)
+        PartLink.objects.bulk_create([
+            PartLink(vehicle_id=vehicle_id, part_id=part_id)
+            for vehicle_id in account['vehicle_ids']
+            for part_id in self.sample(account['part_ids'], 5)
+        ], batch_size=5000)
+        Vehicle.objects.filter(user=user).recompute_total_cost()
+        FleetTotal.objects.recompute(user.id)
+        invalidate_user(user.id)
+
+        return account
+
+    def sample(self, ids, count):
+        return self.random.sample(ids, min(count, len(ids)))
+
+    def unique(self, prefix):
+        return f'{prefix} {uuid.uuid4().hex[:12]}'
+
+    def vehicle_payload(self, account):
+        return {
+            'title': self.unique(self.random.choice(MAKES)),
+            'year': self.random.randint(1950, 2024),
+            'price': self.random.randint(500, 100000),
+            'tags': [{'name': f'tag {self.random.randrange(5)}'}],
+            'parts': [{
+                'name': f'part {self.random.randrange(5)}',
+                'price': self.random.randint(10, 5000),
+            }],
+        }
+
+    def new_vehicle(self, account):
+        return Vehicle.objects.create(
+            user=account['user'], title='Bench', year=2000, price=1000).id
+
+    def new_item(self, model, account):
+        fields = {'price': 10} if model is Part else {}
+        return model.objects.create(
+            user=account['user'], name=self.unique('bench'), **fields).id
+
+    def vehicle_url(self, name, vehicle_id):
+        return reverse(f'vehicle:vehicle-{name}', args=[vehicle_id])
+
+    def prepare_api_root(self, account):
+        return {'path': reverse('vehicle:api-root')}
+
+    def prepare_vehicle_list(self, account):
+        params = self.random.choice([
+            {},
+            {'tags': self.random.choice(account['tag_ids'] or [0])},
+            {'search': self.random.choice(MAKES), 'facets': 1},
+            {'year_min': 1980, 'ordering': '-total_cost'},
+        ])
+        return {'path': reverse('vehicle:vehicle-list'), 'data': params}
+
+    def prepare_vehicle_create(self, account):
+        return {
+            'path': reverse('vehicle:vehicle-list'),
+            'data': self.vehicle_payload(account),
+        }
+
+    def prepare_vehicle_detail(self, account):
+        vehicle_id = self.random.choice(account['vehicle_ids'])
+        return {'path': self.vehicle_url('detail', vehicle_id)}
+
+    def prepare_vehicle_update(self, account):
+        vehicle_id = self.random.choice(account['vehicle_ids'])
+        return {
+            'path': self.vehicle_url('detail', vehicle_id),
+            'data': {'price': self.random.randint(500, 100000)},
+        }
+
+    def prepare_vehicle_delete(self, account):
+        vehicle_id = self.new_vehicle(account)
+        return {'path': self.vehicle_url('detail', vehicle_id)}
+
+    def prepare_vehicle_bulk_create(self, account):
+        return {
+            'path': reverse('vehicle:vehicle-bulk'),
+            'data': [self.vehicle_payload(account) for _ in range(10)],
+        }
+
+    def prepare_vehicle_bulk_update(self, account):
+        return {
+            'path': reverse('vehicle:vehicle-bulk'),
+            'data': [
+                {'id': vehicle_id, 'price': self.random.randint(500, 100000)}
+                for vehicle_id in self.sample(account['vehicle_ids'], 10)
+            ],
+        }
+
+    def prepare_vehicle_bulk_delete(self, account):
+        return {
+            'path': reverse('vehicle:vehicle-bulk'),
+            'data': [self.new_vehicle(account) for _ in range(10)],
+        }
+
+    def prepare_vehicle_export(self, account):
+        return {
+            'path': reverse('vehicle:vehicle-export'),
+            'data': {'output': self.random.choice(['ndjson', 'csv'])},
+        }
+
+    def prepare_vehicle_summary(self, account):
+        return {'path': reverse('vehicle:vehicle-summary')}
+
+    def prepare_vehicle_upload_image(self, account):
+        vehicle_id = self.new_vehicle(account)
+        return {
+            'path': self.vehicle_url('upload-image', vehicle_id),
+            'data': {'image': SimpleUploadedFile(
+                'bench.png', self.image, content_type='image/png')},
+            'format': 'multipart',
+        }
+
+    def prepare_tag_list(self, account):
+        return {
+            'path': reverse('vehicle:tag-list'),
+            'data': {'assigned_only': 1, 'vehicle_count': 1},
+        }
+
+    def prepare_tag_update(self, account):
+        return {
+            'path': reverse(
+                'vehicle:tag-detail', args=[self.new_item(Tag, account)]),
+            'data': {'name': self.unique('tag')},
+        }
+
+    def prepare_tag_delete(self, account):
+        return {'path': reverse(
+            'vehicle:tag-detail', args=[self.new_item(Tag, account)])}
+
+    def prepare_tag_autocomplete(self, account):
+        return {
+            'path': reverse('vehicle:tag-autocomplete'),
+            'data': {'q': f'tag {self.random.randrange(10)}'},
+        }
+
+    def prepare_part_list(self, account):
+        return {'path': reverse('vehicle:part-list')}
+
+    def prepare_part_update(self, account):
+        return {
+            'path': reverse(
+                'vehicle:part-detail', args=[self.new_item(Part, account)]),
+            'data': {'price': self.random.randint(10, 5000)},
+        }
+
+    def prepare_part_delete(self, account):
+        return {'path': reverse(
+            'vehicle:part-detail', args=[self.new_item(Part, account)])}
+
+    def prepare_part_autocomplete(self, account):
+        return {
+            'path': reverse('vehicle:part-autocomplete'),
+            'data': {'q': f'part {self.random.randrange(10)}', 'similar': 1},
+        }
+
+    def prepare_user_create(self, account):
+        return {
+            'path': reverse('user:create'),
+            'data': {
+                'email': f'bench-{self.run_id}-{uuid.uuid4().hex}'
+                         '@example.com',
+                'password': PASSWORD,
+                'name': 'Bench',
+            },
+            'auth': False,
+        }
+
+    def prepare_user_token(self, account):
+        return {
+            'path': reverse('user:token'),
+            'data': {'email': account['user'].email, 'password': PASSWORD},
+            'auth': False,
+        }
+
+    def prepare_user_me(self, account):
+        return {'path': reverse('user:me')}
+
+    def prepare_user_update(self, account):
+        return {
+            'path': reverse('user:me'),
+            'data': {'name': self.unique('Bench')},
+        }
+
+    def send(self, client, method, spec):
+        """Send one prepared request.
+
+        Returns its status, time, number of queries and X-Cache header.
+        """
+        queries = []
+
+        def count(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        extra = {}
+        if spec.get('auth', True):
+            extra['HTTP_AUTHORIZATION'] = f'Token {spec["token"]}'
+        if method != 'get':
+            extra['format'] = spec.get('format', 'json')
+
+        with connection.execute_wrapper(count):
+            started = time.perf_counter()
+            response = getattr(client, method)(
+                spec['path'], spec.get('data'), **extra)
+            if response.streaming:
+                for _ in response.streaming_content:
+                    pass
+            elapsed = time.perf_counter() - started
+
+        return (
+            response.status_code,
+            elapsed,
+            len(queries),
+            response.get('X-Cache'),
+        )
+
+    def run_level(self, method, specs, concurrency):
+        """Send specs from concurrency clients and return the samples.
+
+        A single client runs in this thread, more run in their own threads
+        with their own database connections.
+        """
+        samples = []
+        pending = queue.Queue()
+        for spec in specs:
+            pending.put(spec)
+
+        def worker():
+            client = APIClient(raise_request_exception=False)
+            try:
+                while True:
+                    try:
+                        spec = pending.get_nowait()
+                    except queue.Empty:
+                        return
+                    samples.append(self.send(client, method, spec))
+            finally:
+                if threading.current_thread() is not self.main_thread:
+                    connection.close()
+
+        started = time.perf_counter()
+        if concurrency == 1:
+            worker()
+        else:
+            threads = [
+                threading.Thread(target=worker) for _ in range(concurrency)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        return samples, time.perf_counter() - started
+
+    def report(self, route, method, concurrency, samples, elapsed):
+        """Return the statistics of one route and concurrency level."""
+        latencies = sorted(seconds * 1000 for _, seconds, _, _ in samples)
+        queries = [count for _, _, count, _ in samples]
+        statuses = {}
+        cache = {}
+        for status_code, _, _, cache_status in samples:
+            statuses[str(status_code)] = statuses.get(str(status_code), 0) + 1
+            if cache_status:
+                cache[cache_status] = cache.get(cache_status, 0) + 1
+
+        return {
+            'route': route,
+            'method': method.upper(),
+            'concurrency': concurrency,
+            'requests': len(samples),
+            'errors': sum(
+                1 for status_code, _, _, _ in samples if status_code >= 400),
+            'status': statuses,
+            'cache': cache,
+            'p50_ms': round(percentile(latencies, 50), 3),
+            'p95_ms': round(percentile(latencies, 95), 3),
+            'p99_ms': round(percentile(latencies, 99), 3),
+            'queries_mean': round(sum(queries) / len(queries), 2),
+            'queries_max': max(queries),
+            'throughput_rps': round(len(samples) / elapsed, 2),
+        }
+
+    def cleanup(self):
+        """Delete every user created by this run with their data."""
+        deadline = time.monotonic() + 30
+        while get_processor().queue_depth and time.monotonic() < deadline:
+            time.sleep(0.05)
+        User.objects.filter(
+            email__startswith=f'bench-{self.run_id}-').delete()
+
+    def cache_settings(self, options):
+        """Return settings disabling the caches unless kept by options.
+
+        Repeated reads would otherwise measure cache hits instead of the
+        queries and serialization behind them.
+        """
+        if options['response_cache']:
+            return {}
+
+        return {
+            'CACHES': {
+                **settings.CACHES,
+                UNCACHED: {
+                    'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+                },
+            },
+            'VEHICLE_RESPONSE_CACHE': UNCACHED,
+            'VEHICLE_AUTOCOMPLETE': {
+                **settings.VEHICLE_AUTOCOMPLETE, 'MAX_USERS': 0},
+        }
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        if not options['allow_writes']:
+            raise CommandError(
+                f'bench_api creates and deletes users in the '
+                f'{connection.settings_dict["NAME"]!r} database, pass '
+                f'--allow-writes to run it.')
+        try:
+            levels = [
+                int(level) for level in options['concurrency'].split(',')
+            ]
+        except ValueError:
+            levels = []
+        if not levels or min(levels) < 1:
+            raise CommandError(
+                '--concurrency must list positive numbers, such as 1,4,16.')
+        for name in ('users', 'vehicles', 'requests'):
+            if options[name] < 1:
+                raise CommandError(f'--{name} must be positive.')
+
+        missing = route_names() - {route for route, _, _ in SCENARIOS}
+        if missing:
+            self.stderr.write(
+                f'No scenario for routes: {", ".join(sorted(missing))}')
+        scenarios = [
+            scenario for scenario in SCENARIOS
+            if not options['route'] or any(
+                text in scenario[0] for text in options['route'])
+        ]
+
+        self.run_id = uuid.uuid4().hex[:8]
+        self.random = random.Random(options['seed'])
+        self.main_thread = threading.current_thread()
+        buffer = io.BytesIO()
+        Image.new('RGB', (64, 64), (200, 40, 40)).save(buffer, 'PNG')
+        self.image = buffer.getvalue()
+
+        results = []
+        started = time.perf_counter()
+        try:
+            accounts = [
+                self.seed_account(index, options)
+                for index in range(options['users'])
+            ]
+            seed_seconds = time.perf_counter() - started
+
+            with override_settings(
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                **self.cache_settings(options),
+            ):
+                for route, method, prepare in scenarios:
+                    for concurrency in levels:
+                        specs = []
+                        for number in range(options['requests']):
+                            account = accounts[number % len(accounts)]
+                            spec = getattr(self, f'prepare_{prepare}')(
+                                account)
+                            spec['token'] = account['token']
+                            specs.append(spec)
+
+                        samples, elapsed = self.run_level(
+                            method, specs, concurrency)
+                        results.append(self.report(
+                            route, method, concurrency, samples, elapsed))
+                        if options['verbosity'] > 1:
+                            self.stderr.write(
+                                f'{method.upper()} {route} x{concurrency}: '
+                                f'p50 {results[-1]["p50_ms"]} ms')
+        finally:
+            self.cleanup()
+
+        report = json.dumps({
+            'database': connection.vendor,
+            'seed': {
+                'users': options['users'],
+                'vehicles': options['vehicles'],
+                'tags': options['tags'],
+                'parts': options['parts'],
+                'seconds': round(seed_seconds, 3),
+            },
+            'requests': options['requests'],
+            'concurrency': levels,
+            'response_cache': options['response_cache'],
+            'results': results,
+        }, indent=2)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(report + '\n')
+        else:
+            self.stdout.write(report)
@@ -0,0 +1,195 @@
+"""
+Django command to benchmark the JSON renderer and parser.
+"""
+import io
+import json
+import random
+import statistics
+import time
+
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+)
+
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core.management.commands.bench_api import MAKES
+from core.parsers import FastJSONParser
+from core.renderers import (
+    FastJSONRenderer,
+    orjson,
+)
+
+
+MODELS = ('MX-5', 'E30', 'Civic', 'Mustang', '126p', '240', 'Monster', 'TT')
+
+WORDS = (
+    'garaged', 'restored', 'original', 'paint', 'rust', 'new', 'engine',
+    'service', 'history', 'owner', 'zadbany', 'właściciel', 'Ölwechsel',
+)
+
+
+class Command(BaseCommand):
+    """Django command to compare the stdlib and fast JSON classes."""
+    help = (
+        'Render and parse payloads shaped like the vehicle API responses '
+        'with the DRF JSON renderer and parser and with their fast '
+        'variants, and report timings and speedups as JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--vehicles',
+            type=int,
+            default=1000,
+            help='Vehicles per list page, 1000 is the largest page.',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=50,
+            help='Timed runs per payload and implementation.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write the report to a file.')
+
+    def vehicle(self, vehicle_id, detail=False):
+        """Return a vehicle as serialized by the vehicle API."""
+        tags = sorted(self.random.sample(
+            range(1, 41), self.random.randint(0, 5)))
+        parts = sorted(self.random.sample(
+            range(1, 101), self.random.randint(0, 10)))
+        price = self.random.randint(500, 80000)
+        part_prices = {part: self.random.randint(10, 5000) for part in parts}
+        vehicle = {
+            'id': vehicle_id,
+            'title': f'{self.random.choice(MAKES)} '
+                     f'{self.random.choice(MODELS)}',
+            'year': self.random.randint(1960, 2024),
+            'price': price,
+            'total_cost': price + sum(part_prices.values()),
+            'link': f'https://example.com/listing/{vehicle_id}'
+            if self.random.random() < 0.5 else '',
+            'tags': [{'id': tag, 'name': f'tag {tag}'} for tag in tags],
+            'parts': [
+                {'id': part, 'name': f'part {part}', 'price': part_price}
+                for part, part_price in part_prices.items()
+            ],
+        }
+        if detail:
+            vehicle.update({
+                'description': ' '.join(
+                    self.random.choice(WORDS) for _ in range(60)),
+                'image': f'/media/uploads/vehicle/{vehicle_id}.jpg',
+                'image_status': 'ready',
+                'thumbnail': f'/media/uploads/vehicle/{vehicle_id}-t.jpg',
+            })
+
+        return vehicle
+
+    def payloads(self, count):
+        """Return the benchmarked payloads by name."""
+        page = {
+            'next': 'http://testserver/api/vehicle/vehicles/?cursor=cD0xMDA',
+            'previous': None,
+            'results': [
+                self.vehicle(vehicle_id) for vehicle_id in range(count, 0, -1)
+            ],
+        }
+        facets = {
+            'tags': [
+                {'id': tag, 'name': f'tag {tag}', 'count': count - tag}
+                for tag in range(1, 41)
+            ],
+            'parts': [
+                {'id': part, 'name': f'part {part}', 'count': count - part}
+                for part in range(1, 101)
+            ],
+            'year': [
+                {'from': year, 'to': year + 4, 'count': 10}
+                for year in range(1960, 2025, 5)
+            ],
+            'price': [
+                {'from': price, 'to': price + 4999, 'count': 10}
+                for price in range(0, 80000, 5000)
+            ],
+        }
+
+        return {
+            'vehicle-list': page,
+            'vehicle-list-facets': {**page, 'facets': facets},
+            'vehicle-detail': self.vehicle(1, detail=True),
+            'tag-list': [
+                {'id': tag, 'name': f'tag {tag}', 'vehicle_count': tag * 3}
+                for tag in range(500, 0, -1)
+            ],
+        }
+
+    def durations(self, function, repeat):
+        """Return the sorted durations of repeat calls in milliseconds."""
+        durations = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            function()
+            durations.append((time.perf_counter() - started) * 1000)
+
+        return sorted(durations)
+
+    def compare(self, baseline, fast, repeat):
+        """Return timings of the baseline and fast functions."""
+        result = {}
+        for name, function in (('stdlib', baseline), ('fast', fast)):
+            durations = self.durations(function, repeat)
+            result[f'{name}_p50_ms'] = round(statistics.median(durations), 3)
+            result[f'{name}_mean_ms'] = round(statistics.mean(durations), 3)
+        result['speedup'] = round(
+            result['stdlib_p50_ms'] / max(result['fast_p50_ms'], 1e-6), 2)
+
+        return result
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        for name in ('vehicles', 'repeat'):
+            if options[name] < 1:
+                raise CommandError(f'--{name} must be positive.')
+
+        self.random = random.Random(options['seed'])
+        renderer, fast_renderer = JSONRenderer(), FastJSONRenderer()
+        parser, fast_parser = JSONParser(), FastJSONParser()
+
+        results = []
+        for name, data in self.payloads(options['vehicles']).items():
+            rendered = renderer.render(data)
+            fast_rendered = fast_renderer.render(data)
+            parsed = fast_parser.parse(io.BytesIO(rendered))
+            results.append({
+                'payload': name,
+                'bytes': len(rendered),
+                'identical_output': rendered == fast_rendered,
+                'identical_parse': parsed == data,
+                'render': self.compare(
+                    lambda: renderer.render(data),
+                    lambda: fast_renderer.render(data),
+                    options['repeat'],
+                ),
+                'parse': self.compare(
+                    lambda: parser.parse(io.BytesIO(rendered)),
+                    lambda: fast_parser.parse(io.BytesIO(rendered)),
+                    options['repeat'],
+                ),
+            })
+
+        report = json.dumps({
+            'orjson': orjson.__version__ if orjson is not None else None,
+            'vehicles': options['vehicles'],
+            'repeat': options['repeat'],
+            'results': results,
+        }, indent=2)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(report + '\n')
+        else:
+            self.stdout.write(report)
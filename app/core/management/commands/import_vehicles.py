@@ -0,0 +1,270 @@
+"""
+Django command to import vehicles with their tags and parts from a file.
+"""
+import io
+import os
+import time
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.validators import (
+    MaxValueValidator,
+    MinValueValidator,
+)
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+)
+from django.db import (
+    DatabaseError,
+    connection,
+    transaction,
+)
+from django.db.backends.base.operations import BaseDatabaseOperations
+
+from core.models import (
+    FleetTotal,
+    Vehicle,
+    Tag,
+    Part,
+)
+from vehicle.cache import invalidate_user
+from vehicle.export import (
+    READERS,
+    RecordError,
+)
+
+
+def clean_field(model, name, value):
+    """Return value converted and validated like the field name of model.
+
+    Checks the lengths and integer ranges the database would otherwise
+    reject with a DataError. Integer ranges are checked on every database,
+    SQLite does not limit them.
+    """
+    field = model._meta.get_field(name)
+    limits = BaseDatabaseOperations.integer_field_ranges.get(
+        field.get_internal_type())
+    try:
+        value = field.clean(value, None)
+        if limits:
+            MinValueValidator(limits[0])(value)
+            MaxValueValidator(limits[1])(value)
+    except ValidationError as exc:
+        raise ValueError(
+            f'{model._meta.model_name} {name}: {" ".join(exc.messages)}')
+
+    return value
+
+
+def parse_record(record):
+    """Return the vehicle fields, tag names and parts of a record."""
+    fields = {
+        name: clean_field(Vehicle, name, record.get(name))
+        for name in ('title', 'year', 'price')
+    }
+    for name in ('description', 'link'):
+        fields[name] = clean_field(Vehicle, name, record.get(name) or '')
+    tags = [
+        clean_field(
+            Tag, 'name', tag.get('name') if isinstance(tag, dict) else tag)
+        for tag in record.get('tags') or []
+    ]
+    parts = [
+        {
+            'name': clean_field(Part, 'name', part.get('name')),
+            'price': clean_field(Part, 'price', part.get('price')),
+        }
+        for part in record.get('parts') or []
+    ]
+
+    return fields, tags, parts
+
+
+def _copy_value(value):
+    """Return value in the text format of PostgreSQL COPY."""
+    if value is None:
+        return '\\N'
+
+    return (
+        str(value)
+        .replace('\\', '\\\\')
+        .replace('\t', '\\t')
+        .replace('\n', '\\n')
+        .replace('\r', '\\r')
+    )
+
+
+def copy_insert(model, objs, with_pk=False):
+    """Insert objs with PostgreSQL COPY.
+
+    With with_pk the primary keys are reserved from the sequence first and
+    set on the objects.
+    """
+    opts = model._meta
+    with connection.cursor() as cursor:
+        if with_pk:
+            cursor.execute(
+                'SELECT nextval(pg_get_serial_sequence(%s, %s)) '
+                'FROM generate_series(1, %s)',
+                [opts.db_table, opts.pk.column, len(objs)],
+            )
+            for obj, (pk,) in zip(objs, cursor.fetchall()):
+                obj.pk = pk
+
+        fields = [
+            field for field in opts.concrete_fields
+            if with_pk or not field.primary_key
+        ]
+        data = io.StringIO()
+        for obj in objs:
+            data.write('\t'.join(
+                _copy_value(field.get_db_prep_save(
+                    field.pre_save(obj, True), connection))
+                for field in fields
+            ))
+            data.write('\n')
+        data.seek(0)
+
+        columns = ', '.join(
+            connection.ops.quote_name(field.column) for field in fields)
+        cursor.copy_expert(
+            f'COPY {connection.ops.quote_name(opts.db_table)} '
+            f'({columns}) FROM STDIN',
+            data,
+        )
+
+
+class Command(BaseCommand):
+    """Django command to import vehicles for a user."""
+    help = 'Import vehicles with their tags and parts from CSV or NDJSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File written by the export API.')
+        parser.add_argument(
+            '--user',
+            required=True,
+            help='Email of the user owning the vehicles.',
+        )
+        parser.add_argument(
+            '--format',
+            choices=sorted(READERS),
+            help='File format, taken from the extension by default.',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Vehicles committed per transaction.',
+        )
+
+    def insert(self, model, objs, with_pk=False):
+        """Insert objs with COPY, bulk_create or save as supported."""
+        if not objs:
+            return
+
+        features = connection.features
+        if connection.vendor == 'postgresql':
+            copy_insert(model, objs, with_pk)
+        elif not with_pk or features.can_return_rows_from_bulk_insert:
+            model.objects.bulk_create(objs)
+        else:
+            for obj in objs:
+                obj.save(force_insert=True)
+
+    def import_chunk(self, user, records):
+        """Import parsed records in one transaction."""
+        tag_ids = {
+            tag.name: tag.id
+            for tag in Tag.objects.get_or_create_many(user, [
+                {'name': name} for _, tags, _ in records for name in tags
+            ])
+        }
+        part_ids = {
+            part.name: part.id
+            for part in Part.objects.get_or_create_many(user, [
+                part for _, _, parts in records for part in parts
+            ])
+        }
+
+        vehicles = [Vehicle(user=user, **fields) for fields, _, _ in records]
+        self.insert(Vehicle, vehicles, with_pk=True)
+
+        TagLink = Vehicle.tags.through
+        PartLink = Vehicle.parts.through
+        self.insert(TagLink, [
+            TagLink(vehicle_id=vehicle.id, tag_id=tag_ids[name])
+            for vehicle, (_, tags, _) in zip(vehicles, records)
+            for name in dict.fromkeys(tags)
+        ])
+        self.insert(PartLink, [
+            PartLink(vehicle_id=vehicle.id, part_id=part_ids[name])
+            for vehicle, (_, _, parts) in zip(vehicles, records)
+            for name in dict.fromkeys(part['name'] for part in parts)
+        ])
+        Vehicle.objects.filter(
+            pk__in=[vehicle.pk for vehicle in vehicles],
+        ).recompute_total_cost()
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        try:
+            user = get_user_model().objects.get(email=options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'User {options["user"]} does not exist.')
+
+        path = options['path']
+        input_format = options['format'] or os.path.splitext(path)[1][1:]
+        if input_format not in READERS:
+            raise CommandError('Cannot tell the format, use --format.')
+        chunk_size = options['chunk_size']
+        if chunk_size < 1:
+            raise CommandError('--chunk-size must be positive.')
+
+        imported = 0
+        started = time.monotonic()
+        try:
+            with open(path, newline='', encoding='utf-8') as file:
+                records = READERS[input_format](file)
+                while True:
+                    lines = []
+                    chunk = []
+                    for line, record in islice(records, chunk_size):
+                        try:
+                            chunk.append(parse_record(record))
+                        except (
+                            ValueError, KeyError, TypeError, AttributeError,
+                        ) as exc:
+                            raise RecordError(line, exc) from exc
+                        lines.append(line)
+                    if not chunk:
+                        break
+                    try:
+                        with transaction.atomic():
+                            self.import_chunk(user, chunk)
+                    except DatabaseError as exc:
+                        raise CommandError(
+                            f'Could not import the records on lines '
+                            f'{lines[0]} to {lines[-1]} after {imported} '
+                            f'imported vehicles: {exc}')
+                    imported += len(chunk)
+                    if options['verbosity'] > 1:
+                        self.stdout.write(f'Imported {imported} vehicles...')
+        except (OSError, UnicodeDecodeError) as exc:
+            raise CommandError(exc)
+        except RecordError as exc:
+            raise CommandError(
+                f'Invalid record on line {exc.line} after {imported} '
+                f'imported vehicles: {exc.error}')
+        finally:
+            if imported:
+                FleetTotal.objects.recompute(user.id)
+                invalidate_user(user.id)
+
+        elapsed = time.monotonic() - started
+        rate = imported / elapsed if elapsed else imported
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {imported} vehicles in {elapsed:.2f}s '
+            f'({rate:.0f} rows/s).'
+        ))
@@ -0,0 +1,74 @@
+"""
+Django command to report index usage of the core tables.
+"""
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+)
+from django.db import connection
+
+from core.models import (
+    User,
+    Vehicle,
+    Tag,
+    Part,
+)
+
+
+INDEX_USAGE_SQL = """
+    SELECT
+        s.relname,
+        s.indexrelname,
+        s.idx_scan,
+        s.idx_tup_read,
+        s.idx_tup_fetch,
+        pg_relation_size(s.indexrelid)
+    FROM pg_stat_user_indexes s
+    WHERE s.relname = ANY(%s)
+    ORDER BY s.relname, s.idx_scan DESC, s.indexrelname
+"""
+
+
+class Command(BaseCommand):
+    """Django command to report how often each index is scanned."""
+    help = 'Report PostgreSQL index usage statistics for the core tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--unused',
+            action='store_true',
+            help='Only list indexes that were never scanned.',
+        )
+
+    def _tables(self):
+        """Return the tables of the core models and their M2M tables."""
+        tables = []
+        for model in (User, Vehicle, Tag, Part):
+            tables.append(model._meta.db_table)
+            tables.extend(
+                field.remote_field.through._meta.db_table
+                for field in model._meta.local_many_to_many
+            )
+
+        return tables
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        if connection.vendor != 'postgresql':
+            raise CommandError('Index usage statistics require PostgreSQL.')
+
+        with connection.cursor() as cursor:
+            cursor.execute(INDEX_USAGE_SQL, [self._tables()])
+            rows = cursor.fetchall()
+
+        self.stdout.write(
+            f'{"table":<24} {"index":<48} {"scans":>10} '
+            f'{"tuples read":>12} {"tuples fetched":>14} {"size":>10}'
+        )
+        for table, index, scans, read, fetched, size in rows:
+            if options['unused'] and scans:
+                continue
+            self.stdout.write(
+                f'{table:<24} {index:<48} {scans:>10} '
+                f'{read:>12} {fetched:>14} {size:>10}'
+            )
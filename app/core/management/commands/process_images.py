@@ -0,0 +1,62 @@
+"""
+Django command to process vehicle images left unprocessed.
+"""
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+)
+from django.db.models import Count
+
+from core.models import Vehicle
+from vehicle.images import process_vehicle_image
+
+
+class Command(BaseCommand):
+    """Django command to process pending vehicle images in this process."""
+    help = (
+        'Process vehicle images still pending, because the image queue '
+        'was full or a worker restarted before reaching them. With '
+        '--processing images a stopped worker left processing are retried '
+        'too, only use it while no worker is running.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processing',
+            action='store_true',
+            help='Also retry images left processing.',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            help='Process at most this many images.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        if options['limit'] is not None and options['limit'] < 1:
+            raise CommandError('--limit must be positive.')
+
+        statuses = [Vehicle.ImageStatus.PENDING]
+        if options['processing']:
+            statuses.append(Vehicle.ImageStatus.PROCESSING)
+        vehicle_ids = Vehicle.objects.filter(
+            image_status__in=statuses,
+        ).exclude(image='').order_by('id').values_list('id', flat=True)
+        vehicle_ids = list(vehicle_ids[:options['limit']])
+
+        for vehicle_id in vehicle_ids:
+            process_vehicle_image(vehicle_id)
+
+        results = {
+            row['image_status']: row['count']
+            for row in Vehicle.objects.filter(
+                id__in=vehicle_ids,
+            ).values('image_status').annotate(
+                count=Count('id'),
+            ).order_by()
+        }
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {len(vehicle_ids)} images: '
+            f'{results.get(Vehicle.ImageStatus.READY, 0)} ready, '
+            f'{results.get(Vehicle.ImageStatus.FAILED, 0)} failed.'))
@@ -0,0 +1,446 @@
+"""
+Request metrics in the Prometheus text exposition format.
+
+Each process keeps latency histograms, database query counts and the time
+spent per phase (auth, db, serialize, render) per route and action in
+memory. With METRICS['DIR'] set, every process also writes a snapshot of
+them to <DIR>/<pid>.json at most every FLUSH_INTERVAL seconds, and the
+/metrics view merges the snapshots of all processes. Counters of exited
+processes are kept, their gauges dropped. Apps add their own counters and
+gauges with register().
+
+/metrics is only served to the addresses in METRICS['ALLOWED_IPS'] and to
+staff users logged in to the admin.
+"""
+import ipaddress
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.http import (
+    HttpResponse,
+    HttpResponseForbidden,
+)
+
+from core.middleware import view_action
+
+
+DEFAULTS = {
+    'DIR': None,
+    'FLUSH_INTERVAL': 1.0,
+    'ALLOWED_IPS': ('127.0.0.1', '::1'),
+    'BUCKETS': (
+        0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+    ),
+}
+
+PHASES = ('auth', 'db', 'serialize', 'render')
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_local = threading.local()
+
+_collectors = {}
+
+
+def get_options():
+    """Return the METRICS settings with defaults."""
+    return {**DEFAULTS, **getattr(settings, 'METRICS', {})}
+
+
+def add_time(phase, seconds):
+    """Add seconds spent in phase to the request of this thread."""
+    phases = getattr(_local, 'phases', None)
+    if phases is not None:
+        phases[phase] = phases.get(phase, 0.0) + seconds
+
+
+@contextmanager
+def timed(phase):
+    """Add the time spent inside to phase of the current request."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_time(phase, time.perf_counter() - started)
+
+
+class TimedSerializerMixin:
+    """Serializer mixin timing the serialize phase of the current request.
+
+    Only the outermost representation is timed, nested serializers run
+    inside it.
+    """
+
+    def to_representation(self, instance):
+        if getattr(_local, 'serializing', True):
+            return super().to_representation(instance)
+
+        _local.serializing = True
+        try:
+            with timed('serialize'):
+                return super().to_representation(instance)
+        finally:
+            _local.serializing = False
+
+
+class Registry:
+    """Latency histograms, query counts and phase times of one process."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.in_flight = 0
+        self._requests = {}
+        self._queries = {}
+        self._phases = {}
+        self._lock = threading.Lock()
+
+    def observe(self, route, action, seconds, phases, queries=0):
+        """Record a finished request."""
+        with self._lock:
+            key = (route, action)
+            self._queries[key] = self._queries.get(key, 0) + queries
+            counts = self._requests.get((route, action))
+            if counts is None:
+                counts = self._requests[(route, action)] = (
+                    [0] * (len(self.buckets) + 1) + [0.0])
+            counts[bisect_left(self.buckets, seconds)] += 1
+            counts[-1] += seconds
+            for phase, phase_seconds in phases.items():
+                key = (route, action, phase)
+                self._phases[key] = self._phases.get(key, 0.0) + phase_seconds
+
+    def snapshot(self):
+        """Return the metrics of this process as a JSON compatible dict."""
+        with self._lock:
+            requests = [
+                [route, action, counts[:]]
+                for (route, action), counts in self._requests.items()
+            ]
+            queries = [
+                [route, action, count]
+                for (route, action), count in self._queries.items()
+            ]
+            phases = [
+                [route, action, phase, seconds]
+                for (route, action, phase), seconds in self._phases.items()
+            ]
+            in_flight = self.in_flight
+
+        return {
+            'buckets': list(self.buckets),
+            'requests': requests,
+            'queries': queries,
+            'phases': phases,
+            'in_flight': in_flight,
+            'metrics': {
+                name: {
+                    'type': kind,
+                    'help': documentation,
+                    'label': label,
+                    'values': collect() if label else {'': collect()},
+                }
+                for name, (kind, documentation, label, collect)
+                in _collectors.items()
+            },
+        }
+
+
+def register(name, kind, documentation, collect, label=None):
+    """Add a counter or gauge whose value collect returns.
+
+    kind is 'counter' or 'gauge'. With label, collect returns a dict of
+    values by label value, otherwise a number. It is called for every
+    snapshot.
+    """
+    _collectors[name] = (kind, documentation, label, collect)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+_last_flush = 0.0
+
+
+def get_registry():
+    """Return the metrics registry of this process."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = Registry(get_options()['BUCKETS'])
+
+    return _registry
+
+
+def reset():
+    """Discard the metrics of this process."""
+    global _registry, _last_flush
+    with _registry_lock:
+        _registry = None
+        _last_flush = 0.0
+
+
+@receiver(setting_changed)
+def reset_registry(setting, **kwargs):
+    """Start a new registry when the metrics settings change in tests."""
+    if setting == 'METRICS':
+        reset()
+
+
+def _snapshot_path(directory, pid):
+    return os.path.join(directory, f'{pid}.json')
+
+
+def flush(force=False):
+    """Write the snapshot of this process if METRICS['DIR'] is set."""
+    global _last_flush
+    options = get_options()
+    now = time.monotonic()
+    if not options['DIR'] or (
+        not force and now - _last_flush < options['FLUSH_INTERVAL']
+    ):
+        return
+
+    _last_flush = now
+    path = _snapshot_path(options['DIR'], os.getpid())
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as file:
+        json.dump(get_registry().snapshot(), file)
+    os.replace(temporary, path)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+
+    return True
+
+
+def collect():
+    """Return the snapshots of every process, this one first."""
+    snapshots = [get_registry().snapshot()]
+    directory = get_options()['DIR']
+    if not directory:
+        return snapshots
+
+    for name in sorted(os.listdir(directory)):
+        pid, extension = os.path.splitext(name)
+        if extension != '.json' or not pid.isdigit():
+            continue
+        if int(pid) == os.getpid():
+            continue
+        try:
+            with open(os.path.join(directory, name), encoding='utf-8') as file:
+                snapshot = json.load(file)
+        except (OSError, ValueError):
+            continue
+        if not _alive(int(pid)):
+            snapshot['in_flight'] = 0
+            snapshot['metrics'] = {
+                name: metric
+                for name, metric in snapshot['metrics'].items()
+                if metric['type'] != 'gauge'
+            }
+        snapshots.append(snapshot)
+
+    return snapshots
+
+
+def _labels(**labels):
+    return ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\')
+                         .replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels.items()
+    )
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(snapshots):
+    """Return the merged snapshots in the text exposition format."""
+    requests = {}
+    queries = {}
+    phases = {}
+    in_flight = 0
+    registered = {}
+    buckets = snapshots[0]['buckets']
+    for snapshot in snapshots:
+        if snapshot['buckets'] != buckets:
+            continue
+        for route, action, counts in snapshot['requests']:
+            merged = requests.setdefault(
+                (route, action), [0] * (len(buckets) + 1) + [0.0])
+            for index, count in enumerate(counts):
+                merged[index] += count
+        for route, action, count in snapshot['queries']:
+            queries[(route, action)] = queries.get((route, action), 0) + count
+        for route, action, phase, seconds in snapshot['phases']:
+            key = (route, action, phase)
+            phases[key] = phases.get(key, 0.0) + seconds
+        in_flight += snapshot['in_flight']
+        for name, metric in snapshot['metrics'].items():
+            merged = registered.setdefault(name, {**metric, 'values': {}})
+            for label, value in metric['values'].items():
+                merged['values'][label] = (
+                    merged['values'].get(label, 0) + value)
+
+    lines = [
+        '# HELP api_request_duration_seconds Latency of API requests.',
+        '# TYPE api_request_duration_seconds histogram',
+    ]
+    for (route, action), counts in sorted(requests.items()):
+        cumulative = 0
+        for bound, count in zip(buckets + ['+Inf'], counts):
+            cumulative += count
+            labels = _labels(route=route, action=action, le=bound)
+            lines.append(
+                f'api_request_duration_seconds_bucket{{{labels}}} '
+                f'{cumulative}')
+        labels = _labels(route=route, action=action)
+        lines.append(
+            f'api_request_duration_seconds_sum{{{labels}}} '
+            f'{_number(counts[-1])}')
+        lines.append(
+            f'api_request_duration_seconds_count{{{labels}}} {cumulative}')
+
+    lines += [
+        '# HELP api_db_queries_total Database queries run by API requests.',
+        '# TYPE api_db_queries_total counter',
+    ]
+    for (route, action), count in sorted(queries.items()):
+        labels = _labels(route=route, action=action)
+        lines.append(f'api_db_queries_total{{{labels}}} {count}')
+
+    lines += [
+        '# HELP api_request_phase_seconds_total Time spent in auth, db, '
+        'serialize and render per route. Phases may overlap with db.',
+        '# TYPE api_request_phase_seconds_total counter',
+    ]
+    for (route, action, phase), seconds in sorted(phases.items()):
+        labels = _labels(route=route, action=action, phase=phase)
+        lines.append(
+            f'api_request_phase_seconds_total{{{labels}}} '
+            f'{_number(seconds)}')
+
+    lines += [
+        '# HELP api_requests_in_flight Requests being handled.',
+        '# TYPE api_requests_in_flight gauge',
+        f'api_requests_in_flight {in_flight}',
+    ]
+    for name, metric in sorted(registered.items()):
+        lines += [
+            f'# HELP {name} {metric["help"]}',
+            f'# TYPE {name} {metric["type"]}',
+        ]
+        for label, value in sorted(metric['values'].items()):
+            if metric['label']:
+                labels = _labels(**{metric['label']: label})
+                lines.append(f'{name}{{{labels}}} {_number(value)}')
+            else:
+                lines.append(f'{name} {_number(value)}')
+
+    return '\n'.join(lines) + '\n'
+
+
+def _allowed(request):
+    """Return whether request may read the metrics.
+
+    REMOTE_ADDR is checked, not X-Forwarded-For, which clients can set.
+    """
+    if request.user.is_authenticated and request.user.is_staff:
+        return True
+
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+
+    return any(
+        address in ipaddress.ip_network(network.strip(), strict=False)
+        for network in get_options()['ALLOWED_IPS']
+    )
+
+
+def metrics_view(request):
+    """Serve the metrics of every process to allowed clients."""
+    if not _allowed(request):
+        return HttpResponseForbidden()
+
+    flush(force=True)
+
+    return HttpResponse(render(collect()), content_type=CONTENT_TYPE)
+
+
+class MetricsMiddleware:
+    """Time requests and their phases, labeled by route and action.
+
+    Must come before QueryStatsMiddleware, whose database time it reads.
+    Streamed responses are observed once their content has been consumed.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        registry = get_registry()
+        started = time.perf_counter()
+        phases = _local.phases = {}
+        _local.serializing = False
+        with registry._lock:
+            registry.in_flight += 1
+        try:
+            response = self.get_response(request)
+        except Exception:
+            self._finish(request, registry, started, phases)
+            raise
+
+        if response.streaming:
+            response.streaming_content = self._stream(
+                response.streaming_content, request, registry, started, phases)
+        else:
+            self._finish(request, registry, started, phases)
+
+        return response
+
+    def process_template_response(self, request, response):
+        started = time.perf_counter()
+        response.add_post_render_callback(
+            lambda response: add_time('render', time.perf_counter() - started))
+
+        return response
+
+    def _stream(self, content, request, registry, started, phases):
+        try:
+            yield from content
+        finally:
+            self._finish(request, registry, started, phases)
+
+    def _finish(self, request, registry, started, phases):
+        seconds = time.perf_counter() - started
+        _local.phases = None
+        _local.serializing = True
+        with registry._lock:
+            registry.in_flight -= 1
+
+        match = request.resolver_match
+        if match is not None and match.url_name:
+            counter = getattr(request, 'query_stats', None)
+            queries = 0
+            if counter is not None:
+                phases['db'] = counter.seconds
+                queries = counter.count
+            registry.observe(
+                match.view_name, view_action(request), seconds, phases,
+                queries)
+        flush()
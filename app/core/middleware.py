@@ -0,0 +1,96 @@
+"""
+Middleware recording the database queries of each request.
+
+Every query runs through a connection.execute_wrapper counting it and
+timing it. The totals are kept on the request as query_stats, where
+core.metrics reads them, and added to the response as headers when
+QUERY_STATS['HEADERS'] is set, which it is in DEBUG mode by default.
+"""
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+
+DEFAULTS = {
+    'HEADERS': None,
+}
+
+
+def get_options():
+    """Return the QUERY_STATS settings with defaults."""
+    options = {**DEFAULTS, **getattr(settings, 'QUERY_STATS', {})}
+    if options['HEADERS'] is None:
+        options['HEADERS'] = settings.DEBUG
+
+    return options
+
+
+class QueryCounter:
+    """Execute wrapper counting queries and the time spent running them."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+    def wrap(self):
+        """Return a context manager counting the queries of every database."""
+        stack = ExitStack()
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(self))
+
+        return stack
+
+
+def view_action(request):
+    """Return the DRF action of a resolved request.
+
+    Views without actions use the lower case HTTP method.
+    """
+    method = request.method.lower()
+    actions = getattr(request.resolver_match.func, 'actions', None)
+
+    return actions.get(method, method) if actions else method
+
+
+class QueryStatsMiddleware:
+    """Count and time the database queries of each request.
+
+    The queries of streamed responses are counted while their content is
+    consumed, their headers only cover the queries run before streaming
+    started.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = request.query_stats = QueryCounter()
+        with counter.wrap():
+            response = self.get_response(request)
+
+        if get_options()['HEADERS']:
+            response['X-DB-Queries'] = str(counter.count)
+            response['Server-Timing'] = (
+                f'db;dur={counter.seconds * 1000:.3f};'
+                f'desc="{counter.count} queries"'
+            )
+
+        if response.streaming:
+            response.streaming_content = self._stream(
+                response.streaming_content, counter)
+
+        return response
+
+    def _stream(self, content, counter):
+        with counter.wrap():
+            yield from content
@@ -0,0 +1,70 @@
+# Generated by Django 3.2.25 on 2026-10-16 23:32
+
+import logging
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+logger = logging.getLogger(__name__)
+
+
+def merge_duplicate_names(apps, schema_editor):
+    """Merge tags and parts sharing a name for the same user.
+
+    The oldest object of each group is kept and inherits the vehicles
+    of the others, which are then deleted. Merged parts keep the price of
+    the oldest one, a warning lists the prices that were dropped.
+    """
+    Vehicle = apps.get_model('core', 'Vehicle')
+    for model_name, field in (('Tag', 'tags'), ('Part', 'parts')):
+        model = apps.get_model('core', model_name)
+        through = getattr(Vehicle, field).through
+        column = f'{model_name.lower()}_id'
+        groups = model.objects.values('user', 'name').annotate(
+            count=Count('id'),
+            keep=Min('id'),
+        ).filter(count__gt=1)
+        for group in groups:
+            keep = group['keep']
+            duplicates = list(model.objects.filter(
+                user=group['user'],
+                name=group['name'],
+            ).exclude(id=keep).values_list('id', flat=True))
+            if model_name == 'Part':
+                prices = dict(model.objects.filter(
+                    id__in=[keep, *duplicates],
+                ).values_list('id', 'price'))
+                dropped = sorted({
+                    prices[part_id] for part_id in duplicates
+                    if prices[part_id] != prices[keep]
+                })
+                if dropped:
+                    logger.warning(
+                        'Merged parts named %r of user %s into part %s '
+                        'priced %s, dropping the prices %s.',
+                        group['name'], group['user'], keep, prices[keep],
+                        dropped,
+                    )
+            linked = through.objects.filter(**{column: keep}).values(
+                'vehicle_id')
+            vehicle_ids = set(through.objects.filter(
+                **{f'{column}__in': duplicates},
+            ).exclude(vehicle_id__in=linked).values_list(
+                'vehicle_id', flat=True))
+            through.objects.bulk_create([
+                through(vehicle_id=vehicle_id, **{column: keep})
+                for vehicle_id in vehicle_ids
+            ])
+            model.objects.filter(id__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_vehicle_image'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_names, migrations.RunPython.noop),
+    ]
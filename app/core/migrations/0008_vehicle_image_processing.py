@@ -0,0 +1,36 @@
+# Generated by Django 3.2.25 on 2026-10-16 23:36
+
+import core.models
+from django.db import migrations, models
+
+
+def mark_existing_images_ready(apps, schema_editor):
+    """Existing images are served as uploaded, so they count as ready."""
+    Vehicle = apps.get_model('core', 'Vehicle')
+    Vehicle.objects.exclude(image__isnull=True).exclude(image='').update(
+        image_status='ready',
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_user_name_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vehicle',
+            name='image_status',
+            field=models.CharField(choices=[('none', 'No image'), ('pending', 'Pending'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], default='none', max_length=16),
+        ),
+        migrations.AddField(
+            model_name='vehicle',
+            name='thumbnail',
+            field=models.ImageField(editable=False, null=True, upload_to=core.models.vehicle_image_file_path),
+        ),
+        migrations.RunPython(
+            mark_existing_images_ready,
+            migrations.RunPython.noop,
+        ),
+    ]
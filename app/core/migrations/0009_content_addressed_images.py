@@ -0,0 +1,34 @@
+# Generated by Django 3.2.25 on 2026-10-16 23:42
+
+import core.models
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_vehicle_image_processing'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('size', models.PositiveBigIntegerField()),
+                ('ref_count', models.PositiveIntegerField(default=1)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='vehicle',
+            name='image',
+            field=models.ImageField(null=True, storage=core.storage.vehicle_image_storage, upload_to=core.models.vehicle_image_file_path),
+        ),
+        migrations.AlterField(
+            model_name='vehicle',
+            name='thumbnail',
+            field=models.ImageField(editable=False, null=True, storage=core.storage.vehicle_image_storage, upload_to=core.models.vehicle_image_file_path),
+        ),
+    ]
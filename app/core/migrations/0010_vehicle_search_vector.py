@@ -0,0 +1,61 @@
+# Generated by Django 3.2.25 on 2026-10-16 23:48
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+# Keep the text search configuration in line with vehicle.search.
+CREATE_SEARCH = """
+CREATE FUNCTION core_vehicle_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(NEW.description, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER core_vehicle_search_vector_trigger
+    BEFORE INSERT OR UPDATE ON core_vehicle
+    FOR EACH ROW EXECUTE PROCEDURE core_vehicle_search_vector_update();
+
+UPDATE core_vehicle SET search_vector =
+    setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(description, '')), 'B');
+
+CREATE INDEX core_vehicle_search_idx ON core_vehicle
+    USING gin (search_vector);
+"""
+
+DROP_SEARCH = """
+DROP INDEX IF EXISTS core_vehicle_search_idx;
+DROP TRIGGER IF EXISTS core_vehicle_search_vector_trigger ON core_vehicle;
+DROP FUNCTION IF EXISTS core_vehicle_search_vector_update();
+"""
+
+
+def create_search(apps, schema_editor):
+    """Maintain search_vector with a trigger and index it, on PostgreSQL."""
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_SEARCH)
+
+
+def drop_search(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_SEARCH)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_content_addressed_images'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vehicle',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search, drop_search),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 3.2.25 on 2026-10-16 23:53
+
+from django.db import migrations, models
+from django.db.models import Count, F, Func, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def compute_totals(apps, schema_editor):
+    """Fill in the total cost of existing vehicles and fleets."""
+    User = apps.get_model('core', 'User')
+    Vehicle = apps.get_model('core', 'Vehicle')
+    FleetTotal = apps.get_model('core', 'FleetTotal')
+
+    parts_cost = Vehicle.parts.through.objects.filter(
+        vehicle_id=OuterRef('pk'),
+    ).annotate(total=Func(F('part__price'), function='SUM')).values('total')
+    Vehicle.objects.update(total_cost=F('price') + Coalesce(
+        Subquery(parts_cost, output_field=models.IntegerField()), 0))
+
+    totals = {
+        row['user_id']: row
+        for row in Vehicle.objects.values('user_id').annotate(
+            vehicle_count=Count('id'),
+            total_cost=Sum('total_cost'),
+        ).order_by()
+    }
+    FleetTotal.objects.bulk_create(
+        FleetTotal(
+            user_id=user_id,
+            vehicle_count=totals.get(user_id, {}).get('vehicle_count', 0),
+            total_cost=totals.get(user_id, {}).get('total_cost', 0),
+        )
+        for user_id in User.objects.values_list('id', flat=True)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_vehicle_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FleetTotal',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='fleet_total', serialize=False, to='core.user')),
+                ('vehicle_count', models.IntegerField(default=0)),
+                ('total_cost', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='vehicle',
+            name='total_cost',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='vehicle',
+            index=models.Index(fields=['user', 'total_cost'], name='core_vehicle_user_cost_idx'),
+        ),
+        migrations.RunPython(compute_totals, migrations.RunPython.noop),
+    ]
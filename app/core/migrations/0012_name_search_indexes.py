@@ -0,0 +1,48 @@
+# Generated by Django 3.2.25 on 2026-10-17 00:12
+
+from django.db import migrations
+
+
+# Keep the expressions in line with the lookups of vehicle.autocomplete.
+CREATE_INDEXES = """
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX core_tag_name_prefix_idx ON core_tag
+    (user_id, (UPPER(name::text)) text_pattern_ops);
+CREATE INDEX core_part_name_prefix_idx ON core_part
+    (user_id, (UPPER(name::text)) text_pattern_ops);
+
+CREATE INDEX core_tag_name_trgm_idx ON core_tag
+    USING gin (name gin_trgm_ops);
+CREATE INDEX core_part_name_trgm_idx ON core_part
+    USING gin (name gin_trgm_ops);
+"""
+
+DROP_INDEXES = """
+DROP INDEX IF EXISTS core_tag_name_prefix_idx;
+DROP INDEX IF EXISTS core_part_name_prefix_idx;
+DROP INDEX IF EXISTS core_tag_name_trgm_idx;
+DROP INDEX IF EXISTS core_part_name_trgm_idx;
+"""
+
+
+def create_indexes(apps, schema_editor):
+    """Index tag and part names for prefix and trigram matching."""
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_INDEXES)
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_INDEXES)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_vehicle_total_cost'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
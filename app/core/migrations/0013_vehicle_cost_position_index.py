@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-17 01:14
+
+from django.db import migrations, models
+import django.db.models.expressions
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_name_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='vehicle',
+            index=models.Index(django.db.models.expressions.F('user'), django.db.models.expressions.ExpressionWrapper(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.F('total_cost'), '*', django.db.models.expressions.Value(2147483648)), '+', django.db.models.expressions.F('id')), output_field=models.BigIntegerField()), name='core_vehicle_user_cost_pos_idx'),
+        ),
+    ]
@@ -5,13 +5,40 @@ import uuid
 import os
 
 from django.conf import settings
-from django.db import models
+from django.contrib.postgres.search import SearchVectorField
+from django.db import (
+    models,
+    router,
+    transaction,
+)
+from django.db.models import (
+    Count,
+    ExpressionWrapper,
+    F,
+    Func,
+    OuterRef,
+    Subquery,
+    Sum,
+)
+from django.db.models.fields.files import FieldFile
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
     PermissionsMixin
 )
 
+from core.storage import vehicle_image_storage
+
+
+# Total costs are 32 bit integers, so total_cost scaled by 2 ** 31 plus
+# the id is a 64 bit key ordering by cost, then id, as long as vehicle
+# ids stay below 2 ** 31, like ranked search, see vehicle.search.ID_LIMIT.
+COST_POSITION = ExpressionWrapper(
+    F('total_cost') * 2 ** 31 + F('id'),
+    output_field=models.BigIntegerField(),
+)
+
 
 def vehicle_image_file_path(instance, filename):
     """Generate file path for new vehicle image."""
@@ -56,8 +83,146 @@ class User(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = 'email'
 
 
-class Vehicle(models.Model):
+class UserAttrManager(models.Manager):
+    """Manager for attributes identified by their name per user."""
+    create_fields = ()
+
+    def lookup_key(self, item):
+        """Return the identifying name of a dict or object."""
+        if isinstance(item, dict):
+            return item['name']
+
+        return item.name
+
+    def _existing(self, user, names):
+        """Return a mapping of name to existing object."""
+        return {
+            obj.name: obj
+            for obj in self.filter(user=user, name__in=names)
+        }
+
+    def get_or_create_many(self, user, items):
+        """Return objects for items, inserting the missing ones in bulk.
+
+        Existing objects are fetched with a single query and the missing
+        ones are inserted with a single INSERT ... ON CONFLICT DO NOTHING,
+        so concurrent requests creating the same names cannot add
+        duplicates. Fields listed in create_fields are taken from the
+        items for new objects only, the last item winning for repeated
+        names. Existing objects are returned unchanged.
+        """
+        items_by_name = {}
+        for item in items:
+            items_by_name[self.lookup_key(item)] = item
+        if not items_by_name:
+            return []
+
+        found = self._existing(user, items_by_name)
+        missing = [name for name in items_by_name if name not in found]
+        if missing:
+            self.bulk_create(
+                [
+                    self.model(user=user, name=name, **{
+                        field: items_by_name[name][field]
+                        for field in self.create_fields
+                    })
+                    for name in missing
+                ],
+                ignore_conflicts=True,
+            )
+            found = self._existing(user, items_by_name)
+
+        return [found[name] for name in items_by_name]
+
+
+class PartManager(UserAttrManager):
+    """Manager for parts, created with the price of their first payload.
+
+    A part is shared by every vehicle of the user listing it, so nested
+    vehicle writes never change its price. Only saving the part itself
+    does, see core.signals.part_saved.
+    """
+    create_fields = ('price',)
+
+
+class LockedPriceMixin:
+    """Read the stored price of a row under a lock before saving it.
+
+    The price change applied to the totals of core.signals is taken from
+    the locked row and not from the price this process loaded earlier,
+    which a concurrent save may already have replaced.
+    """
+
+    def _save_with_locked_price(self, save, *args, **kwargs):
+        """Call save, setting _price_delta when the price is written."""
+        self._price_delta = 0
+        update_fields = kwargs.get('update_fields')
+        if self._state.adding or (
+            update_fields is not None and 'price' not in update_fields
+        ):
+            return save(*args, **kwargs)
+
+        using = kwargs.get('using') or router.db_for_write(
+            type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            stored = type(self)._base_manager.using(using).select_for_update(
+            ).filter(pk=self.pk).values_list('price', flat=True).first()
+            if stored is not None:
+                self._price_delta = self.price - stored
+            return save(*args, **kwargs)
+
+
+class VehicleQuerySet(models.QuerySet):
+    """Query set of vehicles."""
+
+    def recompute_total_cost(self):
+        """Set total_cost of the vehicles from their price and parts.
+
+        Used after bulk writes, which skip the incremental updates.
+        """
+        parts_cost = Vehicle.parts.through.objects.filter(
+            vehicle_id=OuterRef('pk'),
+        ).annotate(
+            total=Func(F('part__price'), function='SUM'),
+        ).values('total')
+
+        return self.update(total_cost=F('price') + Coalesce(
+            Subquery(parts_cost, output_field=models.IntegerField()), 0))
+
+    def with_cost_position(self):
+        """Annotate cost_position, the unique key ordering by total_cost.
+
+        Cursor pagination by cost pages by it, so tied totals need no
+        OFFSET, see vehicle.pagination.
+        """
+        return self.annotate(cost_position=COST_POSITION)
+
+
+class FleetTotalManager(models.Manager):
+    """Manager for the fleet totals of users."""
+
+    def recompute(self, user_id):
+        """Set the fleet total of a user from their vehicles."""
+        totals = Vehicle.objects.filter(user_id=user_id).aggregate(
+            vehicle_count=Count('id'),
+            total_cost=Coalesce(Sum('total_cost'), 0),
+        )
+        fleet, _ = self.update_or_create(user_id=user_id, defaults=totals)
+
+        return fleet
+
+
+class Vehicle(LockedPriceMixin, models.Model):
     """Vehicle object."""
+
+    class ImageStatus(models.TextChoices):
+        """Processing state of the uploaded image."""
+        NONE = 'none', 'No image'
+        PENDING = 'pending', 'Pending'
+        PROCESSING = 'processing', 'Processing'
+        READY = 'ready', 'Ready'
+        FAILED = 'failed', 'Failed'
+
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
@@ -69,12 +234,171 @@ class Vehicle(models.Model):
     link = models.CharField(max_length=255, blank=True)
     tags = models.ManyToManyField('Tag')
     parts = models.ManyToManyField('Part')
-    image = models.ImageField(null=True, upload_to=vehicle_image_file_path)
+    image = models.ImageField(
+        null=True,
+        upload_to=vehicle_image_file_path,
+        storage=vehicle_image_storage,
+    )
+    image_status = models.CharField(
+        max_length=16,
+        choices=ImageStatus.choices,
+        default=ImageStatus.NONE,
+    )
+    thumbnail = models.ImageField(
+        null=True,
+        editable=False,
+        upload_to=vehicle_image_file_path,
+        storage=vehicle_image_storage,
+    )
+    # Maintained by a PostgreSQL trigger from title and description.
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Price plus the price of every part, maintained by core.signals.
+    total_cost = models.IntegerField(default=0, editable=False)
+
+    objects = VehicleQuerySet.as_manager()
+
+    # Written by the image processing job, see vehicle.images.
+    IMAGE_FIELDS = ('image', 'thumbnail', 'image_status')
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', '-id'],
+                name='core_vehicle_user_id_idx',
+            ),
+            models.Index(
+                fields=['user', 'total_cost'],
+                name='core_vehicle_user_cost_idx',
+            ),
+            models.Index(
+                F('user'), COST_POSITION,
+                name='core_vehicle_user_cost_pos_idx',
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+
+        return instance
+
+    def _field_value(self, field):
+        """Return the value of field as stored in the database."""
+        value = getattr(self, field.attname)
+
+        return value.name if isinstance(value, FieldFile) else value
+
+    def _changed_fields(self):
+        """Return the names of the fields an update has to write.
+
+        These are the fields changed since the vehicle was loaded. For
+        vehicles not loaded from the database it is every field except
+        the ones the image processing job writes.
+        """
+        loaded = getattr(self, '_loaded_values', None)
+        deferred = self.get_deferred_fields()
+        names = []
+        for field in self._meta.concrete_fields:
+            if field.primary_key or field.name == 'total_cost' or (
+                field.attname in deferred
+            ):
+                continue
+            if loaded is None:
+                if field.name not in self.IMAGE_FIELDS:
+                    names.append(field.name)
+            elif field.attname not in loaded or (
+                self._field_value(field) != loaded[field.attname]
+            ):
+                names.append(field.name)
+
+        return names
+
+    def save(self, *args, **kwargs):
+        """Save the vehicle without overwriting its total_cost.
+
+        The total of a new vehicle is its price, parts are linked later.
+        Afterwards total_cost only changes through relative updates, a new
+        price is applied in the UPDATE itself as total_cost - price + new.
+        Without update_fields only the changed fields are written, so a
+        stale instance cannot undo what another request or the image
+        processing job wrote meanwhile.
+        """
+        adding = self._state.adding
+        if adding:
+            self.total_cost = self.price
+        elif kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = self._changed_fields()
+        self._save_with_locked_price(self._save_price, *args, **kwargs)
+
+        self._remember_values(None if adding else kwargs['update_fields'])
+
+    def refresh_from_db(self, using=None, fields=None):
+        """Reload fields and take them as the values stored."""
+        super().refresh_from_db(using=using, fields=fields)
+        self._remember_values(fields)
+
+    def _remember_values(self, names=None):
+        """Record the fields in names, or all loaded, as stored."""
+        names = None if names is None else set(names)
+        deferred = self.get_deferred_fields()
+        self._loaded_values = {
+            **getattr(self, '_loaded_values', {}),
+            **{
+                field.attname: self._field_value(field)
+                for field in self._meta.concrete_fields
+                if field.attname not in deferred and (
+                    names is None
+                    or field.name in names
+                    or field.attname in names
+                )
+            },
+        }
+
+    def _save_price(self, *args, **kwargs):
+        if not self._price_delta:
+            return super().save(*args, **kwargs)
+
+        kwargs['update_fields'] = [
+            *(name for name in kwargs['update_fields']
+              if name != 'total_cost'),
+            'total_cost',
+        ]
+        self.total_cost = F('total_cost') - F('price') + self.price
+        super().save(*args, **kwargs)
+        self.refresh_from_db(fields=['total_cost'])
 
     def __str__(self) -> str:
         return f"{self.year} {self.title}"
 
 
+class FleetTotal(models.Model):
+    """Number and total cost of the vehicles of a user."""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='fleet_total',
+    )
+    vehicle_count = models.IntegerField(default=0)
+    total_cost = models.BigIntegerField(default=0)
+
+    objects = FleetTotalManager()
+
+    def __str__(self) -> str:
+        return f'{self.user} fleet'
+
+
+class ImageBlob(models.Model):
+    """Reference count of a file in the content addressed image storage."""
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField()
+    ref_count = models.PositiveIntegerField(default=1)
+
+    def __str__(self) -> str:
+        return self.name
+
+
 class Tag(models.Model):
     """Tag for filtering vehicles."""
     name = models.CharField(max_length=255)
@@ -83,11 +407,21 @@ class Tag(models.Model):
         on_delete=models.CASCADE,
     )
 
+    objects = UserAttrManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='core_tag_user_name_uniq',
+            ),
+        ]
+
     def __str__(self) -> str:
         return self.name
 
 
-class Part(models.Model):
+class Part(LockedPriceMixin, models.Model):
     """Part for vehicles."""
     name = models.CharField(max_length=255)
     price = models.IntegerField()
@@ -96,5 +430,18 @@ class Part(models.Model):
         on_delete=models.CASCADE,
     )
 
+    objects = PartManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='core_part_user_name_uniq',
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        self._save_with_locked_price(super().save, *args, **kwargs)
+
     def __str__(self):
         return self.name
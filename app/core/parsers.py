@@ -0,0 +1,51 @@
+"""
+JSON parser decoding with orjson when it is installed.
+
+Without orjson it behaves exactly like the DRF JSONParser. orjson rejects
+NaN and Infinity like the strict DRF parser does, so non strict parsing
+and request bodies not encoded as UTF-8 are left to the standard library.
+So are bodies orjson would parse differently: it decodes integers beyond
+64 bits as floats and rejects lone surrogates and numbers too large for a
+double, all of which json accepts. Invalid bodies are parsed by json
+again, so errors read the same.
+"""
+import codecs
+import io
+
+from django.conf import settings
+
+from rest_framework.parsers import JSONParser
+
+from core.renderers import (
+    FastJSONRenderer,
+    orjson,
+)
+
+
+# With every digit mapped to a zero, a run of 19 zeros is a number which
+# may not fit 64 bits, whose value orjson would lose. Runs of digits in
+# strings and fractions only cost a fallback.
+DIGITS = bytes.maketrans(b'123456789', b'000000000')
+LONG_NUMBER = b'0' * 19
+
+
+class FastJSONParser(JSONParser):
+    """JSONParser using orjson for UTF-8 bodies when available."""
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or not self.strict or (
+            codecs.lookup(encoding).name != 'utf-8'
+        ):
+            return super().parse(stream, media_type, parser_context)
+
+        body = stream.read()
+        if LONG_NUMBER not in body.translate(DIGITS):
+            try:
+                return orjson.loads(body)
+            except orjson.JSONDecodeError:
+                pass
+
+        return super().parse(io.BytesIO(body), media_type, parser_context)
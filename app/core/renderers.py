@@ -0,0 +1,68 @@
+"""
+JSON renderer encoding with orjson when it is installed.
+
+Without orjson it behaves exactly like the DRF JSONRenderer. With it,
+compact output is encoded by orjson, while dates, times and every type
+orjson does not support natively go through the DRF encoder. Indented
+output, as requested by the browsable API, ASCII only output and payloads
+orjson rejects, such as integers beyond 64 bits, are rendered by the
+standard library. So is output with floats orjson writes in another
+notation, such as 1e16 for 1e+16 or 0.00001 for 1e-05, so the bytes stay
+the same.
+
+One difference remains: orjson writes NaN and Infinity as null, where the
+strict JSONRenderer raises ValueError. Finding them would mean walking
+every payload, and no serializer of the API returns floats.
+"""
+import re
+
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# orjson writes exponents as e16 or e-7, json as e+16 and e-07, and small
+# fractions as 0.00001, which json writes as 1e-05. Strings may match too,
+# costing a fallback.
+EXPONENT = re.compile(rb'e[-1-9]')
+SMALL_FRACTION = b'.0000'
+
+if orjson is not None:
+    ORJSON_OPTIONS = (
+        orjson.OPT_NON_STR_KEYS
+        | orjson.OPT_PASSTHROUGH_DATETIME
+        | orjson.OPT_PASSTHROUGH_DATACLASS
+    )
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer using orjson for compact output when available."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+        if not self.compact or self.get_indent(
+            accepted_media_type, renderer_context or {}
+        ) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=ORJSON_OPTIONS,
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        if SMALL_FRACTION in ret or EXPONENT.search(ret):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Escape U+2028 and U+2029 like JSONRenderer, for JavaScript.
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(
+                b'\xe2\x80\xa9', b'\\u2029')
+
+        return ret
@@ -0,0 +1,188 @@
+"""
+Signal handlers maintaining the vehicle total cost aggregates.
+
+Vehicle.total_cost and FleetTotal are adjusted with relative updates as
+prices and part links change, so reads never have to sum parts. Bulk
+writes, which send no signals, call recompute_total_cost instead.
+Writes touching many vehicles run in deferred_fleet_totals to update each
+fleet total once.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.db.models import (
+    F,
+    Func,
+    IntegerField,
+    OuterRef,
+    Subquery,
+)
+from django.db.models.functions import Coalesce
+from django.db.models.signals import (
+    m2m_changed,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+
+from core.models import (
+    FleetTotal,
+    Vehicle,
+    Part,
+)
+
+
+PartLink = Vehicle.parts.through
+
+_deferred = threading.local()
+
+
+def _sum(links, **filters):
+    """Return the summed part price of links as an expression."""
+    return Coalesce(Subquery(
+        links.filter(**filters).annotate(
+            total=Func(F('part__price'), function='SUM'),
+        ).values('total'),
+        output_field=IntegerField(),
+    ), 0)
+
+
+def _update_fleet(user_id, total_cost, vehicle_count):
+    FleetTotal.objects.filter(user_id=user_id).update(
+        total_cost=F('total_cost') + total_cost,
+        vehicle_count=F('vehicle_count') + vehicle_count,
+    )
+
+
+def _add_to_fleet(user_id, total_cost, vehicle_count=0):
+    """Change a fleet total, or collect the change while deferred.
+
+    Expressions are always applied at once, they depend on the rows at
+    the time of the change.
+    """
+    pending = getattr(_deferred, 'totals', None)
+    if pending is None or not isinstance(total_cost, int):
+        _update_fleet(user_id, total_cost, vehicle_count)
+        return
+
+    cost, count = pending.get(user_id, (0, 0))
+    pending[user_id] = (cost + total_cost, count + vehicle_count)
+
+
+@contextmanager
+def deferred_fleet_totals():
+    """Apply the fleet total changes made inside once per user on exit.
+
+    Must run inside the transaction of the changes.
+    """
+    if getattr(_deferred, 'totals', None) is not None:
+        yield
+        return
+
+    _deferred.totals = pending = {}
+    try:
+        yield
+        _deferred.totals = None
+        for user_id, (total_cost, vehicle_count) in pending.items():
+            if total_cost or vehicle_count:
+                _update_fleet(user_id, total_cost, vehicle_count)
+    finally:
+        _deferred.totals = None
+
+
+def _apply_links(links, user_id, sign):
+    """Add (sign 1) or subtract (sign -1) the parts of links from totals."""
+    Vehicle.objects.filter(pk__in=links.values('vehicle_id')).update(
+        total_cost=F('total_cost') + sign * _sum(
+            links, vehicle_id=OuterRef('pk')),
+    )
+    _add_to_fleet(user_id, sign * _sum(links))
+
+
+@receiver(post_save, sender=get_user_model())
+def create_fleet_total(sender, instance, created, raw, **kwargs):
+    """Start every new user with an empty fleet."""
+    if created and not raw:
+        FleetTotal.objects.create(user=instance)
+
+
+@receiver(post_save, sender=Vehicle)
+def vehicle_saved(sender, instance, created, raw, update_fields, **kwargs):
+    """Count new vehicles and apply price changes to the fleet total.
+
+    Vehicle.save has already applied the change to its total_cost.
+    """
+    if raw:
+        return
+
+    if created:
+        _add_to_fleet(instance.user_id, instance.total_cost, 1)
+    elif getattr(instance, '_price_delta', 0):
+        _add_to_fleet(instance.user_id, instance._price_delta)
+
+
+@receiver(pre_delete, sender=Vehicle)
+def vehicle_deleted(sender, instance, **kwargs):
+    """Remove deleted vehicles from the fleet total.
+
+    Runs before the row goes, so a deferred total_cost can still load.
+    """
+    _add_to_fleet(instance.user_id, -instance.total_cost, -1)
+
+
+@receiver(post_save, sender=Part)
+def part_saved(sender, instance, created, raw, update_fields, **kwargs):
+    """Apply a changed part price to every vehicle using the part.
+
+    The change is the one Part.save read from the locked row.
+    """
+    if raw:
+        return
+
+    delta = getattr(instance, '_price_delta', 0)
+    if not created and delta:
+        links = PartLink.objects.filter(part_id=instance.pk)
+        Vehicle.objects.filter(pk__in=links.values('vehicle_id')).update(
+            total_cost=F('total_cost') + delta)
+        _add_to_fleet(instance.user_id, delta * Coalesce(Subquery(
+            links.annotate(
+                count=Func(F('pk'), function='COUNT'),
+            ).values('count'),
+            output_field=IntegerField(),
+        ), 0))
+
+
+@receiver(pre_delete, sender=Part)
+def part_deleted(sender, instance, **kwargs):
+    """Remove a deleted part from the vehicles using it."""
+    _apply_links(
+        PartLink.objects.filter(part_id=instance.pk), instance.user_id, -1)
+
+
+@receiver(m2m_changed, sender=PartLink)
+def parts_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Apply linked and unlinked parts to the totals.
+
+    Removals are applied before the links go, additions after they
+    exist; pk_set of post_add only holds the newly linked objects. The
+    total_cost of a vehicle whose parts changed is deferred, so it is
+    reloaded once when next read, however many actions ran before.
+    """
+    if action not in ('post_add', 'pre_remove', 'pre_clear'):
+        return
+
+    if reverse:
+        links = PartLink.objects.filter(part_id=instance.pk)
+        related = 'vehicle_id__in'
+    else:
+        links = PartLink.objects.filter(vehicle_id=instance.pk)
+        related = 'part_id__in'
+    if action != 'pre_clear':
+        if not pk_set:
+            return
+        links = links.filter(**{related: pk_set})
+
+    _apply_links(links, instance.user_id, 1 if action == 'post_add' else -1)
+    if not reverse:
+        instance.__dict__.pop('total_cost', None)
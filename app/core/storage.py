@@ -0,0 +1,95 @@
+"""
+Storage for vehicle images.
+"""
+import hashlib
+import os
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+
+
+class VehicleImageStorage(FileSystemStorage):
+    """File system storage with an optional content addressed mode.
+
+    With VEHICLE_IMAGE_CONTENT_ADDRESSED enabled files are named after the
+    SHA-256 of their content, so identical bytes are stored once. Each save
+    takes a reference on the file and each delete releases one, the file is
+    removed after the transaction releasing its last reference commits.
+    """
+
+    @property
+    def content_addressed(self):
+        return getattr(settings, 'VEHICLE_IMAGE_CONTENT_ADDRESSED', False)
+
+    def _blobs(self):
+        return apps.get_model('core', 'ImageBlob').objects
+
+    def content_name(self, name, content):
+        """Return the name under which content is stored."""
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+        ext = os.path.splitext(name)[1].lower()
+
+        return os.path.join(
+            os.path.dirname(name),
+            digest[:2],
+            digest[2:4],
+            f'{digest}{ext}',
+        )
+
+    def save(self, name, content, max_length=None):
+        if not self.content_addressed:
+            return super().save(name, content, max_length=max_length)
+
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.content_name(name, content)
+
+        with transaction.atomic():
+            blob, created = self._blobs().select_for_update().get_or_create(
+                name=name,
+                defaults={'size': content.size},
+            )
+            if not created:
+                self._blobs().filter(pk=blob.pk).update(
+                    ref_count=F('ref_count') + 1)
+            if not self.exists(name):
+                self._save(name, content)
+
+        return name
+
+    def delete(self, name):
+        # Blobs stay reference counted after the mode is switched off.
+        released = self._blobs().filter(name=name, ref_count__gt=0).update(
+            ref_count=F('ref_count') - 1)
+        if released:
+            transaction.on_commit(lambda: self.collect(name))
+        else:
+            super().delete(name)
+
+    def collect(self, name):
+        """Remove the file of name if nothing references it anymore."""
+        with transaction.atomic():
+            blob = self._blobs().select_for_update().filter(name=name).first()
+            if blob is not None and blob.ref_count > 0:
+                return
+            super().delete(name)
+            if blob is not None:
+                blob.delete()
+
+
+_storage = VehicleImageStorage()
+
+
+def vehicle_image_storage():
+    """Return the storage of vehicle images."""
+    return _storage
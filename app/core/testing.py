@@ -0,0 +1,38 @@
+"""
+Test helpers shared by the apps.
+"""
+from core.middleware import view_action
+
+
+class QueryBudgetMixin:
+    """TestCase mixin checking requests against declared query budgets.
+
+    API views declare query_budgets, the maximum number of queries per
+    action, or per lower case HTTP method for views without actions. The
+    queries are those counted by core.middleware.QueryStatsMiddleware.
+    """
+
+    def assertQueryBudget(self, response):
+        """Assert the request of response stayed within its budget.
+
+        The content of streamed responses must be consumed first. Returns
+        the number of queries the request ran.
+        """
+        request = response.wsgi_request
+        counter = getattr(request, 'query_stats', None)
+        if counter is None:
+            self.fail('QueryStatsMiddleware did not count the queries.')
+
+        view = request.resolver_match.func
+        action = view_action(request)
+        budgets = getattr(view.cls, 'query_budgets', {})
+        if action not in budgets:
+            self.fail(f'{view.cls.__name__} has no query budget for {action}.')
+
+        self.assertLessEqual(
+            counter.count,
+            budgets[action],
+            f'{view.cls.__name__}.{action} ran {counter.count} queries, '
+            f'its budget is {budgets[action]}.',
+        )
+        return counter.count
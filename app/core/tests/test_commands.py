@@ -1,13 +1,42 @@
 """
 Test custom Django management commands.
 """
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import (
+    skipIf,
+    skipUnless,
+)
 from unittest.mock import patch
 
 from psycopg2 import OperationalError as Psycopg2OpError
 
-from django.core.management import call_command
-from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.contrib.auth import get_user_model
+from django.core.management import (
+    CommandError,
+    call_command,
+)
+from django.db import connection
+from django.db.utils import (
+    DataError,
+    OperationalError,
+)
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+)
+
+from core.management.commands.bench_api import (
+    SCENARIOS,
+    route_names,
+)
+from core.models import (
+    Vehicle,
+    Tag,
+    Part,
+)
 
 
 @patch('core.management.commands.wait_for_db.Command.check')
@@ -32,3 +61,268 @@ class CommandTests(SimpleTestCase):
 
         self.assertEqual(patched_check.call_count, 6)
         patched_check.assert_called_with(databases=['default'])
+
+
+class IndexUsageCommandTests(TestCase):
+    """Test the index usage report."""
+
+    @skipUnless(connection.vendor == 'postgresql', 'Requires PostgreSQL.')
+    def test_index_usage_lists_core_indexes(self):
+        """Test the report includes the composite indexes."""
+        out = StringIO()
+
+        call_command('index_usage', stdout=out)
+
+        self.assertIn('core_vehicle_user_id_idx', out.getvalue())
+        self.assertIn('core_tag_user_name_uniq', out.getvalue())
+
+    @skipIf(connection.vendor == 'postgresql', 'Requires another database.')
+    def test_index_usage_requires_postgresql(self):
+        """Test the report fails cleanly on other databases."""
+        with self.assertRaises(CommandError):
+            call_command('index_usage')
+
+
+class ImportVehiclesCommandTests(TestCase):
+    """Test importing vehicles from files."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='test123',
+        )
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def write_ndjson(self, records, name='vehicles.ndjson'):
+        return self.write(
+            name, ''.join(json.dumps(record) + '\n' for record in records))
+
+    def import_vehicles(self, path, *args):
+        out = StringIO()
+        call_command(
+            'import_vehicles', path, '--user', self.user.email, *args,
+            stdout=out,
+        )
+        return out.getvalue()
+
+    def test_import_ndjson(self):
+        """Test importing vehicles with tags and parts from NDJSON."""
+        existing = Tag.objects.create(user=self.user, name='Classic')
+        Part.objects.create(user=self.user, name='Tyre', price=50)
+        path = self.write_ndjson([
+            {
+                'title': 'Car', 'year': 1970, 'price': 5000,
+                'tags': [{'id': 999, 'name': 'Classic'}, {'name': 'Red'}],
+                'parts': [{'name': 'Tyre', 'price': 90}],
+            },
+            {'title': 'Truck', 'year': 2010, 'price': 9000, 'tags': ['Red']},
+        ])
+
+        out = self.import_vehicles(path)
+
+        self.assertIn('Imported 2 vehicles', out)
+        self.assertIn('rows/s', out)
+        car = Vehicle.objects.get(user=self.user, title='Car')
+        truck = Vehicle.objects.get(user=self.user, title='Truck')
+        self.assertEqual(
+            sorted(car.tags.values_list('name', flat=True)),
+            ['Classic', 'Red'],
+        )
+        self.assertIn(existing, car.tags.all())
+        self.assertEqual(list(truck.tags.values_list('name', flat=True)),
+                         ['Red'])
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(Part.objects.get(user=self.user).price, 50)
+
+    def test_import_csv_round_trip(self):
+        """Test a CSV file written by the export API imports back."""
+        path = self.write('vehicles.csv', (
+            'id,title,description,year,price,link,tags,parts\r\n'
+            '7,"Car, blue",Fast,2001,100,,"[""Sport""]",'
+            '"[{""name"":""Seat"",""price"":20}]"\r\n'
+        ))
+
+        self.import_vehicles(path)
+
+        vehicle = Vehicle.objects.get(user=self.user)
+        self.assertEqual(vehicle.title, 'Car, blue')
+        self.assertEqual(vehicle.description, 'Fast')
+        self.assertEqual(vehicle.tags.get().name, 'Sport')
+        self.assertEqual(vehicle.parts.get().price, 20)
+
+    def test_import_commits_in_chunks(self):
+        """Test chunks before an invalid record stay imported."""
+        records = [
+            {'title': f'Vehicle {index}', 'year': 2000, 'price': index}
+            for index in range(5)
+        ]
+        records[3]['year'] = 'unknown'
+        path = self.write_ndjson(records)
+
+        with self.assertRaisesMessage(CommandError, 'after 2 imported'):
+            self.import_vehicles(path, '--chunk-size', '2')
+
+        self.assertEqual(Vehicle.objects.filter(user=self.user).count(), 2)
+
+    def test_import_validates_field_limits(self):
+        """Test names and numbers the database would reject fail by line."""
+        valid = {'title': 'Car', 'year': 2000, 'price': 100}
+        for change, message in (
+            ({'tags': ['x' * 256]}, 'tag name'),
+            ({'parts': [{'name': 'x' * 256, 'price': 1}]}, 'part name'),
+            ({'parts': [{'name': 'Tyre', 'price': 2 ** 31}]}, 'part price'),
+            ({'year': 2 ** 31}, 'vehicle year'),
+            ({'price': -2 ** 31 - 1}, 'vehicle price'),
+            ({'link': 'x' * 256}, 'vehicle link'),
+        ):
+            path = self.write_ndjson([valid, {**valid, **change}])
+
+            with self.assertRaisesMessage(
+                CommandError, f'line 2 after 0 imported vehicles: {message}',
+            ):
+                self.import_vehicles(path)
+
+        self.assertFalse(Vehicle.objects.exists())
+
+    def test_import_reports_line_of_invalid_json(self):
+        """Test unreadable lines are reported with their number."""
+        path = self.write(
+            'vehicles.ndjson',
+            '{"title": "Car", "year": 2000, "price": 1}\n\n{"title"\n')
+
+        with self.assertRaisesMessage(CommandError, 'on line 3 after 0'):
+            self.import_vehicles(path)
+
+    @patch(
+        'core.management.commands.import_vehicles.Command.import_chunk',
+        side_effect=DataError('integer out of range'),
+    )
+    def test_import_database_error(self, patched_import):
+        """Test database errors fail with the lines of the chunk."""
+        path = self.write_ndjson([
+            {'title': f'Vehicle {index}', 'year': 2000, 'price': index}
+            for index in range(3)
+        ])
+
+        with self.assertRaisesMessage(
+            CommandError,
+            'records on lines 1 to 2 after 0 imported vehicles: '
+            'integer out of range',
+        ):
+            self.import_vehicles(path, '--chunk-size', '2')
+
+    def test_import_unknown_user(self):
+        """Test importing for a missing user fails."""
+        path = self.write_ndjson([])
+
+        with self.assertRaises(CommandError):
+            call_command('import_vehicles', path, '--user', 'no@example.com')
+
+    def test_import_unknown_format(self):
+        """Test a file without a known extension needs --format."""
+        path = self.write('vehicles.txt', '')
+
+        with self.assertRaises(CommandError):
+            self.import_vehicles(path)
+        self.import_vehicles(path, '--format', 'ndjson')
+
+
+class BenchApiCommandTests(TestCase):
+    """Test the API benchmark."""
+
+    def bench(self, *args):
+        out = StringIO()
+        call_command(
+            'bench_api', '--users', '1', '--vehicles', '5', '--requests', '3',
+            '--concurrency', '1', '--allow-writes', *args,
+            stdout=out, stderr=StringIO(),
+        )
+
+        return json.loads(out.getvalue())
+
+    def test_scenarios_cover_every_route(self):
+        """Test every vehicle and user route has a scenario."""
+        covered = {route for route, _, _ in SCENARIOS}
+
+        self.assertLessEqual(route_names(), covered)
+
+    def test_bench_reports_routes(self):
+        """Test the report has statistics per route and removes its data."""
+        report = self.bench('--route', 'vehicle-list', '--route', 'user:me')
+
+        self.assertEqual(
+            [(result['method'], result['route'])
+             for result in report['results']],
+            [
+                ('GET', 'vehicle:vehicle-list'),
+                ('POST', 'vehicle:vehicle-list'),
+                ('GET', 'user:me'),
+                ('PATCH', 'user:me'),
+            ],
+        )
+        for result in report['results']:
+            self.assertEqual(result['requests'], 3)
+            self.assertEqual(result['errors'], 0)
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+            self.assertGreater(result['throughput_rps'], 0)
+        self.assertGreater(report['results'][1]['queries_mean'], 0)
+        self.assertFalse(get_user_model().objects.exists())
+        self.assertFalse(Vehicle.objects.exists())
+
+    def test_bench_response_cache(self):
+        """Test reads miss the cache unless it is kept enabled."""
+        report = self.bench('--route', 'vehicle-detail')
+        self.assertFalse(report['response_cache'])
+        self.assertEqual(report['results'][0]['cache'], {'MISS': 3})
+
+        report = self.bench(
+            '--route', 'vehicle-detail', '--requests', '20',
+            '--response-cache')
+        self.assertTrue(report['response_cache'])
+        self.assertIn('HIT', report['results'][0]['cache'])
+
+    def test_bench_requires_allow_writes(self):
+        """Test the benchmark refuses to write without --allow-writes."""
+        with self.assertRaises(CommandError):
+            call_command('bench_api', stdout=StringIO())
+
+        self.assertFalse(get_user_model().objects.exists())
+
+    def test_bench_invalid_concurrency(self):
+        """Test concurrency levels must be positive numbers."""
+        with self.assertRaises(CommandError):
+            self.bench('--concurrency', '0')
+
+
+class BenchJsonCommandTests(SimpleTestCase):
+    """Test the JSON renderer and parser benchmark."""
+
+    def test_bench_reports_payloads(self):
+        """Test every payload is timed and renders identical bytes."""
+        out = StringIO()
+        call_command(
+            'bench_json', '--vehicles', '20', '--repeat', '2', stdout=out)
+
+        report = json.loads(out.getvalue())
+        self.assertEqual(
+            [result['payload'] for result in report['results']],
+            ['vehicle-list', 'vehicle-list-facets', 'vehicle-detail',
+             'tag-list'],
+        )
+        for result in report['results']:
+            self.assertTrue(result['identical_output'])
+            self.assertTrue(result['identical_parse'])
+            self.assertGreater(result['render']['stdlib_p50_ms'], 0)
+            self.assertGreater(result['parse']['speedup'], 0)
+
+    def test_invalid_arguments(self):
+        """Test non positive sizes are rejected."""
+        with self.assertRaises(CommandError):
+            call_command('bench_json', '--repeat', '0', stdout=StringIO())
@@ -0,0 +1,255 @@
+"""
+Tests for the Prometheus metrics endpoint.
+"""
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.test import (
+    TestCase,
+    override_settings,
+)
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import metrics
+from core.models import (
+    Vehicle,
+    Tag,
+)
+
+
+METRICS_URL = reverse('metrics')
+VEHICLES_URL = reverse('vehicle:vehicle-list')
+
+
+def sample(text, name, **labels):
+    """Return the value of a sample in the exposition text, or None."""
+    if labels:
+        name += '{' + metrics._labels(**labels) + '}'
+    for line in text.splitlines():
+        if line.startswith(name + ' '):
+            return float(line.rsplit(' ', 1)[1])
+
+    return None
+
+
+def exited_pid():
+    """Return the pid of a process that has exited."""
+    process = subprocess.Popen([sys.executable, '-c', ''])
+    process.wait()
+
+    return process.pid
+
+
+@override_settings(METRICS={})
+class MetricsTests(TestCase):
+    """Test collecting and serving request metrics."""
+
+    def setUp(self):
+        metrics.reset()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='testpass123')
+        token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        vehicle = Vehicle.objects.create(
+            user=self.user, title='mx5', year=1992, price=12000)
+        vehicle.tags.add(Tag.objects.create(user=self.user, name='classic'))
+
+    def test_request_histogram_and_phases(self):
+        """Test requests are observed per route and action with phases."""
+        responses = [
+            self.client.get(VEHICLES_URL),
+            self.client.get(VEHICLES_URL, {'year_min': 1990}),
+        ]
+        self.client.post(VEHICLES_URL, {'title': 'invalid'}, format='json')
+
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res['Content-Type'], metrics.CONTENT_TYPE)
+        text = res.content.decode()
+        route = {'route': 'vehicle:vehicle-list', 'action': 'list'}
+        self.assertEqual(sample(
+            text, 'api_request_duration_seconds_count', **route), 2)
+        self.assertEqual(sample(
+            text, 'api_request_duration_seconds_bucket', **route, le='+Inf'),
+            2)
+        self.assertEqual(sample(
+            text, 'api_request_duration_seconds_count',
+            route='vehicle:vehicle-list', action='create'), 1)
+        self.assertEqual(
+            sample(text, 'api_db_queries_total', **route),
+            sum(res.wsgi_request.query_stats.count for res in responses))
+        for phase in metrics.PHASES:
+            self.assertGreater(sample(
+                text, 'api_request_phase_seconds_total', **route,
+                phase=phase), 0)
+        self.assertEqual(sample(text, 'api_requests_in_flight'), 1)
+        self.assertIsNotNone(sample(
+            text, 'api_response_cache_requests_total', result='hit'))
+        self.assertEqual(sample(text, 'vehicle_image_queue_depth'), 0)
+
+    def test_buckets_are_cumulative(self):
+        """Test bucket counts never decrease and end at the count."""
+        self.client.get(VEHICLES_URL)
+        self.client.get(reverse('vehicle:vehicle-summary'))
+
+        text = self.client.get(METRICS_URL).content.decode()
+
+        counts = [
+            int(value) for value in re.findall(
+                r'^api_request_duration_seconds_bucket\{route="'
+                r'vehicle:vehicle-list".*\} (\d+)$',
+                text, re.MULTILINE)
+        ]
+        self.assertEqual(len(counts), len(metrics.DEFAULTS['BUCKETS']) + 1)
+        self.assertEqual(counts, sorted(counts))
+        self.assertEqual(counts[-1], 1)
+
+    def test_unresolved_requests_not_observed(self):
+        """Test requests to unknown URLs do not add routes."""
+        self.client.get('/unknown/')
+
+        text = self.client.get(METRICS_URL).content.decode()
+
+        self.assertNotIn('/unknown/', text)
+        self.assertNotIn('api_request_duration_seconds_count{', text)
+
+    def test_registered_metrics(self):
+        """Test metrics registered by apps are collected and labeled."""
+        values = {'a"b': 2, 'c': 3}
+        metrics.register(
+            'test_total', 'counter', 'Test counter.', lambda: values,
+            label='kind')
+        self.addCleanup(metrics._collectors.pop, 'test_total')
+
+        text = self.client.get(METRICS_URL).content.decode()
+
+        self.assertIn('# TYPE test_total counter', text)
+        self.assertEqual(sample(text, 'test_total', kind='a"b'), 2)
+        self.assertEqual(sample(text, 'test_total', kind='c'), 3)
+
+    @override_settings(METRICS={'ALLOWED_IPS': ['10.0.0.0/8', '::1']})
+    def test_access_restricted(self):
+        """Test only allowed addresses and staff users get the metrics."""
+        res = self.client.get(METRICS_URL)
+        self.assertEqual(res.status_code, 403)
+        res = self.client.get(METRICS_URL, HTTP_X_FORWARDED_FOR='10.0.0.1')
+        self.assertEqual(res.status_code, 403)
+
+        res = self.client.get(METRICS_URL, REMOTE_ADDR='10.1.2.3')
+        self.assertEqual(res.status_code, 200)
+
+        staff = get_user_model().objects.create_user(
+            email='staff@example.com', password='testpass123',
+            is_staff=True)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(METRICS_URL).status_code, 403)
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get(METRICS_URL).status_code, 200)
+
+    def test_label_escaping(self):
+        """Test label values are escaped."""
+        self.assertEqual(
+            metrics._labels(route='a"b\\c\nd'), 'route="a\\"b\\\\c\\nd"')
+
+
+class MultiProcessMetricsTests(TestCase):
+    """Test merging the metrics written by several processes."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        settings = override_settings(METRICS={'DIR': self.directory.name})
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='testpass123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def write_snapshot(self, pid, **values):
+        """Write the snapshot of another process."""
+        buckets = list(metrics.DEFAULTS['BUCKETS'])
+        counts = [0] * (len(buckets) + 1) + [0.5]
+        counts[0] = 3
+        snapshot = {
+            'buckets': buckets,
+            'requests': [['vehicle:vehicle-list', 'list', counts]],
+            'queries': [['vehicle:vehicle-list', 'list', 9]],
+            'phases': [['vehicle:vehicle-list', 'list', 'db', 0.25]],
+            'in_flight': 2,
+            'metrics': {
+                'api_response_cache_requests_total': {
+                    'type': 'counter',
+                    'help': 'Response cache lookups.',
+                    'label': 'result',
+                    'values': {'hit': 4, 'miss': 1},
+                },
+                'vehicle_image_queue_depth': {
+                    'type': 'gauge',
+                    'help': 'Images queued or being processed.',
+                    'label': None,
+                    'values': {'': 5},
+                },
+            },
+            **values,
+        }
+        path = os.path.join(self.directory.name, f'{pid}.json')
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(snapshot, file)
+
+    def test_snapshots_are_merged(self):
+        """Test the metrics of live processes are summed with ours."""
+        res = self.client.get(VEHICLES_URL)
+        self.write_snapshot(os.getppid())
+
+        text = self.client.get(METRICS_URL).content.decode()
+
+        route = {'route': 'vehicle:vehicle-list', 'action': 'list'}
+        self.assertEqual(sample(
+            text, 'api_request_duration_seconds_count', **route), 4)
+        self.assertEqual(
+            sample(text, 'api_db_queries_total', **route),
+            9 + res.wsgi_request.query_stats.count)
+        self.assertGreaterEqual(sample(
+            text, 'api_request_duration_seconds_sum', **route), 0.5)
+        self.assertGreaterEqual(sample(
+            text, 'api_request_phase_seconds_total', **route, phase='db'),
+            0.25)
+        self.assertEqual(sample(text, 'api_requests_in_flight'), 3)
+        self.assertEqual(sample(text, 'vehicle_image_queue_depth'), 5)
+        self.assertGreaterEqual(sample(
+            text, 'api_response_cache_requests_total', result='hit'), 4)
+
+    def test_exited_process_keeps_counters_only(self):
+        """Test gauges of exited processes are dropped, counters kept."""
+        self.write_snapshot(exited_pid())
+
+        text = self.client.get(METRICS_URL).content.decode()
+
+        self.assertEqual(sample(
+            text, 'api_request_duration_seconds_count',
+            route='vehicle:vehicle-list', action='list'), 3)
+        self.assertEqual(sample(text, 'api_requests_in_flight'), 1)
+        self.assertEqual(sample(text, 'vehicle_image_queue_depth'), 0)
+
+    def test_own_snapshot_written(self):
+        """Test this process writes its snapshot atomically."""
+        self.client.get(VEHICLES_URL)
+        metrics.flush(force=True)
+
+        self.assertEqual(
+            os.listdir(self.directory.name), [f'{os.getpid()}.json'])
+        path = os.path.join(self.directory.name, f'{os.getpid()}.json')
+        with open(path, encoding='utf-8') as file:
+            snapshot = json.load(file)
+        self.assertEqual(snapshot['requests'][0][:2], [
+            'vehicle:vehicle-list', 'list'])
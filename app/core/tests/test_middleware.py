@@ -0,0 +1,78 @@
+"""
+Tests for the query statistics middleware.
+"""
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import (
+    TestCase,
+    override_settings,
+)
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.models import (
+    Vehicle,
+    Tag,
+)
+from core.testing import QueryBudgetMixin
+from vehicle.views import VehicleViewSet
+
+
+VEHICLES_URL = reverse('vehicle:vehicle-list')
+
+
+class QueryStatsMiddlewareTests(QueryBudgetMixin, TestCase):
+    """Test counting the queries of requests."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='testpass123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        vehicle = Vehicle.objects.create(
+            user=self.user, title='mx5', year=1992, price=12000)
+        vehicle.tags.add(Tag.objects.create(user=self.user, name='classic'))
+
+    @override_settings(QUERY_STATS={'HEADERS': True})
+    def test_headers(self):
+        """Test the query count and time are added as headers."""
+        res = self.client.get(VEHICLES_URL)
+
+        self.assertEqual(res['X-DB-Queries'], '3')
+        self.assertRegex(
+            res['Server-Timing'], r'^db;dur=\d+\.\d{3};desc="3 queries"$')
+
+    @override_settings(QUERY_STATS={'HEADERS': False})
+    def test_headers_disabled(self):
+        """Test no headers are added when disabled."""
+        res = self.client.get(VEHICLES_URL)
+
+        self.assertNotIn('X-DB-Queries', res)
+        self.assertNotIn('Server-Timing', res)
+
+    def test_streamed_response_counted_when_consumed(self):
+        """Test streamed queries are counted while the content is read."""
+        res = self.client.get(reverse('vehicle:vehicle-export'))
+        before = res.wsgi_request.query_stats.count
+        b''.join(res.streaming_content)
+
+        self.assertLess(before, 3)
+        self.assertEqual(self.assertQueryBudget(res), 3)
+
+    def test_query_budget_exceeded(self):
+        """Test the budget helper fails for requests over budget."""
+        res = self.client.get(VEHICLES_URL)
+
+        with patch.dict(VehicleViewSet.query_budgets, {'list': 2}):
+            with self.assertRaisesMessage(AssertionError, 'ran 3 queries'):
+                self.assertQueryBudget(res)
+
+    def test_query_budget_undeclared(self):
+        """Test the budget helper fails for actions without a budget."""
+        res = self.client.get(VEHICLES_URL)
+
+        with patch.dict(VehicleViewSet.query_budgets, clear=True):
+            with self.assertRaisesMessage(AssertionError, 'no query budget'):
+                self.assertQueryBudget(res)
@@ -1,11 +1,21 @@
 """
 Tests for models.
 """
+import threading
 from unittest.mock import patch
-from django.test import TestCase
+from django.db import (
+    IntegrityError,
+    connection,
+)
+from django.test import (
+    TestCase,
+    TransactionTestCase,
+    skipUnlessDBFeature,
+)
 from django.contrib.auth import get_user_model
 
 from core import models
+from core.signals import deferred_fleet_totals
 
 
 def create_user(email='user@example.com', password='testpass123'):
@@ -71,6 +81,31 @@ class ModelTests(TestCase):
 
         self.assertEqual(str(vehicle), f"{vehicle.year} {vehicle.title}")
 
+    def test_vehicle_save_after_refresh(self):
+        """Test values reverted after a save or refresh are written."""
+        user = get_user_model().objects.create_user(
+            'test@example.com',
+            'testpass123'
+        )
+        created = models.Vehicle.objects.create(
+            user=user, title='A', year=1992, price=5)
+        vehicle = models.Vehicle.objects.get(pk=created.pk)
+
+        vehicle.title = 'B'
+        vehicle.save()
+        vehicle.title = 'A'
+        vehicle.save()
+        created.refresh_from_db()
+        self.assertEqual(created.title, 'A')
+
+        created.title = 'B'
+        created.save()
+        vehicle.refresh_from_db()
+        vehicle.title = 'A'
+        vehicle.save()
+        created.refresh_from_db()
+        self.assertEqual(created.title, 'A')
+
     def test_create_tag(self):
         """Test creating a tag is successful"""
         user = create_user()
@@ -97,3 +132,228 @@ class ModelTests(TestCase):
         file_path = models.vehicle_image_file_path(None, 'example.jpg')
 
         self.assertEqual(file_path, f'uploads/vehicle/{uuid}.jpg')
+
+    def test_get_or_create_many_tags(self):
+        """Test resolving tags reuses existing ones and creates the rest."""
+        user = create_user()
+        existing = models.Tag.objects.create(user=user, name='car')
+        other_user = create_user(email='other@example.com')
+        models.Tag.objects.create(user=other_user, name='classic')
+
+        tags = models.Tag.objects.get_or_create_many(
+            user,
+            [{'name': 'car'}, {'name': 'classic'}, {'name': 'car'}],
+        )
+
+        self.assertEqual([tag.name for tag in tags], ['car', 'classic'])
+        self.assertEqual(tags[0], existing)
+        self.assertEqual(tags[1].user, user)
+        self.assertEqual(models.Tag.objects.filter(user=user).count(), 2)
+
+    def test_get_or_create_many_parts_keeps_price(self):
+        """Test existing parts keep their price, new ones take theirs."""
+        user = create_user()
+        existing = models.Part.objects.create(
+            user=user, name='exhaust', price=100)
+
+        parts = models.Part.objects.get_or_create_many(
+            user,
+            [
+                {'name': 'exhaust', 'price': 200},
+                {'name': 'wheels', 'price': 300},
+            ],
+        )
+
+        self.assertEqual(parts[0], existing)
+        existing.refresh_from_db()
+        self.assertEqual(existing.price, 100)
+        self.assertEqual(parts[1].price, 300)
+        self.assertEqual(models.Part.objects.filter(user=user).count(), 2)
+
+    def test_get_or_create_many_query_count(self):
+        """Test resolving many new tags runs a fixed number of queries."""
+        user = create_user()
+        items = [{'name': f'tag-{i}'} for i in range(50)]
+
+        with self.assertNumQueries(3):
+            tags = models.Tag.objects.get_or_create_many(user, items)
+
+        self.assertEqual(len(tags), 50)
+        with self.assertNumQueries(1):
+            models.Tag.objects.get_or_create_many(user, items)
+
+    def test_tag_name_unique_per_user(self):
+        """Test a user cannot have two tags with the same name."""
+        user = create_user()
+        models.Tag.objects.create(user=user, name='car')
+        models.Tag.objects.create(
+            user=create_user(email='other@example.com'), name='car')
+
+        with self.assertRaises(IntegrityError):
+            models.Tag.objects.create(user=user, name='car')
+
+
+class TotalCostTests(TestCase):
+    """Test the incrementally maintained total cost aggregates."""
+
+    def setUp(self):
+        self.user = create_user()
+        self.car = models.Vehicle.objects.create(
+            user=self.user, title='Car', year=2000, price=1000)
+        self.truck = models.Vehicle.objects.create(
+            user=self.user, title='Truck', year=2010, price=5000)
+        self.engine = models.Part.objects.create(
+            user=self.user, name='Engine', price=300)
+        self.tyre = models.Part.objects.create(
+            user=self.user, name='Tyre', price=50)
+
+    def assertTotals(self, car, truck):
+        """Assert the stored totals and that they match a full recompute."""
+        self.car.refresh_from_db()
+        self.truck.refresh_from_db()
+        self.assertEqual((self.car.total_cost, self.truck.total_cost),
+                         (car, truck))
+        fleet = models.FleetTotal.objects.get(user=self.user)
+        self.assertEqual(
+            (fleet.vehicle_count, fleet.total_cost), (2, car + truck))
+
+        models.Vehicle.objects.recompute_total_cost()
+        self.assertEqual(
+            models.FleetTotal.objects.recompute(self.user.pk).total_cost,
+            car + truck,
+        )
+        self.car.refresh_from_db()
+        self.assertEqual(self.car.total_cost, car)
+
+    def test_new_vehicle_total_is_price(self):
+        """Test new vehicles cost their price and join the fleet."""
+        self.assertEqual(self.car.total_cost, 1000)
+        self.assertTotals(1000, 5000)
+
+    def test_linking_parts(self):
+        """Test adding and removing parts from either side."""
+        self.car.parts.add(self.engine, self.tyre)
+        self.assertEqual(self.car.total_cost, 1350)
+        self.engine.vehicle_set.add(self.truck, self.car)
+        self.assertTotals(1350, 5300)
+
+        self.car.parts.remove(self.tyre, self.tyre.pk + 100)
+        self.assertEqual(self.car.total_cost, 1300)
+        self.engine.vehicle_set.remove(self.truck)
+        self.assertTotals(1300, 5000)
+
+        self.truck.parts.add(self.tyre)
+        self.car.parts.clear()
+        self.tyre.vehicle_set.clear()
+        self.assertTotals(1000, 5000)
+
+    def test_part_price_change(self):
+        """Test a new part price reaches every vehicle using it."""
+        self.car.parts.add(self.engine)
+        self.truck.parts.add(self.engine, self.tyre)
+
+        engine = models.Part.objects.get(pk=self.engine.pk)
+        engine.price = 400
+        engine.save()
+        self.assertTotals(1400, 5450)
+
+        models.Part.objects.get_or_create_many(
+            self.user, [{'name': 'Tyre', 'price': 60}])
+        self.assertTotals(1400, 5450)
+
+    def test_part_deleted(self):
+        """Test deleting a part removes its price from the vehicles."""
+        self.car.parts.add(self.engine, self.tyre)
+
+        self.engine.delete()
+
+        self.assertTotals(1050, 5000)
+
+    def test_vehicle_price_change_keeps_parts(self):
+        """Test saving a stale vehicle keeps the parts in its total."""
+        stale = models.Vehicle.objects.get(pk=self.car.pk)
+        self.car.parts.add(self.engine)
+
+        stale.price = 2000
+        stale.save()
+
+        self.assertEqual(stale.total_cost, 2300)
+        self.assertTotals(2300, 5000)
+
+    def test_concurrent_price_changes(self):
+        """Test saving two instances loaded from the same row."""
+        self.car.parts.add(self.engine)
+        first = models.Vehicle.objects.get(pk=self.car.pk)
+        second = models.Vehicle.objects.get(pk=self.car.pk)
+
+        first.price = 2000
+        first.save()
+        second.price = 3000
+        second.save()
+
+        self.assertEqual(second.total_cost, 3300)
+        self.assertTotals(3300, 5000)
+
+    def test_concurrent_part_price_changes(self):
+        """Test saving two part instances loaded from the same row."""
+        self.car.parts.add(self.engine)
+        self.truck.parts.add(self.engine)
+        first = models.Part.objects.get(pk=self.engine.pk)
+        second = models.Part.objects.get(pk=self.engine.pk)
+
+        first.price = 400
+        first.save()
+        second.price = 100
+        second.save()
+
+        self.assertTotals(1100, 5100)
+
+    def test_vehicle_deleted(self):
+        """Test deleting a vehicle removes it from the fleet."""
+        self.car.parts.add(self.engine)
+
+        self.car.delete()
+
+        fleet = models.FleetTotal.objects.get(user=self.user)
+        self.assertEqual((fleet.vehicle_count, fleet.total_cost), (1, 5000))
+
+    def test_deferred_fleet_totals(self):
+        """Test deferred fleet changes are applied once on exit."""
+        self.car.parts.add(self.engine)
+
+        with self.assertNumQueries(5):
+            with deferred_fleet_totals():
+                models.Vehicle.objects.filter(user=self.user).delete()
+
+        fleet = models.FleetTotal.objects.get(user=self.user)
+        self.assertEqual((fleet.vehicle_count, fleet.total_cost), (0, 0))
+
+
+@skipUnlessDBFeature('supports_ignore_conflicts')
+class ConcurrentAttrCreationTests(TransactionTestCase):
+    """Test creating attributes from concurrent transactions."""
+
+    def test_concurrent_get_or_create_many(self):
+        """Test concurrent requests do not create duplicate tags."""
+        user = create_user()
+        workers = 4
+        barrier = threading.Barrier(workers)
+
+        def resolve():
+            try:
+                barrier.wait()
+                models.Tag.objects.get_or_create_many(
+                    user, [{'name': 'shared'}])
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=resolve) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(
+            models.Tag.objects.filter(user=user, name='shared').count(),
+            1,
+        )
@@ -0,0 +1,171 @@
+"""
+Tests for the fast JSON renderer and parser.
+"""
+import datetime
+import io
+import uuid
+from decimal import Decimal
+from unittest import skipIf
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+from django.utils.translation import gettext_lazy
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core import (
+    parsers,
+    renderers,
+)
+from core.parsers import FastJSONParser
+from core.renderers import FastJSONRenderer
+
+
+PAYLOAD = {
+    'id': 1,
+    'title': 'Zażółć "gęślą" \\ jaźń\n  ',
+    'price': -5,
+    'ratio': 0.1,
+    'none': None,
+    'flags': [True, False],
+    'created': datetime.datetime(
+        2021, 5, 4, 3, 2, 1, 123456, tzinfo=datetime.timezone.utc),
+    'day': datetime.date(2021, 5, 4),
+    'at': datetime.time(3, 2, 1, 500),
+    'took': datetime.timedelta(seconds=90),
+    'amount': Decimal('12.50'),
+    'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+    'label': gettext_lazy('label'),
+    'counts': {1: 'one', 2: 'two'},
+    'nested': [{'tags': ({'id': 1, 'name': 'classic'},)}],
+}
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    """Test the fast renderer produces the JSONRenderer bytes."""
+
+    def assertSameOutput(self, data, *args):
+        """Assert both renderers produce the same bytes for data."""
+        self.assertEqual(
+            FastJSONRenderer().render(data, *args),
+            JSONRenderer().render(data, *args),
+        )
+
+    def test_same_output(self):
+        """Test the payload renders to identical bytes."""
+        self.assertSameOutput(PAYLOAD)
+        self.assertSameOutput([PAYLOAD] * 3)
+        self.assertSameOutput(None)
+        self.assertSameOutput({})
+
+    def test_same_output_floats(self):
+        """Test floats render in the notation of JSONRenderer."""
+        for value in (
+            1e16, 1e-07, 1e-05, 0.0001, 1.5e300, -2.5e-10, 5e-324,
+            1e15, 123456789.125, -0.0, 1 / 3,
+        ):
+            with self.subTest(value=value):
+                self.assertSameOutput({'value': value})
+                self.assertSameOutput([value, 'x'])
+
+    @skipIf(renderers.orjson is None, 'Requires orjson.')
+    def test_non_finite_floats(self):
+        """Test NaN and Infinity render as null, unlike JSONRenderer."""
+        for value in (float('nan'), float('inf'), float('-inf')):
+            with self.assertRaises(ValueError):
+                JSONRenderer().render([value])
+
+            self.assertEqual(FastJSONRenderer().render([value]), b'[null]')
+
+    @skipIf(renderers.orjson is None, 'Requires orjson.')
+    def test_fallbacks(self):
+        """Test output orjson cannot produce is rendered by json."""
+        self.assertSameOutput({'big': 2 ** 70})
+        self.assertSameOutput(PAYLOAD, 'application/json; indent=4')
+
+        fast, renderer = FastJSONRenderer(), JSONRenderer()
+        fast.ensure_ascii = renderer.ensure_ascii = True
+        self.assertEqual(fast.render(PAYLOAD), renderer.render(PAYLOAD))
+
+    def test_unsupported_type(self):
+        """Test unsupported types fail like with JSONRenderer."""
+        with self.assertRaises(TypeError):
+            FastJSONRenderer().render({'value': object()})
+
+    @patch.object(renderers, 'orjson', None)
+    def test_without_orjson(self):
+        """Test the renderer falls back to json when orjson is missing."""
+        self.assertSameOutput(PAYLOAD)
+
+
+class FastJSONParserTests(SimpleTestCase):
+    """Test the fast parser parses like JSONParser."""
+
+    def parse(self, parser, body, **context):
+        """Parse body with parser."""
+        return parser.parse(io.BytesIO(body), parser_context=context)
+
+    def test_same_result(self):
+        """Test rendered payloads parse to the same data."""
+        body = JSONRenderer().render(PAYLOAD)
+
+        self.assertEqual(
+            self.parse(FastJSONParser(), body),
+            self.parse(JSONParser(), body),
+        )
+
+    def test_invalid(self):
+        """Test invalid JSON and constants raise a parse error."""
+        for body in (b'{"a":', b'{"a": NaN}', b'[Infinity]', b'\xff'):
+            with self.assertRaisesMessage(ParseError, 'JSON parse error'):
+                self.parse(FastJSONParser(), body)
+
+    def test_numbers_and_strings_json_accepts(self):
+        """Test values orjson rejects or rounds parse like with json."""
+        for body in (
+            b'[18446744073709551616, -9223372036854775809]',
+            b'{"id": 123456789012345678901234567890}',
+            b'{"ratio": 0.12345678901234567890123}',
+            b'"\\ud800 lone surrogate"',
+            b'[1e400, -1e400]',
+        ):
+            with self.subTest(body=body):
+                self.assertEqual(
+                    self.parse(FastJSONParser(), body),
+                    self.parse(JSONParser(), body),
+                )
+
+        self.assertEqual(
+            self.parse(FastJSONParser(), b'[18446744073709551616]'),
+            [2 ** 64],
+        )
+
+    def test_invalid_same_error(self):
+        """Test parse errors read like those of JSONParser."""
+        body = b'{"title": "mx5",}'
+        with self.assertRaises(ParseError) as expected:
+            self.parse(JSONParser(), body)
+
+        with self.assertRaises(ParseError) as actual:
+            self.parse(FastJSONParser(), body)
+
+        self.assertEqual(str(actual.exception), str(expected.exception))
+
+    def test_other_encoding(self):
+        """Test bodies in other encodings are decoded by json."""
+        body = '{"title": "Zażółć"}'.encode('utf-16')
+
+        self.assertEqual(
+            self.parse(FastJSONParser(), body, encoding='utf-16'),
+            {'title': 'Zażółć'},
+        )
+
+    @patch.object(parsers, 'orjson', None)
+    def test_without_orjson(self):
+        """Test the parser falls back to json when orjson is missing."""
+        self.assertEqual(
+            self.parse(FastJSONParser(), b'{"a": [1, 2.5]}'),
+            {'a': [1, 2.5]},
+        )
@@ -0,0 +1,95 @@
+"""
+Tests for the vehicle image storage.
+"""
+import hashlib
+import shutil
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.test import (
+    TestCase,
+    override_settings,
+)
+
+from core.models import ImageBlob
+from core.storage import VehicleImageStorage
+
+
+@override_settings(VEHICLE_IMAGE_CONTENT_ADDRESSED=True)
+class ContentAddressedStorageTests(TestCase):
+    """Tests for the content addressed mode."""
+
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.storage = VehicleImageStorage(location=self.location)
+
+    def tearDown(self):
+        shutil.rmtree(self.location)
+
+    def test_name_from_content_hash(self):
+        """Test files are named after the SHA-256 of their content."""
+        digest = hashlib.sha256(b'photo').hexdigest()
+        name = self.storage.save(
+            'uploads/vehicle/random.JPG', ContentFile(b'photo'))
+
+        self.assertEqual(
+            name, f'uploads/vehicle/{digest[:2]}/{digest[2:4]}/{digest}.jpg')
+        with self.storage.open(name) as stored:
+            self.assertEqual(stored.read(), b'photo')
+
+    def test_identical_content_stored_once(self):
+        """Test saving identical bytes twice references one file."""
+        first = self.storage.save('uploads/vehicle/a.jpg', ContentFile(b'x'))
+        second = self.storage.save('uploads/vehicle/b.jpg', ContentFile(b'x'))
+        other = self.storage.save('uploads/vehicle/c.jpg', ContentFile(b'y'))
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        blob = ImageBlob.objects.get(name=first)
+        self.assertEqual(blob.ref_count, 2)
+        self.assertEqual(blob.size, 1)
+
+    def test_file_deleted_with_last_reference(self):
+        """Test a file is removed only once nothing references it."""
+        name = self.storage.save('uploads/vehicle/a.jpg', ContentFile(b'x'))
+        self.storage.save('uploads/vehicle/b.jpg', ContentFile(b'x'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.storage.delete(name)
+        self.assertTrue(self.storage.exists(name))
+        self.assertEqual(ImageBlob.objects.get(name=name).ref_count, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.storage.delete(name)
+        self.assertFalse(self.storage.exists(name))
+        self.assertFalse(ImageBlob.objects.filter(name=name).exists())
+
+    def test_file_kept_until_commit(self):
+        """Test the file survives until the releasing transaction commits."""
+        name = self.storage.save('uploads/vehicle/a.jpg', ContentFile(b'x'))
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.storage.delete(name)
+            self.assertTrue(self.storage.exists(name))
+        self.assertEqual(len(callbacks), 1)
+
+    def test_resave_after_release_restores_file(self):
+        """Test content saved again before collection keeps its file."""
+        name = self.storage.save('uploads/vehicle/a.jpg', ContentFile(b'x'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.storage.delete(name)
+            self.storage.save('uploads/vehicle/b.jpg', ContentFile(b'x'))
+
+        self.assertTrue(self.storage.exists(name))
+        self.assertEqual(ImageBlob.objects.get(name=name).ref_count, 1)
+
+    @override_settings(VEHICLE_IMAGE_CONTENT_ADDRESSED=False)
+    def test_default_mode_keeps_upload_names(self):
+        """Test the default mode stores files under the given name."""
+        name = self.storage.save('uploads/vehicle/a.jpg', ContentFile(b'x'))
+
+        self.assertEqual(name, 'uploads/vehicle/a.jpg')
+        self.assertFalse(ImageBlob.objects.exists())
+        self.storage.delete(name)
+        self.assertFalse(self.storage.exists(name))
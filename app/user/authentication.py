@@ -0,0 +1,155 @@
+"""
+Authentication classes for the API.
+"""
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from rest_framework.authentication import TokenAuthentication
+
+from core.metrics import timed
+
+
+DEFAULTS = {
+    'MAX_ENTRIES': 1024,
+    'TTL': 60,
+    'SHARED_CACHE': None,
+}
+
+
+class TokenCache:
+    """Two tier cache of authenticated (user, token) pairs.
+
+    The first tier is a bounded in-process LRU whose entries expire after
+    TTL seconds. The optional second tier is a Django cache alias shared
+    by every worker process.
+    """
+
+    def __init__(self, max_entries, ttl, shared_cache=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.shared = caches[shared_cache] if shared_cache else None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls):
+        """Create a token cache configured by TOKEN_AUTH_CACHE."""
+        options = {**DEFAULTS, **getattr(settings, 'TOKEN_AUTH_CACHE', {})}
+
+        return cls(
+            options['MAX_ENTRIES'],
+            options['TTL'],
+            options['SHARED_CACHE'],
+        )
+
+    def _shared_key(self, key):
+        """Return the shared cache key, never exposing the raw token."""
+        return 'auth-token:' + hashlib.sha256(key.encode()).hexdigest()
+
+    def get(self, key):
+        """Return the cached (user, token) pair of key or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    return value
+                del self._entries[key]
+
+        if self.shared is not None:
+            value = self.shared.get(self._shared_key(key))
+            if value is not None:
+                self._set_local(key, value)
+                return value
+
+        return None
+
+    def _set_local(self, key, value):
+        """Store value in the in-process tier, evicting the oldest entry."""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def set(self, key, value):
+        """Store the (user, token) pair of key in every tier."""
+        self._set_local(key, value)
+        if self.shared is not None:
+            self.shared.set(self._shared_key(key), value, self.ttl)
+
+    def delete(self, *keys):
+        """Remove keys from every tier."""
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+        if self.shared is not None and keys:
+            self.shared.delete_many([self._shared_key(key) for key in keys])
+
+    def delete_user(self, user_id, keys=()):
+        """Remove every entry of a user, plus keys from the shared tier."""
+        with self._lock:
+            local_keys = [
+                key for key, (expires, (user, token)) in self._entries.items()
+                if user.pk == user_id
+            ]
+        self.delete(*set(local_keys) | set(keys))
+
+    def clear(self):
+        """Remove every in-process entry."""
+        with self._lock:
+            self._entries.clear()
+
+
+_token_cache = None
+
+
+def get_token_cache():
+    """Return the process wide token cache."""
+    global _token_cache
+    if _token_cache is None:
+        _token_cache = TokenCache.from_settings()
+
+    return _token_cache
+
+
+@receiver(setting_changed)
+def reset_token_cache(setting, **kwargs):
+    """Rebuild the token cache when its settings change in tests."""
+    global _token_cache
+    if setting in ('TOKEN_AUTH_CACHE', 'CACHES'):
+        _token_cache = None
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication that caches the token and user lookup.
+
+    Successful lookups are cached for TOKEN_AUTH_CACHE['TTL'] seconds,
+    so most requests authenticate without touching the database. Entries
+    are dropped when their token is deleted or their user is saved.
+    Other processes only see an invalidation through the shared tier, so
+    without one they may keep a stale entry for at most TTL seconds.
+    """
+
+    def authenticate(self, request):
+        with timed('auth'):
+            return super().authenticate(request)
+
+    def authenticate_credentials(self, key):
+        token_cache = get_token_cache()
+        cached = token_cache.get(key)
+        if cached is None:
+            cached = super().authenticate_credentials(key)
+            token_cache.set(key, cached)
+
+        user, token = cached
+        return copy.copy(user), token
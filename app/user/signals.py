@@ -0,0 +1,34 @@
+"""
+Signal handlers for the user app.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (
+    post_delete,
+    post_save,
+)
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from user.authentication import get_token_cache
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """Stop authenticating with a deleted token."""
+    get_token_cache().delete(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_user_tokens(sender, instance, created, **kwargs):
+    """Drop cached tokens of a changed, possibly deactivated, user."""
+    if created:
+        return
+
+    token_cache = get_token_cache()
+    keys = ()
+    if token_cache.shared is not None:
+        keys = Token.objects.filter(
+            user=instance,
+        ).values_list('key', flat=True)
+    token_cache.delete_user(instance.pk, keys)
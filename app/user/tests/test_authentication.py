@@ -0,0 +1,163 @@
+"""
+Tests for the cached token authentication.
+"""
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import (
+    TestCase,
+    override_settings,
+)
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user.authentication import (
+    TokenCache,
+    get_token_cache,
+)
+
+
+ME_URL = reverse('user:me')
+
+
+def create_user(**params):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(**params)
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test authenticating API requests with cached tokens."""
+
+    def setUp(self):
+        self.user = create_user(
+            email='test@example.com',
+            password='testpass123',
+            name='Test Name',
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_cached_token_skips_database(self):
+        """Test repeated requests authenticate without queries."""
+        with self.assertNumQueries(1):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+
+    def test_invalid_token_rejected(self):
+        """Test an unknown token is not authenticated."""
+        self.client.credentials(HTTP_AUTHORIZATION='Token invalid')
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_token_invalidated(self):
+        """Test deleting a token stops it authenticating."""
+        self.client.get(ME_URL)
+
+        self.token.delete()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_invalidated(self):
+        """Test deactivating a user stops their token authenticating."""
+        self.client.get(ME_URL)
+
+        self.user.is_active = False
+        self.user.save()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_updated_user_not_stale(self):
+        """Test profile changes are visible to the next request."""
+        self.client.get(ME_URL)
+
+        res = self.client.patch(ME_URL, {'name': 'Updated name'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data['name'], 'Updated name')
+
+    @override_settings(
+        CACHES={
+            'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            },
+            'shared': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': 'shared-token-test',
+            },
+        },
+        TOKEN_AUTH_CACHE={'SHARED_CACHE': 'shared'},
+    )
+    def test_shared_tier(self):
+        """Test another process can authenticate from the shared tier."""
+        self.client.get(ME_URL)
+        get_token_cache().clear()
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.token.delete()
+        get_token_cache().clear()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class TokenCacheTests(TestCase):
+    """Test the in-process token cache."""
+
+    def setUp(self):
+        self.user = create_user(email='test@example.com', password='pass123')
+
+    def test_evicts_least_recently_used(self):
+        """Test the cache holds at most MAX_ENTRIES entries."""
+        token_cache = TokenCache(max_entries=2, ttl=60)
+        token_cache.set('a', (self.user, None))
+        token_cache.set('b', (self.user, None))
+        token_cache.get('a')
+        token_cache.set('c', (self.user, None))
+
+        self.assertIsNotNone(token_cache.get('a'))
+        self.assertIsNone(token_cache.get('b'))
+        self.assertIsNotNone(token_cache.get('c'))
+
+    @patch('user.authentication.time.monotonic')
+    def test_entries_expire(self, patched_monotonic):
+        """Test entries are dropped after the TTL."""
+        token_cache = TokenCache(max_entries=2, ttl=60)
+        patched_monotonic.return_value = 100
+        token_cache.set('a', (self.user, None))
+
+        patched_monotonic.return_value = 159
+        self.assertIsNotNone(token_cache.get('a'))
+        patched_monotonic.return_value = 161
+        self.assertIsNone(token_cache.get('a'))
+
+    def test_delete_user(self):
+        """Test removing every entry of a user."""
+        other_user = create_user(email='other@example.com', password='pass')
+        token_cache = TokenCache(max_entries=10, ttl=60)
+        token_cache.set('a', (self.user, None))
+        token_cache.set('b', (self.user, None))
+        token_cache.set('c', (other_user, None))
+
+        token_cache.delete_user(self.user.pk)
+
+        self.assertIsNone(token_cache.get('a'))
+        self.assertIsNone(token_cache.get('b'))
+        self.assertIsNotNone(token_cache.get('c'))
@@ -8,6 +8,8 @@ from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from core.testing import QueryBudgetMixin
+
 
 CREATE_USER_URL = reverse('user:create')
 TOKEN_URL = reverse('user:token')
@@ -156,3 +158,49 @@ class PrivateUserApiTests(TestCase):
         self.assertEqual(self.user.name, payload['name'])
         self.assertTrue(self.user.check_password(payload['password']))
         self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+
+class UserQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Test the user views stay within their query budgets."""
+
+    def setUp(self):
+        self.user = create_user(
+            email='test@example.com',
+            password='testpass123',
+            name='Test Name'
+        )
+        self.client = APIClient()
+
+    def test_public_query_budgets(self):
+        """Test creating users and tokens."""
+        res = self.client.post(CREATE_USER_URL, {
+            'email': 'new@example.com',
+            'password': 'testpass123',
+            'name': 'New',
+        })
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertQueryBudget(res)
+
+        res = self.client.post(TOKEN_URL, {
+            'email': 'test@example.com',
+            'password': 'testpass123',
+        })
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertQueryBudget(res)
+
+    def test_me_query_budgets(self):
+        """Test retrieving and updating the authenticated user."""
+        self.client.force_authenticate(user=self.user)
+        payload = {
+            'email': 'test@example.com',
+            'password': 'newpassword123',
+            'name': 'Updated name',
+        }
+
+        for res in (
+            self.client.get(ME_URL),
+            self.client.put(ME_URL, payload),
+            self.client.patch(ME_URL, payload),
+        ):
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertQueryBudget(res)
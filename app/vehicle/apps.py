@@ -4,3 +4,25 @@ from django.apps import AppConfig
 class VehicleConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'vehicle'
+
+    def ready(self):
+        from vehicle import signals  # noqa: F401
+        from core import metrics
+        from vehicle import (
+            cache,
+            images,
+        )
+
+        metrics.register(
+            'api_response_cache_requests_total',
+            'counter',
+            'Response cache lookups.',
+            cache.lookups,
+            label='result',
+        )
+        metrics.register(
+            'vehicle_image_queue_depth',
+            'gauge',
+            'Images queued or being processed.',
+            images.queue_depth,
+        )
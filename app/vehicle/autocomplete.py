@@ -0,0 +1,146 @@
+"""
+Autocomplete of tag and part names.
+
+Names are matched case insensitively by prefix, which PostgreSQL serves
+from the (user_id, UPPER(name)) pattern index of migration 0012, and
+optionally by trigram similarity, served by the GIN trigram index. Other
+databases fall back to substring matching for similar names.
+
+Results are kept in a small in-process LRU per user. Each user's entries
+are tagged with the user's response cache version, see vehicle.cache, so
+any write to their tags or parts drops them on the next lookup.
+"""
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.postgres.search import TrigramSimilarity
+from django.core.signals import setting_changed
+from django.db import connections
+from django.db.models import (
+    Case,
+    IntegerField,
+    Q,
+    Value,
+    When,
+)
+from django.db.models.functions import Upper
+from django.dispatch import receiver
+
+
+DEFAULTS = {
+    'LIMIT': 10,
+    'MAX_LIMIT': 50,
+    'MAX_USERS': 256,
+    'MAX_ENTRIES_PER_USER': 64,
+}
+
+
+def get_options():
+    """Return the VEHICLE_AUTOCOMPLETE settings with defaults."""
+    return {**DEFAULTS, **getattr(settings, 'VEHICLE_AUTOCOMPLETE', {})}
+
+
+class AutocompleteCache:
+    """Bounded LRU of autocomplete results, partitioned by user.
+
+    Holds at most max_users users of max_entries results each. Entries of
+    a user are dropped as soon as they are looked up with a new version.
+    """
+
+    def __init__(self, max_users, max_entries):
+        self.max_users = max_users
+        self.max_entries = max_entries
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls):
+        """Create a cache configured by VEHICLE_AUTOCOMPLETE."""
+        options = get_options()
+
+        return cls(options['MAX_USERS'], options['MAX_ENTRIES_PER_USER'])
+
+    def get(self, user_id, version, key):
+        """Return the cached results of key or None."""
+        with self._lock:
+            bucket = self._users.get(user_id)
+            if bucket is None:
+                return None
+            if bucket[0] != version:
+                del self._users[user_id]
+                return None
+
+            self._users.move_to_end(user_id)
+            entries = bucket[1]
+            value = entries.get(key)
+            if value is not None:
+                entries.move_to_end(key)
+            return value
+
+    def set(self, user_id, version, key, value):
+        """Store the results of key, evicting the least recently used."""
+        with self._lock:
+            bucket = self._users.get(user_id)
+            if bucket is None or bucket[0] != version:
+                bucket = self._users[user_id] = (version, OrderedDict())
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+
+            entries = bucket[1]
+            entries[key] = value
+            entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+    def clear(self):
+        """Remove every entry."""
+        with self._lock:
+            self._users.clear()
+
+
+_autocomplete_cache = None
+
+
+def get_autocomplete_cache():
+    """Return the process wide autocomplete cache."""
+    global _autocomplete_cache
+    if _autocomplete_cache is None:
+        _autocomplete_cache = AutocompleteCache.from_settings()
+
+    return _autocomplete_cache
+
+
+@receiver(setting_changed)
+def reset_autocomplete_cache(setting, **kwargs):
+    """Rebuild the autocomplete cache when its settings change in tests."""
+    global _autocomplete_cache
+    if setting == 'VEHICLE_AUTOCOMPLETE':
+        _autocomplete_cache = None
+
+
+def match_names(queryset, text, limit, similar=False):
+    """Return up to limit objects of queryset whose name matches text.
+
+    Prefix matches come first. With similar, names similar to text are
+    included too, most similar first.
+    """
+    prefix = Q(name__istartswith=text)
+    if not similar:
+        return queryset.filter(prefix).order_by(Upper('name'), 'name')[:limit]
+
+    if connections[queryset.db].vendor == 'postgresql':
+        queryset = queryset.filter(
+            prefix | Q(name__trigram_similar=text),
+        ).annotate(similarity=TrigramSimilarity('name', text))
+        ordering = ['-is_prefix', '-similarity']
+    else:
+        queryset = queryset.filter(name__icontains=text)
+        ordering = ['-is_prefix']
+
+    return queryset.annotate(is_prefix=Case(
+        When(prefix, then=Value(1)),
+        default=Value(0),
+        output_field=IntegerField(),
+    )).order_by(*ordering, Upper('name'), 'name')[:limit]
@@ -0,0 +1,178 @@
+"""
+Per-user versioned response cache for the vehicle API.
+
+Every user has a version token stored in the version cache, which is
+shared by every process. Cached responses are keyed by that token, so
+bumping it after a write makes all of the user's cached responses
+unreachable at once, also those cached by other processes in a response
+cache of their own.
+"""
+import hashlib
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import (
+    connection,
+    transaction,
+)
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+
+from rest_framework import status
+from rest_framework.response import Response
+
+
+_stats = {'hits': 0, 'misses': 0}
+_stats_lock = threading.Lock()
+
+
+def get_response_cache():
+    """Return the cache backend configured for responses."""
+    return caches[getattr(settings, 'VEHICLE_RESPONSE_CACHE', 'default')]
+
+
+def get_version_cache():
+    """Return the cache backend shared by processes for user versions."""
+    return caches[getattr(
+        settings, 'VEHICLE_RESPONSE_VERSION_CACHE', 'default')]
+
+
+def _version_key(user_id):
+    return f'vehicle-api:version:{user_id}'
+
+
+def get_user_version(user_id):
+    """Return the current version token of a user."""
+    version_cache = get_version_cache()
+    version = version_cache.get(_version_key(user_id))
+    if version is None:
+        version_cache.add(_version_key(user_id), uuid.uuid4().hex, None)
+        version = version_cache.get(_version_key(user_id))
+
+    return version
+
+
+def bump_user_version(user_id):
+    """Replace the version token of a user."""
+    get_version_cache().set(_version_key(user_id), uuid.uuid4().hex, None)
+
+
+def invalidate_user(user_id):
+    """Invalidate every cached response of a user.
+
+    The version is bumped immediately and again once the surrounding
+    transaction commits, so a concurrent request cannot cache data read
+    before the commit under the new version.
+    """
+    bump_user_version(user_id)
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: bump_user_version(user_id))
+
+
+def record(hit):
+    """Count a cache hit or miss."""
+    with _stats_lock:
+        _stats['hits' if hit else 'misses'] += 1
+
+
+def stats():
+    """Return the hit and miss counters of this process."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def lookups():
+    """Return the lookups of this process by result, for core.metrics."""
+    with _stats_lock:
+        return {'hit': _stats['hits'], 'miss': _stats['misses']}
+
+
+def reset_stats():
+    """Reset the hit and miss counters of this process."""
+    with _stats_lock:
+        _stats.update(hits=0, misses=0)
+
+
+class CachedResponseMixin:
+    """Serve read actions from the per-user response cache.
+
+    Responses carry a strong ETag derived from the cache key, which
+    embeds the user's version token. A request whose If-None-Match holds
+    the current ETag gets a 304 before any query or serialization runs.
+    Viewsets that retrieve single objects route retrieve through
+    cached_response themselves.
+    """
+
+    def get_response_cache_key(self, request):
+        """Return the cache key of the current request."""
+        version = get_user_version(request.user.pk)
+        digest = hashlib.sha256(repr((
+            request.get_host(),
+            request.path,
+            sorted(request.query_params.lists()),
+        )).encode()).hexdigest()
+
+        return f'vehicle-api:response:{request.user.pk}:{version}:{digest}'
+
+    def get_etag(self, request, key):
+        """Return the ETag of the response stored under key."""
+        digest = hashlib.sha256(
+            f'{key}:{request.accepted_media_type}'.encode()
+        ).hexdigest()
+
+        return f'"{digest[:40]}"'
+
+    def _not_modified(self, request, etag, exists=False):
+        """Return whether the client already holds the current response.
+
+        The wildcard only matches once exists tells a response with a
+        200 status is known to exist, so it never hides a 404.
+        """
+        header = request.META.get('HTTP_IF_NONE_MATCH')
+        if not header:
+            return False
+
+        etags = parse_etags(header)
+        return etag in etags or (exists and '*' in etags)
+
+    def _finalize_cached(self, response, etag, cache_status):
+        """Add validators and cache headers to a read response."""
+        response['ETag'] = etag
+        response['X-Cache'] = cache_status
+        patch_vary_headers(response, ('Accept', 'Authorization'))
+
+        return response
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        """Return the cached response data or call handler and cache it."""
+        response_cache = get_response_cache()
+        key = self.get_response_cache_key(request)
+        etag = self.get_etag(request, key)
+        if self._not_modified(request, etag):
+            return self._finalize_cached(
+                Response(status=status.HTTP_304_NOT_MODIFIED), etag, 'HIT')
+
+        data = response_cache.get(key)
+        if data is not None:
+            record(hit=True)
+            if self._not_modified(request, etag, exists=True):
+                return self._finalize_cached(
+                    Response(status=status.HTTP_304_NOT_MODIFIED),
+                    etag, 'HIT')
+            return self._finalize_cached(Response(data), etag, 'HIT')
+
+        record(hit=False)
+        response = handler(request, *args, **kwargs)
+        if response.status_code != status.HTTP_200_OK:
+            return response
+
+        response_cache.set(key, response.data)
+        if self._not_modified(request, etag, exists=True):
+            return self._finalize_cached(
+                Response(status=status.HTTP_304_NOT_MODIFIED), etag, 'MISS')
+        return self._finalize_cached(response, etag, 'MISS')
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
@@ -0,0 +1,134 @@
+"""
+Streaming export of vehicles with their tags and parts.
+
+Vehicles are read through a server-side cursor in chunks, the tags and
+parts of each chunk are fetched with one query per relation, so memory use
+depends on the chunk size and not on the number of vehicles exported.
+The readers parse exported files back, see the import_vehicles command.
+"""
+import csv
+import io
+import json
+from itertools import islice
+
+from vehicle.rows import related
+
+
+FIELDS = (
+    'id', 'title', 'description', 'year', 'price', 'total_cost', 'link',
+)
+
+CSV_HEADER = FIELDS + ('tags', 'parts')
+
+CHUNK_SIZE = 2000
+
+
+def _dumps(value):
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+
+def iter_chunks(queryset, chunk_size=None):
+    """Yield lists of vehicle dicts including their tags and parts."""
+    chunk_size = chunk_size or CHUNK_SIZE
+    rows = queryset.values(*FIELDS).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+
+        tags, parts = related([vehicle['id'] for vehicle in chunk])
+        for vehicle in chunk:
+            vehicle['tags'] = tags[vehicle['id']]
+            vehicle['parts'] = parts[vehicle['id']]
+        yield chunk
+
+
+def to_csv_row(vehicle):
+    """Return the CSV columns of a vehicle dict."""
+    return [vehicle[field] for field in FIELDS] + [
+        _dumps([tag['name'] for tag in vehicle['tags']]),
+        _dumps([
+            {'name': part['name'], 'price': part['price']}
+            for part in vehicle['parts']
+        ]),
+    ]
+
+
+def from_csv_row(row):
+    """Return the vehicle dict of a CSV row written by to_csv_row."""
+    vehicle = dict(row)
+    vehicle['tags'] = json.loads(row.get('tags') or '[]')
+    vehicle['parts'] = json.loads(row.get('parts') or '[]')
+
+    return vehicle
+
+
+def stream_ndjson(queryset, chunk_size=None):
+    """Yield vehicles as newline delimited JSON, one chunk at a time."""
+    for chunk in iter_chunks(queryset, chunk_size):
+        yield ''.join(_dumps(vehicle) + '\n' for vehicle in chunk)
+
+
+def stream_csv(queryset, chunk_size=None):
+    """Yield vehicles as CSV with a header row, one chunk at a time."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER)
+    for chunk in iter_chunks(queryset, chunk_size):
+        writer.writerows(to_csv_row(vehicle) for vehicle in chunk)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+FORMATS = {
+    'ndjson': ('application/x-ndjson', stream_ndjson),
+    'csv': ('text/csv', stream_csv),
+}
+
+
+class RecordError(ValueError):
+    """Error in the record on line of an imported file."""
+
+    def __init__(self, line, error):
+        super().__init__(f'line {line}: {error}')
+        self.line = line
+        self.error = error
+
+
+def read_ndjson(file):
+    """Yield the line number and vehicle dict of each NDJSON record."""
+    for number, line in enumerate(file, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            raise RecordError(number, exc) from exc
+        yield number, record
+
+
+def read_csv(file):
+    """Yield the line number and vehicle dict of each CSV record.
+
+    The number is the last line of records spanning several lines.
+    """
+    reader = csv.DictReader(file)
+    try:
+        for row in reader:
+            try:
+                record = from_csv_row(row)
+            except ValueError as exc:
+                raise RecordError(reader.line_num, exc) from exc
+            yield reader.line_num, record
+    except csv.Error as exc:
+        raise RecordError(reader.line_num, exc) from exc
+
+
+READERS = {
+    'ndjson': read_ndjson,
+    'csv': read_csv,
+}
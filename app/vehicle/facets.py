@@ -0,0 +1,71 @@
+"""
+Facet counts over a filtered set of vehicles.
+
+Counts per tag, per part and the year and price histograms are computed
+by a single UNION ALL of grouped queries over the matching vehicle ids.
+"""
+from django.db.models import (
+    CharField,
+    Count,
+    F,
+    Value,
+)
+
+from core.models import Vehicle
+
+
+YEAR_BUCKET = 10
+
+PRICE_BUCKET = 10000
+
+
+def _grouped(queryset, kind, key, label):
+    """Return (kind, key, label, count) rows grouped by key and label."""
+    return queryset.annotate(
+        kind=Value(kind, output_field=CharField()),
+        key=key,
+        label=label,
+    ).values('kind', 'key', 'label').annotate(
+        count=Count('*'),
+    ).values_list('kind', 'key', 'label', 'count')
+
+
+def facet_counts(queryset, year_bucket=YEAR_BUCKET, price_bucket=PRICE_BUCKET):
+    """Return tag, part, year and price facets of the vehicles in queryset."""
+    ids = queryset.order_by().values('pk')
+    vehicles = Vehicle.objects.filter(pk__in=ids)
+    no_label = Value('', output_field=CharField())
+
+    rows = _grouped(
+        Vehicle.tags.through.objects.filter(vehicle_id__in=ids),
+        'tags', F('tag_id'), F('tag__name'),
+    ).union(
+        _grouped(
+            Vehicle.parts.through.objects.filter(vehicle_id__in=ids),
+            'parts', F('part_id'), F('part__name'),
+        ),
+        _grouped(
+            vehicles, 'year', F('year') / year_bucket * year_bucket, no_label,
+        ),
+        _grouped(
+            vehicles, 'price', F('price') / price_bucket * price_bucket,
+            no_label,
+        ),
+        all=True,
+    )
+
+    facets = {'tags': [], 'parts': [], 'year': [], 'price': []}
+    widths = {'year': year_bucket, 'price': price_bucket}
+    for kind, key, label, count in rows:
+        if kind in widths:
+            facets[kind].append(
+                {'from': key, 'to': key + widths[kind] - 1, 'count': count})
+        else:
+            facets[kind].append({'id': key, 'name': label, 'count': count})
+
+    for kind in ('tags', 'parts'):
+        facets[kind].sort(key=lambda item: (-item['count'], item['name']))
+    for kind in widths:
+        facets[kind].sort(key=lambda item: item['from'])
+
+    return facets
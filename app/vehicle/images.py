@@ -0,0 +1,239 @@
+"""
+Background processing of uploaded vehicle images.
+
+Uploads are stored as received and marked pending. A bounded pool of
+worker threads then resizes them, strips their EXIF data, recompresses
+them and generates a thumbnail. Images the full queue refused, or a
+restarted worker never reached, stay pending until the process_images
+command processes them.
+"""
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import (
+    Image,
+    ImageOps,
+)
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.signals import setting_changed
+from django.db import (
+    connection,
+    transaction,
+)
+from django.dispatch import receiver
+
+from core.models import Vehicle
+from vehicle.cache import invalidate_user
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ASYNC': True,
+    'MAX_WORKERS': 2,
+    'MAX_PENDING': 32,
+    'MAX_DIMENSION': 2048,
+    'THUMBNAIL_SIZE': 320,
+    'JPEG_QUALITY': 85,
+}
+
+
+def get_options():
+    """Return the VEHICLE_IMAGE_PROCESSING settings with defaults."""
+    return {**DEFAULTS, **getattr(settings, 'VEHICLE_IMAGE_PROCESSING', {})}
+
+
+def _encode(image, quality):
+    """Encode image without metadata and return (bytes, extension)."""
+    buffer = io.BytesIO()
+    if image.mode in ('RGBA', 'LA'):
+        image.save(buffer, format='PNG', optimize=True)
+        return buffer.getvalue(), '.png'
+
+    image.convert('RGB').save(
+        buffer,
+        format='JPEG',
+        quality=quality,
+        optimize=True,
+        progressive=True,
+    )
+    return buffer.getvalue(), '.jpg'
+
+
+def render_image(source, options):
+    """Return the processed image and thumbnail of a source file."""
+    with Image.open(source) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode == 'P' and 'transparency' in image.info:
+            image = image.convert('RGBA')
+        elif image.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+            image = image.convert('RGB')
+
+        size = options['MAX_DIMENSION']
+        image.thumbnail((size, size), Image.LANCZOS)
+        processed = _encode(image, options['JPEG_QUALITY'])
+
+        size = options['THUMBNAIL_SIZE']
+        image.thumbnail((size, size), Image.LANCZOS)
+        thumbnail = _encode(image, options['JPEG_QUALITY'])
+
+    return processed, thumbnail
+
+
+def _set_status(vehicle, image_status):
+    """Update the status of a vehicle still holding the same image."""
+    updated = Vehicle.objects.filter(
+        pk=vehicle.pk,
+        image=vehicle.image.name,
+    ).update(image_status=image_status)
+    invalidate_user(vehicle.user_id)
+
+    return updated
+
+
+def process_vehicle_image(vehicle_id):
+    """Process the uploaded image of a vehicle."""
+    try:
+        vehicle = Vehicle.objects.get(pk=vehicle_id)
+    except Vehicle.DoesNotExist:
+        return
+    if not vehicle.image:
+        return
+
+    options = get_options()
+    source_name = vehicle.image.name
+    old_thumbnail = vehicle.thumbnail.name if vehicle.thumbnail else None
+    if not _set_status(vehicle, Vehicle.ImageStatus.PROCESSING):
+        return
+
+    try:
+        with vehicle.image.open('rb') as source:
+            processed, thumbnail = render_image(source, options)
+    except Exception:
+        logger.exception('Failed to process image of vehicle %s', vehicle_id)
+        _set_status(vehicle, Vehicle.ImageStatus.FAILED)
+        return
+
+    storage = vehicle.image.storage
+    image_name = storage.save(
+        vehicle.image.field.generate_filename(vehicle, processed[1]),
+        ContentFile(processed[0]),
+    )
+    thumbnail_name = storage.save(
+        vehicle.thumbnail.field.generate_filename(vehicle, thumbnail[1]),
+        ContentFile(thumbnail[0]),
+    )
+    updated = Vehicle.objects.filter(pk=vehicle.pk, image=source_name).update(
+        image=image_name,
+        thumbnail=thumbnail_name,
+        image_status=Vehicle.ImageStatus.READY,
+    )
+    invalidate_user(vehicle.user_id)
+
+    # Drop whichever files are no longer referenced: the originals once
+    # replaced, or the new ones if another upload superseded this one.
+    if updated:
+        unused = [source_name, old_thumbnail]
+    else:
+        unused = [image_name, thumbnail_name]
+    for name in unused:
+        if name:
+            storage.delete(name)
+
+
+def release_file(storage, name):
+    """Delete a no longer referenced file once the transaction commits."""
+    transaction.on_commit(lambda: storage.delete(name))
+
+
+class ImageProcessor:
+    """Bounded pool of threads processing vehicle images."""
+
+    def __init__(self, max_workers, max_pending):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix='vehicle-image',
+        )
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    @property
+    def queue_depth(self):
+        """Return the number of images queued or being processed."""
+        return self._pending
+
+    def submit(self, vehicle_id):
+        """Queue a vehicle image, returning False when the queue is full."""
+        if not self._slots.acquire(blocking=False):
+            return False
+
+        with self._lock:
+            self._pending += 1
+        self._executor.submit(self._run, vehicle_id)
+        return True
+
+    def _run(self, vehicle_id):
+        try:
+            process_vehicle_image(vehicle_id)
+        except Exception:
+            logger.exception('Image worker failed for vehicle %s', vehicle_id)
+        finally:
+            connection.close()
+            with self._lock:
+                self._pending -= 1
+            self._slots.release()
+
+
+_processor = None
+_processor_lock = threading.Lock()
+
+
+def get_processor():
+    """Return the process wide image processor."""
+    global _processor
+    with _processor_lock:
+        if _processor is None:
+            options = get_options()
+            _processor = ImageProcessor(
+                options['MAX_WORKERS'],
+                options['MAX_PENDING'],
+            )
+
+    return _processor
+
+
+def queue_depth():
+    """Return the images queued in this process, 0 before any upload."""
+    processor = _processor
+
+    return processor.queue_depth if processor is not None else 0
+
+
+@receiver(setting_changed)
+def reset_processor(setting, **kwargs):
+    """Rebuild the processor when its settings change in tests."""
+    global _processor
+    if setting == 'VEHICLE_IMAGE_PROCESSING':
+        _processor = None
+
+
+def _dispatch(vehicle_id):
+    """Queue the image, leaving it pending when the queue is full."""
+    if not get_processor().submit(vehicle_id):
+        logger.warning(
+            'Image queue full, the image of vehicle %s stays pending until '
+            'process_images runs.', vehicle_id)
+
+
+def schedule_image_processing(vehicle):
+    """Process the image of a vehicle once the upload is committed."""
+    if not get_options()['ASYNC']:
+        process_vehicle_image(vehicle.pk)
+        return
+
+    transaction.on_commit(lambda: _dispatch(vehicle.pk))
@@ -0,0 +1,28 @@
+"""
+Pagination for the vehicle API.
+"""
+from rest_framework.pagination import CursorPagination
+
+
+class VehicleCursorPagination(CursorPagination):
+    """Keyset pagination over vehicles, newest first.
+
+    The opaque cursor encodes the last seen id, so every page is a
+    `WHERE id < cursor ORDER BY id DESC LIMIT n` scan with no OFFSET
+    and no COUNT(*). Querysets ordered by the view are paged in their own
+    order instead, by its first field, which has to be unique for pages to
+    need no OFFSET. Ranked search results are ordered by their position,
+    see vehicle.search, and total costs by their cost_position, see
+    core.models.VehicleQuerySet.with_cost_position.
+    """
+    ordering = '-id'
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+    def get_ordering(self, request, queryset, view):
+        ordering = queryset.query.order_by
+        if ordering and all(isinstance(field, str) for field in ordering):
+            return tuple(ordering)
+
+        return super().get_ordering(request, queryset, view)
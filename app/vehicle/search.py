@@ -0,0 +1,84 @@
+"""
+Keyword search over vehicle titles and descriptions.
+
+On PostgreSQL vehicles are matched against their trigger maintained
+search_vector, which has a GIN index, and ranked with ts_rank. Other
+databases fall back to case insensitive substring matching, ranking
+title matches above description matches.
+
+Ranks are integers, ts_rank is scaled and floored, so cursors encode them
+exactly. Matches are also annotated with position, the rank and id folded
+into one unique key, so cursor pagination of ranked results needs neither
+a float nor an OFFSET over tied ranks.
+"""
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+)
+from django.db import connections
+from django.db.models import (
+    BigIntegerField,
+    Case,
+    ExpressionWrapper,
+    F,
+    IntegerField,
+    Q,
+    Value,
+    When,
+)
+from django.db.models.functions import (
+    Cast,
+    Floor,
+)
+
+
+# Must match the configuration of the trigger in migration 0010.
+SEARCH_CONFIG = 'english'
+
+# ts_rank normalized with 32 is below 1, scaled it is below RANK_SCALE.
+RANK_SCALE = 10 ** 6
+RANK_NORMALIZATION = 32
+
+# Ids must stay below ID_LIMIT for positions to order by rank, then id.
+ID_LIMIT = 10 ** 12
+
+
+def _fallback_rank(terms):
+    """Return an expression weighting title over description matches."""
+    rank = Value(0)
+    for term in terms:
+        rank = rank + Case(
+            When(title__icontains=term, then=Value(2)),
+            When(description__icontains=term, then=Value(1)),
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+    return rank
+
+
+def search_vehicles(queryset, text):
+    """Filter vehicles matching text, annotated with rank and position."""
+    if connections[queryset.db].vendor == 'postgresql':
+        query = SearchQuery(
+            text, config=SEARCH_CONFIG, search_type='websearch')
+        queryset = queryset.filter(search_vector=query).annotate(
+            rank=Cast(
+                Floor(SearchRank(
+                    F('search_vector'), query,
+                    normalization=RANK_NORMALIZATION,
+                ) * RANK_SCALE),
+                BigIntegerField(),
+            ),
+        )
+    else:
+        terms = [term.strip('"').lstrip('-') for term in text.split()]
+        terms = [term for term in terms if term]
+        for term in terms:
+            queryset = queryset.filter(
+                Q(title__icontains=term) | Q(description__icontains=term))
+        queryset = queryset.annotate(rank=_fallback_rank(terms))
+
+    return queryset.annotate(position=ExpressionWrapper(
+        F('rank') * ID_LIMIT + F('id'),
+        output_field=BigIntegerField(),
+    ))
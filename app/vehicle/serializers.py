@@ -1,34 +1,204 @@
 """
 Serializers for the vehicle API view.
 """
+from django.db import connection
+from django.db.models import Q
+
 from rest_framework import serializers
 
+from core.metrics import TimedSerializerMixin
 from core.models import (
+    FleetTotal,
     Vehicle,
     Tag,
     Part,
     )
+from core.signals import deferred_fleet_totals
+from vehicle.cache import invalidate_user
+from vehicle.uploads import ImageHeaderField
+
+
+class UniqueNameMixin:
+    """Reject a name the authenticated user already uses."""
+
+    def validate_name(self, value):
+        """Check the name is free, unless nested in a vehicle."""
+        if self.parent is not None:
+            return value
+
+        queryset = self.Meta.model.objects.filter(
+            user=self.context['request'].user,
+            name=value,
+        )
+        if self.instance is not None:
+            queryset = queryset.exclude(pk=self.instance.pk)
+        if queryset.exists():
+            raise serializers.ValidationError(
+                f'{self.Meta.model._meta.verbose_name.capitalize()} '
+                'with this name already exists.'
+            )
 
+        return value
 
-class PartSerializer(serializers.ModelSerializer):
+
+class PartSerializer(
+    TimedSerializerMixin,
+    UniqueNameMixin,
+    serializers.ModelSerializer,
+):
     """Serializer for parts."""
+    vehicle_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Part
-        fields = ['id', 'name', 'price']
+        fields = ['id', 'name', 'price', 'vehicle_count']
         read_only_fields = ['id']
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(
+    TimedSerializerMixin,
+    UniqueNameMixin,
+    serializers.ModelSerializer,
+):
     """Serializer for tags."""
+    vehicle_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Tag
-        fields = ['id', 'name']
+        fields = ['id', 'name', 'vehicle_count']
         read_only_fields = ['id']
 
 
-class VehicleSerializer(serializers.ModelSerializer):
+class VehicleListSerializer(serializers.ListSerializer):
+    """Serializer writing many vehicles with a few bulk statements."""
+    related = (('tags', Tag), ('parts', Part))
+
+    def _resolve_related(self, model, items):
+        """Resolve related objects of every vehicle with one batch.
+
+        Returns a list of objects per vehicle, or None where the vehicle
+        did not provide the field.
+        """
+        auth_user = self.context['request'].user
+        objs = model.objects.get_or_create_many(
+            auth_user,
+            [
+                item
+                for vehicle_items in items if vehicle_items
+                for item in vehicle_items
+            ],
+        )
+        by_key = {model.objects.lookup_key(obj): obj for obj in objs}
+
+        return [
+            None if vehicle_items is None else list(dict.fromkeys(
+                by_key[model.objects.lookup_key(item)]
+                for item in vehicle_items
+            ))
+            for vehicle_items in items
+        ]
+
+    def _link_related(self, field, model, vehicles, items):
+        """Insert the through rows of every vehicle in one statement."""
+        through = getattr(Vehicle, field).through
+        column = f'{model._meta.model_name}_id'
+        through.objects.bulk_create(
+            [
+                through(vehicle_id=vehicle.pk, **{column: obj.pk})
+                for vehicle, objs in zip(
+                    vehicles, self._resolve_related(model, items))
+                for obj in objs
+            ],
+            ignore_conflicts=True,
+        )
+
+    def _sync_related(self, field, model, vehicles, items):
+        """Apply the through row differences of every vehicle in bulk."""
+        through = getattr(Vehicle, field).through
+        column = f'{model._meta.model_name}_id'
+        removed = Q()
+        added = []
+        pairs = [
+            (vehicle, objs)
+            for vehicle, objs in zip(
+                vehicles, self._resolve_related(model, items))
+            if objs is not None
+        ]
+        for vehicle, objs in pairs:
+            current = {obj.pk for obj in getattr(vehicle, field).all()}
+            wanted = {obj.pk for obj in objs}
+            if current - wanted:
+                removed |= Q(vehicle_id=vehicle.pk) & Q(**{
+                    f'{column}__in': current - wanted,
+                })
+            added.extend(
+                through(vehicle_id=vehicle.pk, **{column: obj.pk})
+                for obj in objs if obj.pk not in current
+            )
+
+        if removed:
+            through.objects.filter(removed).delete()
+        if added:
+            through.objects.bulk_create(added, ignore_conflicts=True)
+
+    def _recompute_totals(self, vehicles):
+        """Recompute the totals bulk writes skipped and drop cached reads."""
+        user = self.context['request'].user
+        Vehicle.objects.filter(
+            pk__in=[vehicle.pk for vehicle in vehicles],
+        ).recompute_total_cost()
+        FleetTotal.objects.recompute(user.pk)
+        invalidate_user(user.pk)
+
+    def create(self, validated_data):
+        """Create vehicles with bulk inserts."""
+        related = {
+            field: [attrs.pop(field, []) for attrs in validated_data]
+            for field, model in self.related
+        }
+        vehicles = [Vehicle(**attrs) for attrs in validated_data]
+        if connection.features.can_return_rows_from_bulk_insert:
+            Vehicle.objects.bulk_create(vehicles)
+        else:
+            with deferred_fleet_totals():
+                for vehicle in vehicles:
+                    vehicle.save()
+
+        for field, model in self.related:
+            self._link_related(field, model, vehicles, related[field])
+        self._recompute_totals(vehicles)
+
+        return vehicles
+
+    def update(self, instances, validated_data):
+        """Update vehicles with bulk statements.
+
+        Instances must come with their tags and parts prefetched and in
+        the same order as validated_data.
+        """
+        related = {
+            field: [attrs.pop(field, None) for attrs in validated_data]
+            for field, model in self.related
+        }
+        fields = set()
+        for vehicle, attrs in zip(instances, validated_data):
+            for attr, value in attrs.items():
+                setattr(vehicle, attr, value)
+            fields.update(attrs)
+
+        if fields:
+            Vehicle.objects.bulk_update(instances, fields)
+
+        for field, model in self.related:
+            items = related[field]
+            if any(vehicle_items is not None for vehicle_items in items):
+                self._sync_related(field, model, instances, items)
+        self._recompute_totals(instances)
+
+        return instances
+
+
+class VehicleSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for vehicles."""
     # many means it will be a list of tags
     tags = TagSerializer(many=True, required=False)
@@ -36,28 +206,38 @@ class VehicleSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Vehicle
-        fields = ['id', 'title', 'year', 'price', 'link', 'tags', 'parts', ]
-        read_only_fields = ['id']
+        fields = [
+            'id', 'title', 'year', 'price', 'total_cost', 'link', 'tags',
+            'parts',
+        ]
+        read_only_fields = ['id', 'total_cost']
+        list_serializer_class = VehicleListSerializer
 
     def _get_or_create_tags(self, tags, vehicle):
         """Handle getting or creating tags as needed."""
         auth_user = self.context['request'].user
-        for tag in tags:
-            tag_obj, created = Tag.objects.get_or_create(
-                user=auth_user,
-                **tag,
-            )
-            vehicle.tags.add(tag_obj)
+        vehicle.tags.add(*Tag.objects.get_or_create_many(auth_user, tags))
 
     def _get_or_create_parts(self, parts, vehicle):
         """Handle getting or creating parts as needed."""
         auth_user = self.context['request'].user
-        for part in parts:
-            part_obj, created = Part.objects.get_or_create(
-                user=auth_user,
-                **part,
-            )
-            vehicle.parts.add(part_obj)
+        vehicle.parts.add(*Part.objects.get_or_create_many(auth_user, parts))
+
+    def _sync_related(self, manager, objs):
+        """Link the added objects and unlink the removed ones only.
+
+        Uses the prefetched relation when available, so unchanged
+        through rows are neither deleted nor re-inserted.
+        """
+        current = {obj.pk for obj in manager.all()}
+        wanted = {obj.pk for obj in objs}
+        removed = current - wanted
+        if removed:
+            manager.remove(*removed)
+
+        added = [obj for obj in objs if obj.pk not in current]
+        if added:
+            manager.add(*added)
 
     def create(self, validated_data):
         """Create a vehicle."""
@@ -73,18 +253,24 @@ class VehicleSerializer(serializers.ModelSerializer):
         """Update vehicle."""
         tags = validated_data.pop('tags', None)
         parts = validated_data.pop('parts', None)
+        auth_user = self.context['request'].user
         if tags is not None:
-            instance.tags.clear()
-            self._get_or_create_tags(tags, instance)
+            self._sync_related(
+                instance.tags,
+                Tag.objects.get_or_create_many(auth_user, tags),
+            )
 
         if parts is not None:
-            instance.parts.clear()
-            self._get_or_create_parts(parts, instance)
+            self._sync_related(
+                instance.parts,
+                Part.objects.get_or_create_many(auth_user, parts),
+            )
 
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
 
         instance.save()
+
         return instance
 
 
@@ -92,14 +278,38 @@ class VehicleDetailSerializer(VehicleSerializer):
     """Serializer for vehicle detail view"""
 
     class Meta(VehicleSerializer.Meta):
-        fields = VehicleSerializer.Meta.fields + ['description', 'image']
+        fields = VehicleSerializer.Meta.fields + [
+            'description',
+            'image',
+            'image_status',
+            'thumbnail',
+        ]
+        read_only_fields = VehicleSerializer.Meta.read_only_fields + [
+            'image_status',
+            'thumbnail',
+        ]
 
 
-class VehicleImageSerializer(serializers.ModelSerializer):
+class FleetTotalSerializer(
+    TimedSerializerMixin,
+    serializers.ModelSerializer,
+):
+    """Serializer for the fleet total of a user."""
+
+    class Meta:
+        model = FleetTotal
+        fields = ['vehicle_count', 'total_cost']
+        read_only_fields = fields
+
+
+class VehicleImageSerializer(
+    TimedSerializerMixin,
+    serializers.ModelSerializer,
+):
     """Serializer for uploading images to vehicles."""
+    image = ImageHeaderField()
 
     class Meta:
         model = Vehicle
-        fields = ['id', 'image']
-        read_only_fields = ['id']
-        extra_kwargs = {'image': {'required': 'True'}}
+        fields = ['id', 'image', 'image_status']
+        read_only_fields = ['id', 'image_status']
@@ -0,0 +1,52 @@
+"""
+Signal handlers for the vehicle app.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+)
+from django.dispatch import receiver
+
+from core.models import (
+    Vehicle,
+    Tag,
+    Part,
+)
+from vehicle.cache import invalidate_user
+from vehicle.images import release_file
+
+
+@receiver(post_save, sender=Vehicle)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Part)
+@receiver(post_delete, sender=Vehicle)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Part)
+def invalidate_owner(sender, instance, **kwargs):
+    """Invalidate cached responses of the owner of a changed object."""
+    invalidate_user(instance.user_id)
+
+
+@receiver(post_delete, sender=Vehicle)
+def release_images(sender, instance, **kwargs):
+    """Release the image files of a deleted vehicle."""
+    for field_file in (instance.image, instance.thumbnail):
+        if field_file:
+            release_file(field_file.storage, field_file.name)
+
+
+@receiver(m2m_changed, sender=Vehicle.tags.through)
+@receiver(m2m_changed, sender=Vehicle.parts.through)
+def invalidate_relation_owner(sender, instance, action, **kwargs):
+    """Invalidate cached responses when tags or parts are relinked."""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_user(instance.user_id)
+
+
+@receiver(post_save, sender=get_user_model())
+def reset_new_user(sender, instance, created, **kwargs):
+    """Start a new user on a fresh version, even if their id is reused."""
+    if created:
+        invalidate_user(instance.pk)
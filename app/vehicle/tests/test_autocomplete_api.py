@@ -0,0 +1,121 @@
+"""
+Tests for the tag and part autocomplete API.
+"""
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.test import TestCase
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Tag,
+    Part,
+)
+from vehicle.autocomplete import (
+    AutocompleteCache,
+    get_autocomplete_cache,
+)
+
+
+TAGS_AUTOCOMPLETE_URL = reverse('vehicle:tag-autocomplete')
+PARTS_AUTOCOMPLETE_URL = reverse('vehicle:part-autocomplete')
+
+
+def create_user(email='user@example.com', password='testpass123'):
+    """Create and return user."""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+class AutocompleteApiTests(TestCase):
+    """Test autocomplete requests."""
+
+    def setUp(self):
+        get_autocomplete_cache().clear()
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for name in ('Brake pad', 'brake disc', 'Bumper', 'Disc brake'):
+            Part.objects.create(user=self.user, name=name, price=10)
+
+    def names(self, res):
+        return [item['name'] for item in res.data]
+
+    def test_auth_required(self):
+        """Test auth is required for autocomplete."""
+        res = APIClient().get(TAGS_AUTOCOMPLETE_URL, {'q': 'c'})
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_prefix_matches(self):
+        """Test names starting with q are returned in order."""
+        other_user = create_user(email='other@example.com')
+        Part.objects.create(user=other_user, name='Brake line', price=10)
+
+        res = self.client.get(PARTS_AUTOCOMPLETE_URL, {'q': 'BRA'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.names(res), ['brake disc', 'Brake pad'])
+        self.assertEqual(set(res.data[0]), {'id', 'name', 'price'})
+
+    def test_limit(self):
+        """Test the number of matches is limited."""
+        res = self.client.get(PARTS_AUTOCOMPLETE_URL, {'q': 'b', 'limit': 2})
+        self.assertEqual(len(res.data), 2)
+
+        res = self.client.get(PARTS_AUTOCOMPLETE_URL, {'q': 'b', 'limit': 0})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_similar_matches(self):
+        """Test similar names follow the prefix matches."""
+        res = self.client.get(
+            PARTS_AUTOCOMPLETE_URL, {'q': 'brake', 'similar': 1})
+
+        self.assertEqual(
+            self.names(res), ['brake disc', 'Brake pad', 'Disc brake'])
+
+    def test_empty_query(self):
+        """Test a blank q matches nothing."""
+        res = self.client.get(TAGS_AUTOCOMPLETE_URL, {'q': ' '})
+
+        self.assertEqual(res.data, [])
+
+    def test_cached_until_changed(self):
+        """Test results are cached until the user's tags change."""
+        Tag.objects.create(user=self.user, name='classic')
+        self.client.get(TAGS_AUTOCOMPLETE_URL, {'q': 'c'})
+
+        with self.assertNumQueries(0):
+            res = self.client.get(TAGS_AUTOCOMPLETE_URL, {'q': 'C'})
+        self.assertEqual(self.names(res), ['classic'])
+
+        Tag.objects.create(user=self.user, name='cafe racer')
+        res = self.client.get(TAGS_AUTOCOMPLETE_URL, {'q': 'c'})
+
+        self.assertEqual(self.names(res), ['cafe racer', 'classic'])
+
+
+class AutocompleteCacheTests(TestCase):
+    """Test the autocomplete cache."""
+
+    def test_bounded_per_user(self):
+        """Test entries and users are evicted least recently used first."""
+        autocomplete_cache = AutocompleteCache(max_users=2, max_entries=2)
+        for key in ('a', 'b', 'c'):
+            autocomplete_cache.set(1, 'v1', key, [key])
+        autocomplete_cache.set(2, 'v1', 'a', ['a'])
+
+        self.assertIsNone(autocomplete_cache.get(1, 'v1', 'a'))
+        self.assertEqual(autocomplete_cache.get(1, 'v1', 'c'), ['c'])
+
+        autocomplete_cache.set(3, 'v1', 'a', ['a'])
+        self.assertIsNone(autocomplete_cache.get(2, 'v1', 'a'))
+        self.assertEqual(autocomplete_cache.get(1, 'v1', 'b'), ['b'])
+
+    def test_new_version_drops_user(self):
+        """Test a lookup with a new version drops the user's entries."""
+        autocomplete_cache = AutocompleteCache(max_users=2, max_entries=2)
+        autocomplete_cache.set(1, 'v1', 'a', ['a'])
+
+        self.assertIsNone(autocomplete_cache.get(1, 'v2', 'a'))
+        self.assertIsNone(autocomplete_cache.get(1, 'v1', 'a'))
@@ -0,0 +1,299 @@
+"""
+Tests for the vehicle image processing pipeline.
+"""
+import tempfile
+import threading
+from io import StringIO
+from unittest.mock import patch
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.core.management import call_command
+from django.test import (
+    TestCase,
+    override_settings,
+)
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    ImageBlob,
+    Vehicle,
+)
+from vehicle.images import (
+    ImageProcessor,
+    process_vehicle_image,
+)
+
+
+EXIF_MAKE = 0x010F
+EXIF_ORIENTATION = 0x0112
+
+
+def image_upload_url(vehicle_id):
+    """Create and return an image upload URL."""
+    return reverse('vehicle:vehicle-upload-image', args=[vehicle_id])
+
+
+def create_vehicle(user, **params):
+    """Create and return a sample vehicle."""
+    defaults = {'title': 'Sample vehicle', 'year': 2020, 'price': 1000}
+    defaults.update(params)
+
+    return Vehicle.objects.create(user=user, **defaults)
+
+
+def make_jpeg(size=(200, 100), orientation=None):
+    """Return a temporary JPEG file with EXIF data."""
+    image_file = tempfile.NamedTemporaryFile(suffix='.jpg')
+    exif = Image.Exif()
+    exif[EXIF_MAKE] = 'Camera maker'
+    if orientation:
+        exif[EXIF_ORIENTATION] = orientation
+    Image.new('RGB', size, 'red').save(
+        image_file, format='JPEG', exif=exif.tobytes())
+    image_file.seek(0)
+
+    return image_file
+
+
+@override_settings(VEHICLE_IMAGE_PROCESSING={
+    'ASYNC': False,
+    'MAX_DIMENSION': 64,
+    'THUMBNAIL_SIZE': 16,
+})
+class ImageProcessingTests(TestCase):
+    """Tests for processing uploaded images."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'password123',
+        )
+        self.client.force_authenticate(self.user)
+        self.vehicle = create_vehicle(user=self.user)
+
+    def tearDown(self):
+        self.vehicle.refresh_from_db()
+        self.vehicle.image.delete()
+        self.vehicle.thumbnail.delete()
+
+    def _upload(self, image_file):
+        with image_file:
+            return self.client.post(
+                image_upload_url(self.vehicle.id),
+                {'image': image_file},
+                format='multipart',
+            )
+
+    def test_upload_resizes_and_strips_exif(self):
+        """Test processing scales the image down and drops its EXIF."""
+        res = self._upload(make_jpeg(size=(200, 100)))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.vehicle.refresh_from_db()
+        self.assertEqual(self.vehicle.image_status, 'ready')
+        with Image.open(self.vehicle.image.path) as image:
+            self.assertEqual(image.size, (64, 32))
+            self.assertEqual(len(image.getexif()), 0)
+        with Image.open(self.vehicle.thumbnail.path) as thumbnail:
+            self.assertEqual(thumbnail.size, (16, 8))
+
+    def test_upload_applies_orientation(self):
+        """Test the EXIF orientation is applied before being dropped."""
+        self._upload(make_jpeg(size=(200, 100), orientation=6))
+
+        self.vehicle.refresh_from_db()
+        with Image.open(self.vehicle.image.path) as image:
+            self.assertEqual(image.size, (32, 64))
+
+    def test_original_file_removed(self):
+        """Test the unprocessed upload is deleted once replaced."""
+        with make_jpeg() as image_file:
+            self.vehicle.image.save('original.jpg', File(image_file))
+        original = self.vehicle.image.name
+
+        process_vehicle_image(self.vehicle.id)
+
+        self.vehicle.refresh_from_db()
+        storage = self.vehicle.image.storage
+        self.assertNotEqual(self.vehicle.image.name, original)
+        self.assertFalse(storage.exists(original))
+        self.assertTrue(storage.exists(self.vehicle.image.name))
+
+    def test_stale_save_keeps_processed_image(self):
+        """Test saving a vehicle loaded before processing keeps its result."""
+        with make_jpeg() as image_file:
+            self.vehicle.image.save('original.jpg', File(image_file))
+        stale = Vehicle.objects.get(pk=self.vehicle.pk)
+
+        process_vehicle_image(self.vehicle.id)
+        stale.title = 'Renamed'
+        stale.save()
+
+        self.vehicle.refresh_from_db()
+        self.assertEqual(self.vehicle.title, 'Renamed')
+        self.assertEqual(self.vehicle.image_status, 'ready')
+        self.assertNotEqual(self.vehicle.image.name, stale.image.name)
+        self.assertTrue(
+            self.vehicle.image.storage.exists(self.vehicle.image.name))
+        self.assertTrue(self.vehicle.thumbnail.name)
+
+    def test_reupload_releases_previous_image(self):
+        """Test uploading a new image deletes the previous one."""
+        self._upload(make_jpeg())
+        self.vehicle.refresh_from_db()
+        previous = self.vehicle.image.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self._upload(make_jpeg(size=(100, 100)))
+
+        self.assertFalse(self.vehicle.image.storage.exists(previous))
+
+    def test_delete_vehicle_releases_images(self):
+        """Test deleting a vehicle deletes its image and thumbnail."""
+        other = create_vehicle(user=self.user)
+        with make_jpeg() as image_file:
+            self.client.post(
+                image_upload_url(other.id),
+                {'image': image_file},
+                format='multipart',
+            )
+        other.refresh_from_db()
+        names = [other.image.name, other.thumbnail.name]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(
+                reverse('vehicle:vehicle-detail', args=[other.id]))
+
+        storage = other.image.storage
+        self.assertFalse(any(storage.exists(name) for name in names))
+
+    @override_settings(VEHICLE_IMAGE_CONTENT_ADDRESSED=True)
+    def test_identical_uploads_share_files(self):
+        """Test vehicles uploading the same photo share its files."""
+        other = create_vehicle(user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self._upload(make_jpeg())
+            with make_jpeg() as image_file:
+                self.client.post(
+                    image_upload_url(other.id),
+                    {'image': image_file},
+                    format='multipart',
+                )
+
+        self.vehicle.refresh_from_db()
+        other.refresh_from_db()
+        storage = self.vehicle.image.storage
+        self.assertEqual(self.vehicle.image.name, other.image.name)
+        self.assertEqual(self.vehicle.thumbnail.name, other.thumbnail.name)
+        self.assertEqual(
+            ImageBlob.objects.get(name=other.image.name).ref_count, 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other.delete()
+        self.assertTrue(storage.exists(self.vehicle.image.name))
+        self.assertEqual(
+            ImageBlob.objects.get(name=self.vehicle.image.name).ref_count, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.vehicle.image.delete()
+            self.vehicle.thumbnail.delete()
+        self.assertFalse(ImageBlob.objects.exists())
+
+    @patch('vehicle.images.render_image', side_effect=OSError('broken'))
+    def test_processing_failure(self, patched_render):
+        """Test a failing image is reported as failed."""
+        self._upload(make_jpeg())
+
+        self.vehicle.refresh_from_db()
+        self.assertEqual(self.vehicle.image_status, 'failed')
+
+    def test_detail_reports_status(self):
+        """Test vehicle details include the image status and thumbnail."""
+        self._upload(make_jpeg())
+
+        res = self.client.get(
+            reverse('vehicle:vehicle-detail', args=[self.vehicle.id]))
+
+        self.assertEqual(res.data['image_status'], 'ready')
+        self.assertIn('thumbnail', res.data)
+
+    @override_settings(VEHICLE_IMAGE_PROCESSING={'ASYNC': True})
+    @patch('vehicle.images.get_processor')
+    def test_async_upload_queued_after_commit(self, patched_processor):
+        """Test uploads return pending and are queued on commit."""
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self._upload(make_jpeg())
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['image_status'], 'pending')
+        patched_processor.return_value.submit.assert_called_once_with(
+            self.vehicle.id)
+
+    @override_settings(VEHICLE_IMAGE_PROCESSING={'ASYNC': True})
+    @patch('vehicle.images.process_vehicle_image')
+    @patch('vehicle.images.get_processor')
+    def test_full_queue_leaves_image_pending(
+        self, patched_processor, patched_process,
+    ):
+        """Test an upload the full queue refuses is not processed inline."""
+        patched_processor.return_value.submit.return_value = False
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self._upload(make_jpeg())
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        patched_process.assert_not_called()
+        self.vehicle.refresh_from_db()
+        self.assertEqual(self.vehicle.image_status, 'pending')
+
+    def test_process_images_command(self):
+        """Test the command processes pending and, if asked, stuck images."""
+        stuck = create_vehicle(user=self.user)
+        for vehicle, image_status in (
+            (self.vehicle, 'pending'), (stuck, 'processing'),
+        ):
+            with make_jpeg() as image_file:
+                vehicle.image.save('original.jpg', File(image_file))
+            Vehicle.objects.filter(pk=vehicle.pk).update(
+                image_status=image_status)
+
+        out = StringIO()
+        call_command('process_images', stdout=out)
+        self.assertIn('Processed 1 images: 1 ready, 0 failed.', out.getvalue())
+        stuck.refresh_from_db()
+        self.assertEqual(stuck.image_status, 'processing')
+
+        call_command('process_images', '--processing', stdout=StringIO())
+        stuck.refresh_from_db()
+        self.assertEqual(stuck.image_status, 'ready')
+        self.vehicle.refresh_from_db()
+        self.assertEqual(self.vehicle.image_status, 'ready')
+        stuck.image.delete()
+        stuck.thumbnail.delete()
+
+
+class ImageProcessorTests(TestCase):
+    """Tests for the bounded worker pool."""
+
+    @patch('vehicle.images.process_vehicle_image')
+    def test_queue_is_bounded(self, patched_process):
+        """Test submissions beyond the pending limit are refused."""
+        release = threading.Event()
+        patched_process.side_effect = lambda vehicle_id: release.wait(5)
+        processor = ImageProcessor(max_workers=1, max_pending=2)
+
+        self.assertTrue(processor.submit(1))
+        self.assertTrue(processor.submit(2))
+        self.assertFalse(processor.submit(3))
+        self.assertEqual(processor.queue_depth, 2)
+
+        release.set()
+        processor._executor.shutdown(wait=True)
+        self.assertEqual(processor.queue_depth, 0)
+        self.assertEqual(patched_process.call_count, 2)
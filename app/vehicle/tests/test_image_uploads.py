@@ -0,0 +1,166 @@
+"""
+Tests for streaming, memory bounded image uploads.
+"""
+import io
+import tempfile
+import tracemalloc
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.core.handlers.wsgi import WSGIRequest
+from django.test import (
+    TestCase,
+    override_settings,
+)
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import (
+    APIClient,
+    force_authenticate,
+)
+
+from core.models import Vehicle
+from vehicle.views import VehicleViewSet
+
+
+BOUNDARY = 'vehicle-upload-boundary'
+
+MB = 1024 * 1024
+
+
+def image_upload_url(vehicle_id):
+    """Create and return an image upload URL."""
+    return reverse('vehicle:vehicle-upload-image', args=[vehicle_id])
+
+
+def create_vehicle(user, **params):
+    """Create and return a sample vehicle."""
+    defaults = {'title': 'Sample vehicle', 'year': 2020, 'price': 1000}
+    defaults.update(params)
+
+    return Vehicle.objects.create(user=user, **defaults)
+
+
+def image_bytes(size=(10, 10), image_format='JPEG'):
+    """Return an encoded image."""
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+def write_multipart_body(body, content, size):
+    """Write a multipart body holding one image padded to size bytes."""
+    body.write((
+        f'--{BOUNDARY}\r\n'
+        'Content-Disposition: form-data; name="image"; filename="big.jpg"\r\n'
+        'Content-Type: image/jpeg\r\n\r\n'
+    ).encode())
+    body.write(content)
+    padding = size - len(content)
+    while padding > 0:
+        chunk = min(padding, MB)
+        body.write(b'\0' * chunk)
+        padding -= chunk
+    body.write(f'\r\n--{BOUNDARY}--\r\n'.encode())
+    length = body.tell()
+    body.seek(0)
+    return length
+
+
+class ImageUploadValidationTests(TestCase):
+    """Tests for upload limits and header only validation."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'password123',
+        )
+        self.client.force_authenticate(self.user)
+        self.vehicle = create_vehicle(user=self.user)
+
+    def tearDown(self):
+        self.vehicle.refresh_from_db()
+        self.vehicle.image.delete()
+
+    def _upload(self, content, name='image.jpg'):
+        image_file = io.BytesIO(content)
+        image_file.name = name
+        return self.client.post(
+            image_upload_url(self.vehicle.id),
+            {'image': image_file},
+            format='multipart',
+        )
+
+    @override_settings(VEHICLE_IMAGE_UPLOAD={'MAX_SIZE': 1024})
+    def test_upload_over_max_size_rejected(self):
+        """Test uploads larger than MAX_SIZE return 413."""
+        res = self._upload(image_bytes() + b'\0' * 2048)
+
+        self.assertEqual(
+            res.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.vehicle.refresh_from_db()
+        self.assertFalse(self.vehicle.image)
+
+    def test_upload_camera_photo_size_accepted(self):
+        """Test uploads just over 10 MB, like phone photos, are accepted."""
+        content = image_bytes()
+        res = self._upload(content + b'\0' * (10 * MB + 1 - len(content)))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['image_status'], 'pending')
+
+    @override_settings(VEHICLE_IMAGE_UPLOAD={'MAX_PIXELS': 100})
+    def test_upload_over_max_pixels_rejected(self):
+        """Test images with too many pixels are rejected."""
+        res = self._upload(image_bytes(size=(20, 10)))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('image', res.data)
+
+    def test_upload_unsupported_format_rejected(self):
+        """Test images in formats outside FORMATS are rejected."""
+        res = self._upload(image_bytes(image_format='BMP'), name='image.bmp')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('image', res.data)
+
+    def test_upload_validates_header_only(self):
+        """Test a truncated image passes as its pixels are not decoded."""
+        content = image_bytes(size=(200, 200))
+        res = self._upload(content[:len(content) // 2])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['image_status'], 'pending')
+
+    def test_upload_memory_is_bounded(self):
+        """Test an upload's memory use does not grow with its size."""
+        view = VehicleViewSet.as_view({'post': 'upload_image'})
+        path = image_upload_url(self.vehicle.id)
+
+        with tempfile.TemporaryFile() as body:
+            length = write_multipart_body(body, image_bytes(), 8 * MB)
+            request = WSGIRequest({
+                'REQUEST_METHOD': 'POST',
+                'PATH_INFO': path,
+                'SERVER_NAME': 'testserver',
+                'SERVER_PORT': '80',
+                'CONTENT_TYPE': f'multipart/form-data; boundary={BOUNDARY}',
+                'CONTENT_LENGTH': str(length),
+                'wsgi.input': body,
+                'wsgi.url_scheme': 'http',
+            })
+            force_authenticate(request, user=self.user)
+
+            tracemalloc.start()
+            try:
+                res = view(request, pk=self.vehicle.id)
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+                request.close()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertLess(peak, MB, peak)
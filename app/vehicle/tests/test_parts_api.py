@@ -91,6 +91,26 @@ class PrivatePartsApiTests(TestCase):
         self.assertEqual(part.name, payload['name'])
         self.assertEqual(part.price, payload['price'])
 
+    def test_update_part_duplicate_name(self):
+        """Test renaming a part to a name already in use fails."""
+        Part.objects.create(user=self.user, name='wheels', price=1600)
+        part = Part.objects.create(user=self.user, name='engine', price=900)
+
+        res = self.client.patch(detail_url(part.id), {'name': 'wheels'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.patch(
+            detail_url(part.id), {'name': 'engine', 'price': 1000})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_retrieve_part_not_allowed(self):
+        """Test the part detail endpoint does not serve GET."""
+        part = Part.objects.create(user=self.user, name='exhaust', price=1500)
+
+        res = self.client.get(detail_url(part.id))
+
+        self.assertEqual(res.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
     def test_delete_part(self):
         """Test deleting an part."""
         part = Part.objects.create(user=self.user, name='exhaust', price=1500)
@@ -144,3 +164,28 @@ class PrivatePartsApiTests(TestCase):
         res = self.client.get(PARTS_URL, {'assigned_only': 1})
 
         self.assertEqual(len(res.data), 1)
+
+    def test_parts_vehicle_count(self):
+        """Test listing parts with the number of vehicles using them."""
+        part = Part.objects.create(user=self.user, name='engine', price=300)
+        Part.objects.create(user=self.user, name='tyre', price=50)
+        vehicle = Vehicle.objects.create(
+            title='mx5',
+            year=1992,
+            price=12000,
+            user=self.user,
+        )
+        vehicle.parts.add(part)
+
+        res = self.client.get(PARTS_URL, {'vehicle_count': 1})
+
+        self.assertEqual(
+            [(item['name'], item['vehicle_count']) for item in res.data],
+            [('tyre', 0), ('engine', 1)],
+        )
+
+    def test_invalid_flag(self):
+        """Test a non numeric flag returns an error."""
+        res = self.client.get(PARTS_URL, {'assigned_only': 'yes'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
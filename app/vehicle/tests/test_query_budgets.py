@@ -0,0 +1,193 @@
+"""
+Tests for the declared query budgets of the vehicle API.
+"""
+import io
+from unittest import skipUnless
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Vehicle,
+    Tag,
+    Part,
+)
+from core.testing import QueryBudgetMixin
+
+
+VEHICLES_URL = reverse('vehicle:vehicle-list')
+BULK_URL = reverse('vehicle:vehicle-bulk')
+
+
+def detail_url(vehicle_id):
+    """Create and return a vehicle detail URL."""
+    return reverse('vehicle:vehicle-detail', args=[vehicle_id])
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Test every vehicle, tag and part action stays within its budget."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='testpass123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_vehicles(self, count):
+        """Create vehicles sharing count tags and parts."""
+        tags = [
+            Tag.objects.create(user=self.user, name=f'tag {i}')
+            for i in range(count)
+        ]
+        parts = [
+            Part.objects.create(user=self.user, name=f'part {i}', price=i)
+            for i in range(count)
+        ]
+        vehicles = []
+        for i in range(count):
+            vehicle = Vehicle.objects.create(
+                user=self.user, title=f'Vehicle {i}', year=2000, price=100)
+            vehicle.tags.add(*tags)
+            vehicle.parts.add(*parts)
+            vehicles.append(vehicle)
+
+        return vehicles
+
+    def payload(self, count, price=1, new='new'):
+        """Return a vehicle with existing and count new parts and tags.
+
+        Every existing tag and part but the first is sent, so updates
+        unlink one of each. The existing parts are sent with price, which
+        they keep, the new ones are named after new.
+        """
+        return {
+            'title': 'Vehicle',
+            'year': 2020,
+            'price': 1000,
+            'tags': [{'name': f'tag {i}'} for i in range(1, count)]
+            + [{'name': f'{new} tag {i}'} for i in range(count)],
+            'parts': [
+                {'name': f'part {i}', 'price': price}
+                for i in range(1, count)
+            ] + [
+                {'name': f'{new} part {i}', 'price': 1} for i in range(count)
+            ],
+        }
+
+    def assertBudgets(self, *responses, expected=status.HTTP_200_OK):
+        """Assert responses have the expected status and kept in budget."""
+        for res in responses:
+            self.assertEqual(res.status_code, expected)
+            if res.streaming:
+                b''.join(res.streaming_content)
+            self.assertQueryBudget(res)
+
+    def test_vehicle_reads(self):
+        """Test listing, retrieving, exporting and summarizing vehicles."""
+        for count in (2, 12):
+            vehicles = self.create_vehicles(count)
+            self.assertBudgets(
+                self.client.get(VEHICLES_URL, {'count': count}),
+                self.client.get(VEHICLES_URL, {
+                    'facets': 1, 'search': 'vehicle', 'count': count}),
+                self.client.get(detail_url(vehicles[0].id)),
+                self.client.get(reverse('vehicle:vehicle-export')),
+                self.client.get(reverse('vehicle:vehicle-summary')),
+            )
+            Vehicle.objects.all().delete()
+            Tag.objects.all().delete()
+            Part.objects.all().delete()
+
+    def test_vehicle_writes(self):
+        """Test creating, updating and deleting vehicles."""
+        for count in (2, 12):
+            vehicles = self.create_vehicles(count)
+            self.assertBudgets(
+                self.client.post(
+                    VEHICLES_URL, self.payload(count, price=5),
+                    format='json'),
+                expected=status.HTTP_201_CREATED,
+            )
+            self.assertBudgets(
+                self.client.put(
+                    detail_url(vehicles[0].id),
+                    self.payload(count, price=7, new='put'),
+                    format='json'),
+                self.client.patch(
+                    detail_url(vehicles[1].id),
+                    self.payload(count, price=9, new='patch'),
+                    format='json'),
+                self.client.patch(
+                    BULK_URL,
+                    [{'id': vehicle.id, 'price': 5} for vehicle in vehicles],
+                    format='json'),
+                self.client.delete(
+                    BULK_URL,
+                    [vehicle.id for vehicle in vehicles[1:]],
+                    format='json'),
+            )
+            self.assertBudgets(
+                self.client.delete(detail_url(vehicles[0].id)),
+                expected=status.HTTP_204_NO_CONTENT,
+            )
+            Tag.objects.all().delete()
+            Part.objects.all().delete()
+
+    @skipUnless(
+        connection.features.can_return_rows_from_bulk_insert,
+        'Requires bulk inserts returning ids.',
+    )
+    def test_vehicle_bulk_create(self):
+        """Test creating vehicles in bulk."""
+        for count in (2, 12):
+            self.assertBudgets(
+                self.client.post(
+                    BULK_URL, [self.payload(count) for _ in range(count)],
+                    format='json'),
+                expected=status.HTTP_201_CREATED,
+            )
+
+    def test_vehicle_upload_image(self):
+        """Test uploading a vehicle image."""
+        vehicle = self.create_vehicles(1)[0]
+        image = io.BytesIO()
+        Image.new('RGB', (10, 10)).save(image, 'PNG')
+        upload = SimpleUploadedFile(
+            'image.png', image.getvalue(), content_type='image/png')
+
+        self.assertBudgets(self.client.post(
+            reverse('vehicle:vehicle-upload-image', args=[vehicle.id]),
+            {'image': upload},
+            format='multipart',
+        ))
+
+    def test_tags_and_parts(self):
+        """Test listing, completing, updating and deleting tags and parts."""
+        self.create_vehicles(12)
+        for kind, model in (('tag', Tag), ('part', Part)):
+            obj = model.objects.filter(user=self.user).first()
+            detail = reverse(f'vehicle:{kind}-detail', args=[obj.id])
+            self.assertBudgets(
+                self.client.get(
+                    reverse(f'vehicle:{kind}-list'),
+                    {'assigned_only': 1, 'vehicle_count': 1}),
+                self.client.get(
+                    reverse(f'vehicle:{kind}-autocomplete'),
+                    {'q': kind, 'similar': 1}),
+                self.client.put(
+                    detail, {'name': 'renamed', 'price': 3}, format='json'),
+                self.client.patch(
+                    detail, {'name': 'patched', 'price': 4}, format='json'),
+            )
+            self.assertBudgets(
+                self.client.delete(detail),
+                expected=status.HTTP_204_NO_CONTENT,
+            )
@@ -0,0 +1,289 @@
+"""
+Tests for the vehicle API response cache.
+"""
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache.backends.filebased import FileBasedCache
+from django.test import (
+    TestCase,
+    override_settings,
+)
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Vehicle,
+    Tag,
+    Part,
+)
+from vehicle import cache
+
+
+VEHICLES_URL = reverse('vehicle:vehicle-list')
+TAGS_URL = reverse('vehicle:tag-list')
+PARTS_URL = reverse('vehicle:part-list')
+
+
+def detail_url(vehicle_id):
+    """Create and return a vehicle detail URL."""
+    return reverse('vehicle:vehicle-detail', args=[vehicle_id])
+
+
+def create_user(email='user@example.com', password='test123'):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def create_vehicle(user, **params):
+    """Create and return a sample vehicle."""
+    defaults = {'title': 'Sample vehicle', 'year': 2020, 'price': 1000}
+    defaults.update(params)
+
+    return Vehicle.objects.create(user=user, **defaults)
+
+
+class ResponseCacheTests(TestCase):
+    """Test caching of vehicle, tag and part reads."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.cache_dir = tempfile.TemporaryDirectory()
+        cls.versions_dir = os.path.join(cls.cache_dir.name, 'versions')
+        cls.settings_override = override_settings(CACHES={
+            'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            },
+            'responses': {
+                'BACKEND':
+                    'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': os.path.join(cls.cache_dir.name, 'responses'),
+            },
+            'versions': {
+                'BACKEND':
+                    'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': cls.versions_dir,
+            },
+        })
+        cls.settings_override.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.settings_override.disable()
+        cls.cache_dir.cleanup()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+        cache.reset_stats()
+
+    def assertCached(self, url, params=None):
+        """Assert a second read of url is served from the cache."""
+        res = self.client.get(url, params)
+        self.assertEqual(res['X-Cache'], 'MISS')
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(url, params)
+
+        self.assertEqual(cached.status_code, status.HTTP_200_OK)
+        self.assertEqual(cached['X-Cache'], 'HIT')
+        self.assertEqual(cached.data, res.data)
+        return cached
+
+    def test_vehicle_list_cached(self):
+        """Test the vehicle list is served from the cache."""
+        create_vehicle(self.user)
+
+        self.assertCached(VEHICLES_URL)
+
+        self.assertEqual(cache.stats(), {'hits': 1, 'misses': 1})
+
+    def test_vehicle_detail_cached(self):
+        """Test vehicle details are served from the cache."""
+        vehicle = create_vehicle(self.user)
+
+        self.assertCached(detail_url(vehicle.id))
+
+    def test_tags_and_parts_cached(self):
+        """Test tag and part lists are served from the cache."""
+        Tag.objects.create(user=self.user, name='car')
+        Part.objects.create(user=self.user, name='engine', price=100)
+
+        self.assertCached(TAGS_URL)
+        self.assertCached(PARTS_URL)
+
+    def test_query_params_cached_separately(self):
+        """Test different filters are cached under different keys."""
+        tag = Tag.objects.create(user=self.user, name='car')
+        vehicle = create_vehicle(self.user)
+        vehicle.tags.add(tag)
+        create_vehicle(self.user)
+
+        res = self.assertCached(VEHICLES_URL, {'tags': str(tag.id)})
+
+        self.assertEqual(len(res.data['results']), 1)
+        res = self.client.get(VEHICLES_URL)
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(len(res.data['results']), 2)
+
+    def test_cache_limited_to_user(self):
+        """Test cached responses are not shared between users."""
+        create_vehicle(self.user)
+        self.assertCached(VEHICLES_URL)
+
+        other_user = create_user(email='other@example.com')
+        self.client.force_authenticate(other_user)
+        res = self.client.get(VEHICLES_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(res.data['results'], [])
+
+    def test_version_shared_between_processes(self):
+        """Test a write in another process invalidates cached responses."""
+        create_vehicle(self.user)
+        self.assertCached(VEHICLES_URL)
+
+        other_process = FileBasedCache(self.versions_dir, {})
+        other_process.set(
+            cache._version_key(self.user.pk), 'bumped elsewhere', None)
+
+        res = self.client.get(VEHICLES_URL)
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(
+            cache.get_user_version(self.user.pk), 'bumped elsewhere')
+
+    def test_write_through_api_invalidates(self):
+        """Test creating a vehicle invalidates the cached list."""
+        self.assertCached(VEHICLES_URL)
+
+        payload = {'title': 'New', 'year': 2020, 'price': 100}
+        self.client.post(VEHICLES_URL, payload)
+        res = self.client.get(VEHICLES_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_relation_change_invalidates(self):
+        """Test linking a tag invalidates the cached vehicle."""
+        vehicle = create_vehicle(self.user)
+        tag = Tag.objects.create(user=self.user, name='car')
+        self.assertCached(detail_url(vehicle.id))
+
+        vehicle.tags.add(tag)
+        res = self.client.get(detail_url(vehicle.id))
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(res.data['tags'], [{'id': tag.id, 'name': 'car'}])
+
+    def test_part_change_invalidates(self):
+        """Test changing a part price invalidates the cached vehicle."""
+        vehicle = create_vehicle(self.user)
+        part = Part.objects.create(user=self.user, name='engine', price=100)
+        vehicle.parts.add(part)
+        self.assertCached(detail_url(vehicle.id))
+
+        part.price = 200
+        part.save()
+        res = self.client.get(detail_url(vehicle.id))
+
+        self.assertEqual(res.data['parts'][0]['price'], 200)
+
+    def test_delete_invalidates(self):
+        """Test deleting a tag invalidates the cached tag list."""
+        tag = Tag.objects.create(user=self.user, name='car')
+        self.assertCached(TAGS_URL)
+
+        tag.delete()
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.data, [])
+
+    def test_bulk_write_invalidates(self):
+        """Test bulk writes that bypass model signals invalidate."""
+        self.assertCached(VEHICLES_URL)
+
+        payload = [{'title': 'Bulk', 'year': 2020, 'price': 100}]
+        self.client.post(
+            reverse('vehicle:vehicle-bulk'), payload, format='json')
+        res = self.client.get(VEHICLES_URL)
+
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_etag_not_modified(self):
+        """Test a matching If-None-Match returns 304 without queries."""
+        vehicle = create_vehicle(self.user)
+        for url in (VEHICLES_URL, detail_url(vehicle.id), TAGS_URL, PARTS_URL):
+            res = self.client.get(url)
+            etag = res['ETag']
+
+            with self.assertNumQueries(0):
+                res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+            self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(res['ETag'], etag)
+            self.assertEqual(res.content, b'')
+
+    def test_etag_changes_after_write(self):
+        """Test a stale ETag gets the full, updated response."""
+        vehicle = create_vehicle(self.user)
+        etag = self.client.get(detail_url(vehicle.id))['ETag']
+
+        vehicle.title = 'Changed'
+        vehicle.save()
+        res = self.client.get(detail_url(vehicle.id), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+        self.assertEqual(res.data['title'], 'Changed')
+
+    def test_etag_differs_per_resource_and_user(self):
+        """Test ETags are specific to the URL and the user."""
+        v1 = create_vehicle(self.user)
+        v2 = create_vehicle(self.user)
+        etag1 = self.client.get(detail_url(v1.id))['ETag']
+        etag2 = self.client.get(detail_url(v2.id))['ETag']
+        self.assertNotEqual(etag1, etag2)
+
+        other_user = create_user(email='other@example.com')
+        self.client.force_authenticate(other_user)
+        res = self.client.get(VEHICLES_URL, HTTP_IF_NONE_MATCH=etag1)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_etag_wildcard_existing(self):
+        """Test If-None-Match: * returns 304 for an existing vehicle."""
+        vehicle = create_vehicle(self.user)
+
+        res = self.client.get(detail_url(vehicle.id), HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['X-Cache'], 'MISS')
+
+        res = self.client.get(detail_url(vehicle.id), HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['X-Cache'], 'HIT')
+
+    def test_etag_wildcard_missing(self):
+        """Test If-None-Match: * on a missing vehicle returns 404."""
+        other_user = create_user(email='other@example.com')
+        vehicle = create_vehicle(other_user)
+
+        for url in (detail_url(vehicle.id), detail_url(vehicle.id + 1)):
+            res = self.client.get(url, HTTP_IF_NONE_MATCH='*')
+
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_etag_list_of_values(self):
+        """Test If-None-Match accepts several ETags."""
+        etag = self.client.get(VEHICLES_URL)['ETag']
+
+        res = self.client.get(
+            VEHICLES_URL, HTTP_IF_NONE_MATCH=f'"stale", {etag}')
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertIn('Authorization', res['Vary'])
@@ -0,0 +1,99 @@
+"""
+Tests for the fast read-only serialization of vehicle lists.
+"""
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from core.models import (
+    Vehicle,
+    Tag,
+    Part,
+)
+from vehicle.rows import (
+    serialize_rows,
+    vehicle_rows,
+)
+from vehicle.search import search_vehicles
+from vehicle.serializers import VehicleSerializer
+from vehicle.views import RELATED_PREFETCHES
+
+
+VEHICLES_URL = reverse('vehicle:vehicle-list')
+
+
+class SerializeRowsTests(TestCase):
+    """Test the rows path renders the same bytes as VehicleSerializer."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='testpass123')
+        tags = [
+            Tag.objects.create(user=self.user, name=name)
+            for name in ('classic', 'zażółć', 'quote " and \\ slash', '')
+        ]
+        parts = [
+            Part.objects.create(user=self.user, name=name, price=price)
+            for name, price in (
+                ('engine', 3000), ('tyre', 0), ('€ mirror', -5))
+        ]
+        samples = [
+            ('mx5', 1992, 12000, ''),
+            ('Ünïcode title ✓', 2020, 0, 'https://example.com/?a=1&b="2"'),
+            ('line\nbreak\ttab', 1900, 2147483647, 'x' * 255),
+            ('no relations', 2000, 1, ''),
+        ]
+        for index, (title, year, price, link) in enumerate(samples * 3):
+            vehicle = Vehicle.objects.create(
+                user=self.user, title=title, year=year, price=price,
+                link=link, description='Description')
+            # Link in reverse id order, output must still be ordered by id.
+            vehicle.tags.add(*reversed(tags[:index % 5]))
+            vehicle.parts.add(*reversed(parts[:index % 4]))
+
+    def assertParity(self, queryset):
+        """Assert both paths render queryset to identical bytes."""
+        renderer = JSONRenderer()
+        expected = renderer.render(VehicleSerializer(
+            queryset.prefetch_related(*RELATED_PREFETCHES), many=True).data)
+
+        actual = renderer.render(serialize_rows(vehicle_rows(queryset)))
+
+        self.assertEqual(actual, expected)
+        return actual
+
+    def test_parity(self):
+        """Test vehicles, tags and parts serialize identically."""
+        data = self.assertParity(Vehicle.objects.order_by('-id'))
+
+        self.assertIn('zażółć'.encode(), data)
+
+    def test_parity_ordered_and_searched(self):
+        """Test orderings and search annotations do not leak into rows."""
+        self.assertParity(Vehicle.objects.order_by('total_cost', 'id'))
+        self.assertParity(search_vehicles(
+            Vehicle.objects.all(), 'mx5 description').order_by('-position'))
+        self.assertParity(Vehicle.objects.none())
+
+    def test_query_count(self):
+        """Test any number of rows is serialized with two more queries."""
+        rows = list(vehicle_rows(Vehicle.objects.all()))
+
+        with self.assertNumQueries(2):
+            serialize_rows(rows)
+
+    def test_list_uses_rows(self):
+        """Test the list action returns the serializer output bytes."""
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        res = client.get(VEHICLES_URL, {'ordering': 'total_cost'})
+
+        vehicles = Vehicle.objects.order_by('total_cost', 'id')
+        expected = JSONRenderer().render(VehicleSerializer(
+            vehicles.prefetch_related(*RELATED_PREFETCHES), many=True).data)
+        self.assertEqual(
+            JSONRenderer().render(res.data['results']), expected)
@@ -87,6 +87,25 @@ class PrivateTagsApiTests(TestCase):
         tag.refresh_from_db()
         self.assertEqual(tag.name, payload['name'])
 
+    def test_retrieve_tag_not_allowed(self):
+        """Test the tag detail endpoint does not serve GET."""
+        tag = Tag.objects.create(user=self.user, name='Modern')
+
+        res = self.client.get(detail_url(tag.id))
+
+        self.assertEqual(res.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    def test_update_tag_duplicate_name(self):
+        """Test renaming a tag to a name already in use fails."""
+        Tag.objects.create(user=self.user, name='Classic')
+        tag = Tag.objects.create(user=self.user, name='Modern')
+
+        res = self.client.patch(detail_url(tag.id), {'name': 'Classic'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        tag.refresh_from_db()
+        self.assertEqual(tag.name, 'Modern')
+
     def test_delete_tag(self):
         """Test deleting a tag."""
         tag = Tag.objects.create(user=self.user, name='Electric')
@@ -139,3 +158,32 @@ class PrivateTagsApiTests(TestCase):
         res = self.client.get(TAGS_URL, {'assigned_only': 1})
 
         self.assertEqual(len(res.data), 1)
+
+    def test_tags_vehicle_count(self):
+        """Test listing tags with the number of vehicles using them."""
+        tag1 = Tag.objects.create(user=self.user, name='classic')
+        tag2 = Tag.objects.create(user=self.user, name='modern')
+        Tag.objects.create(user=self.user, name='unused')
+        for title in ('mx5', 'r100'):
+            vehicle = Vehicle.objects.create(
+                title=title,
+                year=1992,
+                price=12000,
+                user=self.user,
+            )
+            vehicle.tags.add(tag1)
+        vehicle.tags.add(tag2)
+
+        with self.assertNumQueries(1):
+            res = self.client.get(
+                TAGS_URL, {'assigned_only': 1, 'vehicle_count': 1})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(tag['name'], tag['vehicle_count']) for tag in res.data],
+            [('modern', 1), ('classic', 2)],
+        )
+
+        res = self.client.get(TAGS_URL)
+        self.assertEqual(len(res.data), 3)
+        self.assertNotIn('vehicle_count', res.data[0])
@@ -3,11 +3,19 @@ Tests for vehicle APIs.
 """
 import tempfile
 import os
+from base64 import b64decode
+from unittest import skipUnless
+from urllib.parse import (
+    parse_qs,
+    urlparse,
+)
 
 from PIL import Image
 
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import status
@@ -18,6 +26,7 @@ from core.models import (
     Tag,
     Part
 )
+from core.testing import QueryBudgetMixin
 
 from vehicle.serializers import (
     VehicleSerializer,
@@ -96,7 +105,7 @@ class PrivateVehicleAPITests(TestCase):
         vehicles = Vehicle.objects.all().order_by('-id')
         serializer = VehicleSerializer(vehicles, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_vehicle_list_limited_to_user(self):
         """Test list of vehicles is limited to authenticated user."""
@@ -110,7 +119,7 @@ class PrivateVehicleAPITests(TestCase):
         vehicles = Vehicle.objects.filter(user=self.user)
         serializer = VehicleSerializer(vehicles, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_get_vehicle_detail(self):
         """Test get vehicle detail."""
@@ -410,9 +419,9 @@ class PrivateVehicleAPITests(TestCase):
         s1 = VehicleSerializer(v1)
         s2 = VehicleSerializer(v2)
         s3 = VehicleSerializer(v3)
-        self.assertIn(s1.data, res.data)
-        self.assertIn(s2.data, res.data)
-        self.assertNotIn(s3.data, res.data)
+        self.assertIn(s1.data, res.data['results'])
+        self.assertIn(s2.data, res.data['results'])
+        self.assertNotIn(s3.data, res.data['results'])
 
     def test_filter_by_parts(self):
         """Test filtering vehicles by parts."""
@@ -431,9 +440,409 @@ class PrivateVehicleAPITests(TestCase):
         s1 = VehicleSerializer(v1)
         s2 = VehicleSerializer(v2)
         s3 = VehicleSerializer(v3)
-        self.assertIn(s1.data, res.data)
-        self.assertIn(s2.data, res.data)
-        self.assertNotIn(s3.data, res.data)
+        self.assertIn(s1.data, res.data['results'])
+        self.assertIn(s2.data, res.data['results'])
+        self.assertNotIn(s3.data, res.data['results'])
+
+
+class VehiclePaginationTests(TestCase):
+    """Test cursor pagination of the vehicle list."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email='user@example.com', password='test123')
+        self.client.force_authenticate(self.user)
+
+    def _collect_pages(self, params):
+        """Follow next links and return the ids of every page."""
+        pages = []
+        res = self.client.get(VEHICLES_URL, params)
+        while True:
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            pages.append([vehicle['id'] for vehicle in res.data['results']])
+            if not res.data['next']:
+                return pages
+            res = self.client.get(res.data['next'])
+
+    def test_pages_follow_id_order(self):
+        """Test walking the cursor returns every vehicle once, newest first."""
+        vehicles = [create_vehicle(user=self.user) for _ in range(5)]
+
+        pages = self._collect_pages({'page_size': 2})
+
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        ids = [vehicle_id for page in pages for vehicle_id in page]
+        self.assertEqual(ids, sorted((v.id for v in vehicles), reverse=True))
+
+    def test_deep_page_has_no_offset_or_count(self):
+        """Test a deep page is a keyset scan without OFFSET or COUNT."""
+        for _ in range(6):
+            create_vehicle(user=self.user)
+        res = self.client.get(VEHICLES_URL, {'page_size': 2})
+        res = self.client.get(res.data['next'])
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(res.data['next'])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 2)
+        self.assertNotIn('count', res.data)
+        for query in ctx.captured_queries:
+            self.assertNotIn('OFFSET', query['sql'].upper())
+            self.assertNotIn('COUNT(', query['sql'].upper())
+
+    def test_pagination_with_tag_filter(self):
+        """Test filtered pages list each matching vehicle once."""
+        tag1 = Tag.objects.create(user=self.user, name='car')
+        tag2 = Tag.objects.create(user=self.user, name='classic')
+        matching = []
+        for _ in range(3):
+            vehicle = create_vehicle(user=self.user)
+            vehicle.tags.add(tag1, tag2)
+            matching.append(vehicle.id)
+        create_vehicle(user=self.user)
+
+        pages = self._collect_pages(
+            {'tags': f'{tag1.id},{tag2.id}', 'page_size': 2})
+
+        ids = [vehicle_id for page in pages for vehicle_id in page]
+        self.assertEqual(ids, sorted(matching, reverse=True))
+
+
+class VehicleFilterTests(QueryBudgetMixin, TestCase):
+    """Test filtering vehicles by tags and parts."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email='user@example.com', password='test123')
+        self.client.force_authenticate(self.user)
+        self.car = Tag.objects.create(user=self.user, name='car')
+        self.classic = Tag.objects.create(user=self.user, name='classic')
+        self.engine = Part.objects.create(
+            user=self.user, name='engine', price=100)
+        self.both = create_vehicle(user=self.user, title='both')
+        self.both.tags.add(self.car, self.classic)
+        self.both.parts.add(self.engine)
+        self.car_only = create_vehicle(user=self.user, title='car only')
+        self.car_only.tags.add(self.car)
+        create_vehicle(user=self.user, title='none')
+
+    def _ids(self, params):
+        res = self.client.get(VEHICLES_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [vehicle['id'] for vehicle in res.data['results']]
+
+    def test_match_any(self):
+        """Test vehicles having any of the tags are returned once."""
+        ids = self._ids({'tags': f'{self.car.id},{self.classic.id}'})
+
+        self.assertEqual(ids, [self.car_only.id, self.both.id])
+
+    def test_match_all(self):
+        """Test vehicles having all of the tags are returned."""
+        ids = self._ids({
+            'tags': f'{self.car.id},{self.classic.id}',
+            'match': 'all',
+        })
+
+        self.assertEqual(ids, [self.both.id])
+
+    def test_match_all_tags_and_parts(self):
+        """Test match all combines tag and part filters."""
+        ids = self._ids({
+            'tags': str(self.car.id),
+            'parts': str(self.engine.id),
+            'match': 'all',
+        })
+
+        self.assertEqual(ids, [self.both.id])
+
+    def test_filter_without_distinct(self):
+        """Test filters use semi-joins instead of DISTINCT over joins."""
+        for match in ('any', 'all'):
+            params = {
+                'tags': f'{self.car.id},{self.classic.id}',
+                'match': match,
+            }
+            with CaptureQueriesContext(connection) as ctx:
+                res = self.client.get(VEHICLES_URL, params)
+
+            sql = ctx.captured_queries[0]['sql'].upper()
+            self.assertNotIn('DISTINCT', sql)
+            self.assertQueryBudget(res)
+
+    def test_invalid_match(self):
+        """Test an unknown match mode is rejected."""
+        res = self.client.get(
+            VEHICLES_URL, {'tags': str(self.car.id), 'match': 'some'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class VehicleSearchTests(TestCase):
+    """Test keyword search over vehicles."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email='user@example.com', password='test123')
+        self.client.force_authenticate(self.user)
+        self.mustang = create_vehicle(
+            user=self.user, title='Red Mustang', description='V8 engine')
+        self.coupe = create_vehicle(
+            user=self.user, title='Coupe', description='Red paint')
+        self.truck = create_vehicle(
+            user=self.user, title='Blue truck', description='Diesel engine')
+
+    def _ids(self, params):
+        res = self.client.get(VEHICLES_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [vehicle['id'] for vehicle in res.data['results']]
+
+    def test_search_ranks_title_matches_first(self):
+        """Test matches in the title rank above the description."""
+        ids = self._ids({'search': 'red'})
+
+        self.assertEqual(ids, [self.mustang.id, self.coupe.id])
+
+    def test_search_requires_every_word(self):
+        """Test every keyword has to match."""
+        self.assertEqual(
+            self._ids({'search': 'engine diesel'}), [self.truck.id])
+        self.assertEqual(self._ids({'search': 'red diesel'}), [])
+
+    def test_search_limited_to_user(self):
+        """Test other users' vehicles are not searched."""
+        other = create_user(email='other@example.com', password='test123')
+        create_vehicle(user=other, title='Red bus')
+
+        ids = self._ids({'search': 'red'})
+
+        self.assertEqual(ids, [self.mustang.id, self.coupe.id])
+
+    def test_search_with_filters_and_pages(self):
+        """Test search combines with filters and pages in rank order."""
+        tag = Tag.objects.create(user=self.user, name='classic')
+        self.mustang.tags.add(tag)
+        self.truck.tags.add(tag)
+
+        self.assertEqual(
+            self._ids({'search': 'engine', 'tags': str(tag.id)}),
+            [self.truck.id, self.mustang.id],
+        )
+
+        res = self.client.get(VEHICLES_URL, {'search': 'red', 'page_size': 1})
+        ids = [vehicle['id'] for vehicle in res.data['results']]
+        res = self.client.get(res.data['next'])
+        ids += [vehicle['id'] for vehicle in res.data['results']]
+        self.assertEqual(ids, [self.mustang.id, self.coupe.id])
+        self.assertIsNone(res.data['next'])
+
+    def test_search_pages_tied_ranks_without_offset(self):
+        """Test equally ranked matches page by id with exact cursors."""
+        vehicles = [
+            create_vehicle(user=self.user, title=f'Zircon car {i}')
+            for i in range(5)
+        ]
+
+        ids = []
+        url = VEHICLES_URL + '?search=zircon&page_size=2'
+        while url:
+            res = self.client.get(url)
+            ids += [vehicle['id'] for vehicle in res.data['results']]
+            url = res.data['next']
+            if url:
+                cursor = parse_qs(urlparse(url).query)['cursor'][0]
+                position = parse_qs(b64decode(cursor).decode())
+                self.assertNotIn('o', position)
+
+        self.assertEqual(ids, [vehicle.id for vehicle in vehicles[::-1]])
+
+    @skipUnless(connection.vendor == 'postgresql', 'Requires PostgreSQL.')
+    def test_search_vector_maintained(self):
+        """Test the trigger keeps the stemmed search vector up to date."""
+        self.coupe.description = 'Convertible roof'
+        self.coupe.save()
+
+        self.assertEqual(
+            self._ids({'search': 'convertibles'}), [self.coupe.id])
+        self.assertEqual(self._ids({'search': 'paint'}), [])
+
+
+class VehicleFacetTests(QueryBudgetMixin, TestCase):
+    """Test range filters and facet counts of the vehicle list."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email='user@example.com', password='test123')
+        self.client.force_authenticate(self.user)
+        self.car = Tag.objects.create(user=self.user, name='car')
+        self.classic = Tag.objects.create(user=self.user, name='classic')
+        self.engine = Part.objects.create(
+            user=self.user, name='engine', price=100)
+        self.old = create_vehicle(user=self.user, year=1975, price=15000)
+        self.old.tags.add(self.car, self.classic)
+        self.old.parts.add(self.engine)
+        self.mid = create_vehicle(user=self.user, year=1999, price=8000)
+        self.mid.tags.add(self.car)
+        self.new = create_vehicle(user=self.user, year=2021, price=30000)
+        self.new.tags.add(self.car)
+
+    def _get(self, params):
+        res = self.client.get(VEHICLES_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def test_range_filters(self):
+        """Test filtering vehicles by year and price ranges."""
+        data = self._get({'year_min': 1990, 'price_max': 30000})
+
+        self.assertEqual(
+            [vehicle['id'] for vehicle in data['results']],
+            [self.new.id, self.mid.id],
+        )
+        data = self._get({'year_max': 1999, 'price_min': 10000})
+        self.assertEqual(
+            [vehicle['id'] for vehicle in data['results']], [self.old.id])
+
+    def test_invalid_range_rejected(self):
+        """Test non integer range values return 400."""
+        res = self.client.get(VEHICLES_URL, {'year_min': 'old'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('year_min', res.data)
+
+    def test_facets_of_filtered_list(self):
+        """Test facets count every vehicle matching the filters."""
+        data = self._get({'facets': 1, 'year_max': 2000, 'page_size': 1})
+
+        self.assertEqual(len(data['results']), 1)
+        self.assertEqual(data['facets'], {
+            'tags': [
+                {'id': self.car.id, 'name': 'car', 'count': 2},
+                {'id': self.classic.id, 'name': 'classic', 'count': 1},
+            ],
+            'parts': [{'id': self.engine.id, 'name': 'engine', 'count': 1}],
+            'year': [
+                {'from': 1970, 'to': 1979, 'count': 1},
+                {'from': 1990, 'to': 1999, 'count': 1},
+            ],
+            'price': [
+                {'from': 0, 'to': 9999, 'count': 1},
+                {'from': 10000, 'to': 19999, 'count': 1},
+            ],
+        })
+
+    def test_facets_single_query(self):
+        """Test facets add one query to the list and are opt-in."""
+        params = {'tags': str(self.classic.id)}
+        res = self.client.get(VEHICLES_URL, params)
+        self.assertNotIn('facets', res.data)
+        without = self.assertQueryBudget(res)
+
+        res = self.client.get(VEHICLES_URL, {**params, 'facets': 1})
+
+        self.assertEqual(res.data['facets']['tags'][0]['count'], 1)
+        self.assertEqual(self.assertQueryBudget(res), without + 1)
+
+
+class VehicleTotalCostTests(TestCase):
+    """Test total costs through the vehicle API."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email='user@example.com', password='test123')
+        self.client.force_authenticate(self.user)
+
+    def _create(self, price, parts=()):
+        res = self.client.post(VEHICLES_URL, {
+            'title': 'Vehicle', 'year': 2020, 'price': price,
+            'parts': [{'name': name, 'price': cost} for name, cost in parts],
+        }, format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        return res.data
+
+    def test_total_cost_in_responses(self):
+        """Test created and updated vehicles report their total cost."""
+        data = self._create(1000, [('engine', 300), ('tyre', 50)])
+        self.assertEqual(data['total_cost'], 1350)
+
+        res = self.client.patch(detail_url(data['id']), {
+            'price': 2000, 'parts': [{'name': 'tyre', 'price': 70}],
+        }, format='json')
+
+        self.assertEqual(res.data['total_cost'], 2050)
+
+    def test_nested_part_price_is_read_only(self):
+        """Test nested writes keep the price of a shared part."""
+        first = self._create(1000, [('engine', 300)])
+        second = self._create(2000, [('engine', 500)])
+        self.assertEqual(second['parts'][0]['price'], 300)
+
+        res = self.client.patch(detail_url(first['id']), {
+            'parts': [{'name': 'engine', 'price': 900}],
+        }, format='json')
+
+        self.assertEqual(res.data['parts'][0]['price'], 300)
+        self.assertEqual(res.data['total_cost'], 1300)
+        res = self.client.get(detail_url(second['id']))
+        self.assertEqual(res.data['total_cost'], 2300)
+
+    def test_order_and_filter_by_total_cost(self):
+        """Test ordering and filtering vehicles by total cost."""
+        cheap = self._create(1000, [('engine', 3000)])
+        mid = self._create(2000)
+        dear = self._create(5000)
+
+        res = self.client.get(VEHICLES_URL, {'ordering': 'total_cost'})
+        self.assertEqual(
+            [vehicle['id'] for vehicle in res.data['results']],
+            [mid['id'], cheap['id'], dear['id']],
+        )
+
+        res = self.client.get(VEHICLES_URL, {
+            'ordering': '-total_cost', 'total_cost_max': 4000})
+        self.assertEqual(
+            [vehicle['id'] for vehicle in res.data['results']],
+            [cheap['id'], mid['id']],
+        )
+
+        res = self.client.get(VEHICLES_URL, {'ordering': 'price'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_order_by_total_cost_pages_ties_without_offset(self):
+        """Test tied total costs page by id with exact cursors."""
+        vehicles = [
+            create_vehicle(user=self.user, price=price)
+            for price in (500, 100, 500, 500, 100)
+        ]
+        expected = sorted(
+            vehicles, key=lambda vehicle: (-vehicle.total_cost, -vehicle.id))
+
+        ids = []
+        url = VEHICLES_URL + '?ordering=-total_cost&page_size=2'
+        while url:
+            res = self.client.get(url)
+            ids += [vehicle['id'] for vehicle in res.data['results']]
+            url = res.data['next']
+            if url:
+                cursor = parse_qs(urlparse(url).query)['cursor'][0]
+                position = parse_qs(b64decode(cursor).decode())
+                self.assertNotIn('o', position)
+
+        self.assertEqual(ids, [vehicle.id for vehicle in expected])
+
+    def test_fleet_summary(self):
+        """Test the summary reports the user's fleet total."""
+        self._create(1000, [('engine', 300)])
+        self.client.post(reverse('vehicle:vehicle-bulk'), [
+            {'title': 'Bulk', 'year': 2020, 'price': 10,
+             'parts': [{'name': 'engine', 'price': 500}]},
+        ], format='json')
+
+        res = self.client.get(reverse('vehicle:vehicle-summary'))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'vehicle_count': 2, 'total_cost': 1610})
 
 
 class ImageUploadTests(TestCase):
@@ -473,3 +882,136 @@ class ImageUploadTests(TestCase):
         res = self.client.post(url, payload, format='multipart')
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class VehicleQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Test vehicle endpoints run a fixed number of queries."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email='user@example.com', password='test123')
+        self.client.force_authenticate(self.user)
+
+    def _create_vehicles(self, count):
+        """Create vehicles with their own tags and parts."""
+        vehicles = []
+        for i in range(count):
+            vehicle = create_vehicle(user=self.user, title=f'Vehicle {i}')
+            vehicle.tags.add(
+                Tag.objects.create(user=self.user, name=f'tag-{vehicle.id}'),
+                Tag.objects.create(user=self.user, name=f'extra-{vehicle.id}'),
+            )
+            vehicle.parts.add(Part.objects.create(
+                user=self.user, name=f'part-{vehicle.id}', price=i))
+            vehicles.append(vehicle)
+
+        return vehicles
+
+    def test_list_query_count_independent_of_size(self):
+        """Test listing vehicles does not run a query per vehicle."""
+        self._create_vehicles(2)
+        res = self.client.get(VEHICLES_URL)
+        small = self.assertQueryBudget(res)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self._create_vehicles(10)
+        res = self.client.get(VEHICLES_URL)
+        large = self.assertQueryBudget(res)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 12)
+        self.assertEqual(small, large)
+
+    def test_retrieve_query_budget(self):
+        """Test retrieving a vehicle loads tags and parts in bulk."""
+        vehicle = self._create_vehicles(1)[0]
+
+        res = self.client.get(detail_url(vehicle.id))
+        self.assertQueryBudget(res)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['tags']), 2)
+        self.assertEqual(len(res.data['parts']), 1)
+
+    def test_create_query_budget(self):
+        """Test creating a vehicle stays within the query budget."""
+        payload = {'title': 'Sample vehicle', 'year': 2020, 'price': 1000}
+
+        res = self.client.post(VEHICLES_URL, payload, format='json')
+        self.assertQueryBudget(res)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    def test_create_with_many_tags_and_parts(self):
+        """Test nested tags and parts are resolved in bulk."""
+        counts = []
+        for size in (2, 25):
+            payload = {
+                'title': f'Vehicle with {size} tags',
+                'year': 2020,
+                'price': 1000,
+                'tags': [{'name': f'tag-{size}-{i}'} for i in range(size)],
+                'parts': [
+                    {'name': f'part-{size}-{i}', 'price': i}
+                    for i in range(size)
+                ],
+            }
+            res = self.client.post(VEHICLES_URL, payload, format='json')
+            count = self.assertQueryBudget(res)
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(len(res.data['tags']), size)
+            self.assertEqual(len(res.data['parts']), size)
+            counts.append(count)
+
+        self.assertEqual(counts[0], counts[1])
+
+    def test_partial_update_query_budget(self):
+        """Test updating a vehicle stays within the query budget."""
+        vehicle = self._create_vehicles(1)[0]
+        payload = {'title': 'New title'}
+
+        res = self.client.patch(detail_url(vehicle.id), payload, format='json')
+        self.assertQueryBudget(res)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['tags']), 2)
+
+    def test_update_writes_only_changed_through_rows(self):
+        """Test replacing one of many parts rewrites a single row."""
+        vehicle = create_vehicle(user=self.user)
+        parts = [
+            Part.objects.create(user=self.user, name=f'part-{i}', price=i)
+            for i in range(50)
+        ]
+        vehicle.parts.add(*parts)
+        through = Vehicle.parts.through
+        rows = through.objects.filter(vehicle=vehicle)
+        before = set(rows.values_list('id', flat=True))
+        payload = {
+            'parts': [{'name': p.name, 'price': p.price} for p in parts[1:]]
+            + [{'name': 'new-part', 'price': 1}],
+        }
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.patch(
+                detail_url(vehicle.id), payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        after = set(rows.values_list('id', flat=True))
+        self.assertEqual(len(before - after), 1)
+        self.assertEqual(len(after - before), 1)
+        writes = [
+            q['sql'] for q in ctx.captured_queries
+            if through._meta.db_table in q['sql']
+            and q['sql'].startswith(('INSERT', 'DELETE'))
+        ]
+        self.assertEqual(len(writes), 2)
+
+    def test_destroy_query_budget(self):
+        """Test deleting a vehicle skips loading tags and parts."""
+        vehicle = self._create_vehicles(1)[0]
+
+        res = self.client.delete(detail_url(vehicle.id))
+        self.assertQueryBudget(res)
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
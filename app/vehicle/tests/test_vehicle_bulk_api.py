@@ -0,0 +1,199 @@
+"""
+Tests for the bulk vehicle API.
+"""
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Vehicle,
+    Tag,
+    Part,
+)
+
+
+BULK_URL = reverse('vehicle:vehicle-bulk')
+
+
+def create_user(email='user@example.com', password='test123'):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def create_vehicle(user, **params):
+    """Create and return a sample vehicle."""
+    defaults = {'title': 'Sample vehicle', 'year': 2020, 'price': 1000}
+    defaults.update(params)
+
+    return Vehicle.objects.create(user=user, **defaults)
+
+
+def vehicle_payload(index, tags=(), parts=()):
+    """Return a vehicle payload with the given tag and part names."""
+    return {
+        'title': f'Vehicle {index}',
+        'year': 2000 + index,
+        'price': 1000 * index,
+        'tags': [{'name': name} for name in tags],
+        'parts': [{'name': name, 'price': 100} for name in parts],
+    }
+
+
+class PublicBulkVehicleApiTests(TestCase):
+    """Test unauthenticated bulk API requests."""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_auth_required(self):
+        """Test auth is required for bulk requests."""
+        res = self.client.post(BULK_URL, [], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateBulkVehicleApiTests(TestCase):
+    """Test authenticated bulk API requests."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+
+    def test_bulk_create(self):
+        """Test creating vehicles with shared tags and parts."""
+        payload = [
+            vehicle_payload(1, tags=['car', 'classic'], parts=['exhaust']),
+            vehicle_payload(2, tags=['car'], parts=['exhaust', 'wheels']),
+            vehicle_payload(3),
+        ]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [item['title'] for item in res.data],
+            ['Vehicle 1', 'Vehicle 2', 'Vehicle 3'],
+        )
+        self.assertEqual(Vehicle.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(Part.objects.filter(user=self.user).count(), 2)
+        vehicle = Vehicle.objects.get(id=res.data[1]['id'])
+        self.assertEqual(
+            sorted(vehicle.parts.values_list('name', flat=True)),
+            ['exhaust', 'wheels'],
+        )
+        self.assertEqual(vehicle.user, self.user)
+
+    def test_bulk_create_query_count_independent_of_size(self):
+        """Test bulk creation runs the same queries for any batch size."""
+        counts = []
+        for size in (3, 30):
+            payload = [
+                vehicle_payload(i, tags=[f'tag-{size}-{i}'], parts=['shared'])
+                for i in range(size)
+            ]
+            with CaptureQueriesContext(connection) as ctx:
+                res = self.client.post(BULK_URL, payload, format='json')
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+            counts.append(len(ctx))
+
+        if connection.features.can_return_rows_from_bulk_insert:
+            self.assertEqual(counts[0], counts[1])
+        self.assertEqual(Vehicle.objects.filter(user=self.user).count(), 33)
+
+    def test_bulk_create_invalid_item_writes_nothing(self):
+        """Test one invalid item rejects the batch with per item errors."""
+        payload = [vehicle_payload(1, tags=['car']), {'title': 'No year'}]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn('year', res.data[1])
+        self.assertFalse(Vehicle.objects.filter(user=self.user).exists())
+        self.assertFalse(Tag.objects.filter(user=self.user).exists())
+
+    def test_bulk_requires_list(self):
+        """Test the bulk endpoint rejects a single object."""
+        res = self.client.post(BULK_URL, vehicle_payload(1), format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_rejects_too_many_items(self):
+        """Test the bulk endpoint limits the batch size."""
+        payload = [{'id': i} for i in range(1001)]
+
+        res = self.client.patch(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_update(self):
+        """Test updating fields, tags and parts of many vehicles."""
+        tag_old = Tag.objects.create(user=self.user, name='old')
+        tag_kept = Tag.objects.create(user=self.user, name='kept')
+        part = Part.objects.create(user=self.user, name='engine', price=100)
+        v1 = create_vehicle(self.user, title='First')
+        v1.tags.add(tag_old, tag_kept)
+        v2 = create_vehicle(self.user, title='Second')
+        v2.parts.add(part)
+        payload = [
+            {'id': v1.id, 'tags': [{'name': 'kept'}, {'name': 'new'}]},
+            {'id': v2.id, 'title': 'Renamed', 'parts': []},
+        ]
+
+        res = self.client.patch(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['id'] for item in res.data], [v1.id, v2.id])
+        v1.refresh_from_db()
+        v2.refresh_from_db()
+        self.assertEqual(v1.title, 'First')
+        self.assertEqual(
+            sorted(v1.tags.values_list('name', flat=True)), ['kept', 'new'])
+        self.assertEqual(v2.title, 'Renamed')
+        self.assertEqual(v2.parts.count(), 0)
+
+    def test_bulk_update_unknown_vehicle(self):
+        """Test updating another user's vehicle reports an error."""
+        other_vehicle = create_vehicle(create_user(email='other@example.com'))
+        vehicle = create_vehicle(self.user)
+        payload = [
+            {'id': vehicle.id, 'title': 'Changed'},
+            {'id': other_vehicle.id, 'title': 'Hijacked'},
+            {'title': 'Missing id'},
+        ]
+
+        res = self.client.patch(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn('id', res.data[1])
+        self.assertIn('id', res.data[2])
+        vehicle.refresh_from_db()
+        other_vehicle.refresh_from_db()
+        self.assertEqual(vehicle.title, 'Sample vehicle')
+        self.assertEqual(other_vehicle.title, 'Sample vehicle')
+
+    def test_bulk_delete(self):
+        """Test deleting many vehicles reports the result of each."""
+        other_vehicle = create_vehicle(create_user(email='other@example.com'))
+        v1 = create_vehicle(self.user)
+        v2 = create_vehicle(self.user)
+
+        res = self.client.delete(
+            BULK_URL, [v1.id, v2.id, other_vehicle.id], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [
+            {'id': v1.id, 'deleted': True},
+            {'id': v2.id, 'deleted': True},
+            {'id': other_vehicle.id, 'deleted': False},
+        ])
+        self.assertFalse(Vehicle.objects.filter(user=self.user).exists())
+        self.assertTrue(Vehicle.objects.filter(id=other_vehicle.id).exists())
@@ -0,0 +1,158 @@
+"""
+Tests for the vehicle export API.
+"""
+import csv
+import io
+import json
+import tracemalloc
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Vehicle,
+    Tag,
+    Part,
+)
+
+
+EXPORT_URL = reverse('vehicle:vehicle-export')
+
+
+def create_user(email='user@example.com', password='test123'):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def create_vehicles(user, count):
+    """Create count sample vehicles."""
+    Vehicle.objects.bulk_create(
+        Vehicle(user=user, title=f'Vehicle {index}', year=2000, price=index)
+        for index in range(count)
+    )
+
+
+class PublicExportApiTests(TestCase):
+    """Test unauthenticated export requests."""
+
+    def test_auth_required(self):
+        """Test auth is required to export vehicles."""
+        res = APIClient().get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateExportApiTests(TestCase):
+    """Test authenticated export requests."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+        self.car = Vehicle.objects.create(
+            user=self.user, title='Car', year=2010, price=5000,
+            link='https://example.com/car',
+        )
+        self.truck = Vehicle.objects.create(
+            user=self.user, title='Truck, "big"', year=2015, price=9000,
+        )
+        self.tag = Tag.objects.create(user=self.user, name='Classic')
+        self.part = Part.objects.create(user=self.user, name='Tyre', price=90)
+        self.car.tags.add(self.tag)
+        self.car.parts.add(self.part)
+
+    def _export(self, **params):
+        res = self.client.get(EXPORT_URL, params)
+        return res, b''.join(res.streaming_content).decode()
+
+    def test_export_ndjson(self):
+        """Test exporting vehicles with tags and parts as NDJSON."""
+        other = create_user(email='other@example.com')
+        create_vehicles(other, 1)
+
+        res, content = self._export()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(rows, [
+            {
+                'id': self.truck.id, 'title': 'Truck, "big"',
+                'description': '', 'year': 2015, 'price': 9000,
+                'total_cost': 9000, 'link': '',
+                'tags': [], 'parts': [],
+            },
+            {
+                'id': self.car.id, 'title': 'Car', 'description': '',
+                'year': 2010, 'price': 5000, 'total_cost': 5090,
+                'link': 'https://example.com/car',
+                'tags': [{'id': self.tag.id, 'name': 'Classic'}],
+                'parts': [{'id': self.part.id, 'name': 'Tyre', 'price': 90}],
+            },
+        ])
+
+    def test_export_csv(self):
+        """Test exporting vehicles as CSV."""
+        res, content = self._export(output='csv')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'text/csv')
+        self.assertIn('vehicles.csv', res['Content-Disposition'])
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]['title'], 'Truck, "big"')
+        self.assertEqual(rows[1]['id'], str(self.car.id))
+        self.assertEqual(json.loads(rows[1]['tags']), ['Classic'])
+        self.assertEqual(
+            json.loads(rows[1]['parts']), [{'name': 'Tyre', 'price': 90}])
+
+    def test_export_filtered(self):
+        """Test the export applies the list filters."""
+        res, content = self._export(tags=str(self.tag.id))
+
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([row['id'] for row in rows], [self.car.id])
+
+    def test_export_invalid_output(self):
+        """Test an unknown output format is rejected."""
+        res = self.client.get(EXPORT_URL, {'output': 'xml'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @patch('vehicle.export.CHUNK_SIZE', 10)
+    def test_export_queries_per_chunk(self):
+        """Test tags and parts are fetched once per chunk of vehicles."""
+        create_vehicles(self.user, 28)
+
+        res = self.client.get(EXPORT_URL)
+        with CaptureQueriesContext(connection) as queries:
+            content = b''.join(res.streaming_content)
+
+        self.assertEqual(len(content.splitlines()), 30)
+        self.assertEqual(len(queries), 1 + 3 * 2)
+
+    @patch('vehicle.export.CHUNK_SIZE', 50)
+    def test_export_memory_is_flat(self):
+        """Test memory use does not grow with the number of vehicles."""
+        peaks = []
+        for count in (100, 1000):
+            Vehicle.objects.all().delete()
+            create_vehicles(self.user, count)
+            res = self.client.get(EXPORT_URL)
+
+            tracemalloc.start()
+            try:
+                for _ in res.streaming_content:
+                    pass
+                peaks.append(tracemalloc.get_traced_memory()[1])
+            finally:
+                tracemalloc.stop()
+
+        self.assertLess(peaks[1], peaks[0] * 2, peaks)
@@ -0,0 +1,98 @@
+"""
+Memory bounded handling of vehicle image uploads.
+
+Request bodies are streamed in chunks to a temporary file and rejected as
+soon as they exceed the configured size, before anything is buffered.
+Images are validated from their header only, the full decode is left to
+the background processing in vehicle.images.
+"""
+from PIL import Image
+
+from django.conf import settings
+from django.core.exceptions import RequestDataTooBig
+from django.core.files.uploadhandler import FileUploadHandler
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import (
+    exceptions,
+    serializers,
+    status,
+)
+
+
+DEFAULTS = {
+    'MAX_SIZE': 25 * 1024 * 1024,
+    'MAX_PIXELS': 40_000_000,
+    'FORMATS': ('JPEG', 'PNG', 'WEBP'),
+}
+
+
+def get_options():
+    """Return the VEHICLE_IMAGE_UPLOAD settings with defaults."""
+    return {**DEFAULTS, **getattr(settings, 'VEHICLE_IMAGE_UPLOAD', {})}
+
+
+class UploadTooLarge(exceptions.APIException, RequestDataTooBig):
+    """The request body exceeds the maximum upload size.
+
+    Rendered as 413 by the API and as 400 by plain Django views.
+    """
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = _('Upload exceeds the maximum allowed size.')
+    default_code = 'upload_too_large'
+
+
+class LimitedUploadHandler(FileUploadHandler):
+    """Abort uploads larger than the configured MAX_SIZE.
+
+    Must come before the handler which stores the data.
+    """
+
+    def handle_raw_input(self, input_data, META, content_length, boundary,
+                         encoding=None):
+        self.max_size = get_options()['MAX_SIZE']
+        self.received = 0
+        if content_length > self.max_size:
+            raise UploadTooLarge()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.max_size:
+            raise UploadTooLarge()
+        return raw_data
+
+    def file_complete(self, file_size):
+        return None
+
+
+class ImageHeaderField(serializers.ImageField):
+    """Image field validating format and dimensions from the header.
+
+    Unlike ImageField it never decodes the pixel data.
+    """
+    default_error_messages = {
+        'invalid_format': _(
+            'Unsupported image format, use one of: {formats}.'),
+        'too_many_pixels': _(
+            'Image is too large, at most {max_pixels} pixels are allowed.'),
+    }
+
+    def to_internal_value(self, data):
+        file_object = serializers.FileField.to_internal_value(self, data)
+        options = get_options()
+        try:
+            # Image.open only parses the header, pixels load lazily.
+            with Image.open(file_object) as image:
+                image_format = image.format
+                width, height = image.size
+        except Exception:
+            self.fail('invalid_image')
+        finally:
+            file_object.seek(0)
+
+        if image_format not in options['FORMATS']:
+            self.fail('invalid_format', formats=', '.join(options['FORMATS']))
+        if width * height > options['MAX_PIXELS']:
+            self.fail('too_many_pixels', max_pixels=options['MAX_PIXELS'])
+
+        return file_object
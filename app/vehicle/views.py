@@ -8,66 +8,248 @@ from drf_spectacular.utils import (
     OpenApiTypes,
 )
 
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.db.models import (
+    Count,
+    Exists,
+    OuterRef,
+    Prefetch,
+    Subquery,
+)
+from django.db.models.functions import Coalesce
+
 from rest_framework import (
     viewsets,
     mixins,
     status,
 )
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 
 from core.models import (
+    FleetTotal,
     Vehicle,
     Tag,
     Part,
 )
+from core.signals import deferred_fleet_totals
+from user.authentication import CachedTokenAuthentication
 from vehicle import serializers
+from vehicle.autocomplete import (
+    get_autocomplete_cache,
+    get_options,
+    match_names,
+)
+from vehicle.cache import (
+    CachedResponseMixin,
+    get_user_version,
+)
+from vehicle.export import FORMATS as EXPORT_FORMATS
+from vehicle.facets import facet_counts
+from vehicle.images import (
+    release_file,
+    schedule_image_processing,
+)
+from vehicle.pagination import VehicleCursorPagination
+from vehicle.rows import (
+    serialize_rows,
+    vehicle_rows,
+)
+from vehicle.search import search_vehicles
+
+
+RANGE_FILTERS = {
+    'year_min': 'year__gte',
+    'year_max': 'year__lte',
+    'price_min': 'price__gte',
+    'price_max': 'price__lte',
+    'total_cost_min': 'total_cost__gte',
+    'total_cost_max': 'total_cost__lte',
+}
+
+# Tags and parts in the order vehicle.rows lists them.
+RELATED_PREFETCHES = (
+    Prefetch('tags', queryset=Tag.objects.order_by('id')),
+    Prefetch('parts', queryset=Part.objects.order_by('id')),
+)
+
+ORDERINGS = {
+    'total_cost': ('cost_position',),
+    '-total_cost': ('-cost_position',),
+}
+
+FILTER_PARAMETERS = [
+    OpenApiParameter(
+        'search',
+        OpenApiTypes.STR,
+        description=(
+            'Keywords to find in the title or description, best matches '
+            'first.'
+        ),
+    ),
+    OpenApiParameter(
+        'tags',
+        OpenApiTypes.STR,
+        description='Comma separated list of tag IDs to filter',
+    ),
+    OpenApiParameter(
+        'parts',
+        OpenApiTypes.STR,
+        description='Comma separated list of part IDs to filter',
+    ),
+    OpenApiParameter(
+        'match',
+        OpenApiTypes.STR, enum=['any', 'all'],
+        description=(
+            'Return vehicles having any (default) or all of the '
+            'given tags and parts.'
+        ),
+    ),
+    OpenApiParameter(
+        'year_min', OpenApiTypes.INT, description='Lowest year, inclusive.'),
+    OpenApiParameter(
+        'year_max', OpenApiTypes.INT, description='Highest year, inclusive.'),
+    OpenApiParameter(
+        'price_min', OpenApiTypes.INT, description='Lowest price, inclusive.'),
+    OpenApiParameter(
+        'price_max', OpenApiTypes.INT,
+        description='Highest price, inclusive.'),
+    OpenApiParameter(
+        'total_cost_min', OpenApiTypes.INT,
+        description='Lowest price including parts, inclusive.'),
+    OpenApiParameter(
+        'total_cost_max', OpenApiTypes.INT,
+        description='Highest price including parts, inclusive.'),
+    OpenApiParameter(
+        'ordering',
+        OpenApiTypes.STR, enum=list(ORDERINGS),
+        description='Order by total cost instead of newest first.',
+    ),
+]
 
 
 @extend_schema_view(
     list=extend_schema(
-        parameters=[
-            OpenApiParameter(
-                'tags',
-                OpenApiTypes.STR,
-                description='Comma separated list of tag IDs to filter',
-            ),
+        parameters=FILTER_PARAMETERS + [
             OpenApiParameter(
-                'parts',
-                OpenApiTypes.STR,
-                description='Comma separated list of part IDs to filter',
+                'facets',
+                OpenApiTypes.INT, enum=[0, 1],
+                description=(
+                    'Add counts per tag and part and year and price '
+                    'histograms of all matching vehicles.'
+                ),
             ),
         ]
     )
 )
-class VehicleViewSet(viewsets.ModelViewSet):
+class VehicleViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     """View set for manage vehicle APIs"""
     serializer_class = serializers.VehicleDetailSerializer
     queryset = Vehicle.objects.all()
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
+    pagination_class = VehicleCursorPagination
+    bulk_max_items = 1000
+    # Queries per action of an authenticated request, whatever the number
+    # of vehicles, tags and parts, see core.testing. Export runs two more
+    # per chunk after the first, bulk one more per created vehicle where
+    # bulk inserts cannot return ids. An update replacing tags and parts
+    # loads the vehicle with its tags and parts (3), gets or creates the
+    # tags (3), unlinks and links them (3), gets or creates the parts (3),
+    # removes the unlinked ones from the totals and unlinks them (3),
+    # links the others and adds them to the totals (4), locks the price,
+    # saves the vehicle and fleet and reloads the total (4) and reads the
+    # tags and parts for the response, whose prefetched relations DRF
+    # drops after saving (2).
+    query_budgets = {
+        'list': 4,
+        'retrieve': 3,
+        'create': 17,
+        'update': 25,
+        'partial_update': 25,
+        'destroy': 5,
+        'bulk': 21,
+        'export': 3,
+        'summary': 1,
+        'upload_image': 2,
+    }
 
     def _params_to_ints(self, qs):
         """Convert a list of strings to integers."""
         return [int(str_id) for str_id in qs.split(',')]
 
+    def _filter_related(self, queryset, field, ids, match):
+        """Filter vehicles linked to any or all of ids through field.
+
+        Uses a correlated EXISTS for any and a grouped semi-join for all,
+        so the vehicle rows are never multiplied and need no DISTINCT.
+        """
+        through = getattr(Vehicle, field).through
+        column = f'{getattr(Vehicle, field).field.m2m_reverse_field_name()}_id'
+        links = through.objects.filter(**{f'{column}__in': ids})
+        if match == 'all':
+            return queryset.filter(id__in=links.values('vehicle_id').annotate(
+                matched=Count(column),
+            ).filter(matched=len(set(ids))).values('vehicle_id'))
+
+        return queryset.filter(Exists(links.filter(vehicle_id=OuterRef('pk'))))
+
+    def _range_filters(self):
+        """Return lookups for the year and price range parameters."""
+        lookups = {}
+        for param, lookup in RANGE_FILTERS.items():
+            value = self.request.query_params.get(param)
+            if not value:
+                continue
+            try:
+                lookups[lookup] = int(value)
+            except ValueError:
+                raise ValidationError(
+                    {param: ['A valid integer is required.']})
+
+        return lookups
+
     def get_queryset(self):
         """Retrieves vehicles for authenticated user."""
         tags = self.request.query_params.get('tags')
         parts = self.request.query_params.get('parts')
+        match = self.request.query_params.get('match', 'any')
+        if match not in ('any', 'all'):
+            raise ValidationError({'match': ['Must be "any" or "all".']})
+
         queryset = self.queryset
         if tags:
             tag_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
+            queryset = self._filter_related(queryset, 'tags', tag_ids, match)
         if parts:
             part_ids = self._params_to_ints(parts)
-            queryset = queryset.filter(parts__id__in=part_ids)
+            queryset = self._filter_related(
+                queryset, 'parts', part_ids, match)
 
-        return queryset.filter(
-            user=self.request.user
-        ).order_by('-id').distinct()
+        queryset = queryset.filter(
+            user=self.request.user,
+            **self._range_filters(),
+        )
+        search = self.request.query_params.get('search', '').strip()
+        ordering = self.request.query_params.get('ordering')
+        if ordering and ordering not in ORDERINGS:
+            raise ValidationError(
+                {'ordering': [f'Must be one of: {", ".join(ORDERINGS)}.']})
+        if search:
+            queryset = search_vehicles(queryset, search).order_by(
+                '-position')
+        else:
+            queryset = queryset.order_by('-id')
+        if ordering:
+            queryset = queryset.with_cost_position().order_by(
+                *ORDERINGS[ordering])
+        if self.action in ('list', 'destroy', 'upload_image', 'export'):
+            return queryset
+
+        return queryset.prefetch_related(*RELATED_PREFETCHES)
 
     def get_serializer_class(self):
         """Retrieves the vehicle class for request."""
@@ -82,14 +264,192 @@ class VehicleViewSet(viewsets.ModelViewSet):
         """Create a new vehicle."""
         serializer.save(user=self.request.user)
 
+    def list(self, request, *args, **kwargs):
+        """List vehicles through the response cache."""
+        return self.cached_response(self._list_rows, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        """Retrieve a vehicle through the response cache."""
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs)
+
+    def _list_rows(self, request, *args, **kwargs):
+        """List vehicles serialized from values() rows, see vehicle.rows."""
+        rows = vehicle_rows(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is None:
+            return Response(serialize_rows(rows))
+
+        return self.get_paginated_response(serialize_rows(page))
+
+    def get_paginated_response(self, data):
+        """Add facet counts of the whole filtered list when requested."""
+        response = super().get_paginated_response(data)
+        if self.request.query_params.get('facets') in ('1', 'true'):
+            response.data['facets'] = facet_counts(
+                self.filter_queryset(self.get_queryset()))
+
+        return response
+
+    def _bulk_instances(self, items):
+        """Return vehicles referenced by items and errors for each item."""
+        ids = [
+            item.get('id') if isinstance(item, dict) else None
+            for item in items
+        ]
+        vehicles = self.get_queryset().in_bulk(
+            [vehicle_id for vehicle_id in ids if isinstance(vehicle_id, int)]
+        )
+        errors = []
+        for vehicle_id in ids:
+            if vehicle_id is None:
+                errors.append({'id': ['This field is required.']})
+            elif vehicle_id not in vehicles:
+                errors.append({'id': ['Vehicle not found.']})
+            else:
+                errors.append({})
+
+        return [vehicles.get(vehicle_id) for vehicle_id in ids], errors
+
+    def _bulk_response(self, vehicles, status_code):
+        """Serialize vehicles with their tags and parts prefetched."""
+        ids = [vehicle.id for vehicle in vehicles]
+        loaded = self.queryset.filter(
+            user=self.request.user,
+        ).prefetch_related(*RELATED_PREFETCHES).in_bulk(ids)
+        serializer = self.get_serializer(
+            [loaded[vehicle_id] for vehicle_id in ids],
+            many=True,
+        )
+
+        return Response(serializer.data, status=status_code)
+
+    def _bulk_destroy(self, ids):
+        """Delete vehicles by id and report which ones were deleted."""
+        if not all(isinstance(vehicle_id, int) for vehicle_id in ids):
+            return Response(
+                {'non_field_errors': ['Expected a list of vehicle IDs.']},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        queryset = self.queryset.filter(user=self.request.user, id__in=ids)
+        with transaction.atomic(), deferred_fleet_totals():
+            deleted = set(queryset.values_list('id', flat=True))
+            queryset.delete()
+
+        return Response(
+            [
+                {'id': vehicle_id, 'deleted': vehicle_id in deleted}
+                for vehicle_id in ids
+            ],
+            status=status.HTTP_200_OK,
+        )
+
+    @extend_schema(
+        request=serializers.VehicleDetailSerializer(many=True),
+        responses=serializers.VehicleDetailSerializer(many=True),
+    )
+    @action(methods=['POST', 'PATCH', 'DELETE'], detail=False, url_path='bulk')
+    def bulk(self, request):
+        """Create, update or delete many vehicles in one transaction.
+
+        POST takes a list of vehicles, PATCH a list of partial vehicles
+        with their `id` and DELETE a list of vehicle IDs. Nothing is
+        written unless every item is valid.
+        """
+        items = request.data
+        if not isinstance(items, list):
+            return Response(
+                {'non_field_errors': ['Expected a list of items.']},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(items) > self.bulk_max_items:
+            return Response(
+                {'non_field_errors': [
+                    f'Ensure there are no more than {self.bulk_max_items} '
+                    'items.'
+                ]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if request.method == 'DELETE':
+            return self._bulk_destroy(items)
+
+        with transaction.atomic():
+            if request.method == 'POST':
+                serializer = self.get_serializer(data=items, many=True)
+                save_kwargs = {'user': request.user}
+                status_code = status.HTTP_201_CREATED
+            else:
+                instances, errors = self._bulk_instances(items)
+                if any(errors):
+                    return Response(
+                        errors, status=status.HTTP_400_BAD_REQUEST)
+                serializer = self.get_serializer(
+                    instances, data=items, many=True, partial=True)
+                save_kwargs = {}
+                status_code = status.HTTP_200_OK
+
+            if not serializer.is_valid():
+                return Response(
+                    serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            vehicles = serializer.save(**save_kwargs)
+
+        return self._bulk_response(vehicles, status_code)
+
+    @extend_schema(
+        parameters=FILTER_PARAMETERS + [
+            OpenApiParameter(
+                'output',
+                OpenApiTypes.STR, enum=[*EXPORT_FORMATS],
+                description='Export as NDJSON (default) or CSV.',
+            ),
+        ],
+        responses={200: OpenApiTypes.STR},
+    )
+    @action(methods=['GET'], detail=False, url_path='export')
+    def export(self, request):
+        """Stream all vehicles of the user with their tags and parts."""
+        output = request.query_params.get('output', 'ndjson')
+        if output not in EXPORT_FORMATS:
+            raise ValidationError(
+                {'output': [f'Must be one of: {", ".join(EXPORT_FORMATS)}.']})
+
+        content_type, stream = EXPORT_FORMATS[output]
+        response = StreamingHttpResponse(
+            stream(self.filter_queryset(self.get_queryset())),
+            content_type=content_type,
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="vehicles.{output}"')
+        return response
+
+    @extend_schema(responses=serializers.FleetTotalSerializer)
+    @action(methods=['GET'], detail=False, url_path='summary')
+    def summary(self, request):
+        """Return the number and total cost of the user's vehicles."""
+        fleet = FleetTotal.objects.filter(user=request.user).first()
+        if fleet is None:
+            fleet = FleetTotal.objects.recompute(request.user.pk)
+
+        return Response(serializers.FleetTotalSerializer(fleet).data)
+
     @action(methods=['POST'], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):
-        """Upload an image to vehicle."""
+        """Upload an image to vehicle.
+
+        The image is stored as uploaded and processed in the background,
+        progress is reported by the image_status field.
+        """
         vehicle = self.get_object()
+        previous = vehicle.image.name
         serializer = self.get_serializer(vehicle, data=request.data)
 
         if serializer.is_valid():
-            serializer.save()
+            vehicle = serializer.save(image_status=Vehicle.ImageStatus.PENDING)
+            if previous:
+                release_file(vehicle.image.storage, previous)
+            schedule_image_processing(vehicle)
             return Response(serializer.data, status=status.HTTP_200_OK)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -103,38 +463,123 @@ class VehicleViewSet(viewsets.ModelViewSet):
                 OpenApiTypes.INT, enum=[0, 1],
                 description='Filter by items assigned to vehicles.',
             ),
+            OpenApiParameter(
+                'vehicle_count',
+                OpenApiTypes.INT, enum=[0, 1],
+                description='Include the number of vehicles using each item.',
+            ),
         ]
-    )
+    ),
+    autocomplete=extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'q', OpenApiTypes.STR,
+                description='Case insensitive start of the name.',
+            ),
+            OpenApiParameter(
+                'limit', OpenApiTypes.INT,
+                description='Maximum number of matches, 10 by default.',
+            ),
+            OpenApiParameter(
+                'similar',
+                OpenApiTypes.INT, enum=[0, 1],
+                description='Include names similar to q.',
+            ),
+        ]
+    ),
 )
-class BaseVehicleAttrViewSet(mixins.DestroyModelMixin,
+class BaseVehicleAttrViewSet(CachedResponseMixin,
+                             mixins.DestroyModelMixin,
                              mixins.UpdateModelMixin,
                              mixins.ListModelMixin,
                              viewsets.GenericViewSet):
-    """Base viewset for vehicle attributes."""
-    authentication_classes = [TokenAuthentication]
+    """Base viewset for vehicle attributes.
+
+    Subclasses set links to the through model linking the attribute to
+    vehicles and link_field to its column referencing the attribute.
+    """
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
+    links = None
+    link_field = None
+
+    def _flag(self, name):
+        """Return the 0 or 1 query parameter name as a bool."""
+        try:
+            return bool(int(self.request.query_params.get(name, 0)))
+        except ValueError:
+            raise ValidationError({name: ['Must be 0 or 1.']})
 
     def get_queryset(self):
         """Filter queryset to authenticated user."""
-        assigned_only = bool(
-            int(self.request.query_params.get('assigned_only', 0))
-        )
-        queryset = self.queryset
-        if assigned_only:
-            queryset = queryset.filter(vehicle__isnull=False)
+        queryset = self.queryset.filter(user=self.request.user)
+        links = self.links.objects.filter(**{self.link_field: OuterRef('pk')})
+        if self._flag('assigned_only'):
+            queryset = queryset.filter(Exists(links))
+        if self.action == 'list' and self._flag('vehicle_count'):
+            queryset = queryset.annotate(vehicle_count=Coalesce(Subquery(
+                links.order_by().values(self.link_field).annotate(
+                    count=Count('*'),
+                ).values('count'),
+            ), 0))
+
+        return queryset.order_by('-name')
+
+    @action(methods=['GET'], detail=False, url_path='autocomplete')
+    def autocomplete(self, request):
+        """List the items of the user whose name starts with q."""
+        options = get_options()
+        text = request.query_params.get('q', '').strip()
+        try:
+            limit = int(request.query_params.get('limit', options['LIMIT']))
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= options['MAX_LIMIT']:
+            raise ValidationError({'limit': [
+                f'Must be between 1 and {options["MAX_LIMIT"]}.']})
+        similar = self._flag('similar')
+        if not text:
+            return Response([])
+
+        user_id = request.user.id
+        version = get_user_version(user_id)
+        key = (self.queryset.model._meta.label, text.upper(), limit, similar)
+        autocomplete_cache = get_autocomplete_cache()
+        data = autocomplete_cache.get(user_id, version, key)
+        if data is None:
+            matches = match_names(
+                self.queryset.filter(user=request.user), text, limit, similar)
+            data = list(self.get_serializer(matches, many=True).data)
+            autocomplete_cache.set(user_id, version, key, data)
 
-        return queryset.filter(
-            user=self.request.user
-        ).order_by('-name').distinct()
+        return Response(data)
 
 
 class TagViewSet(BaseVehicleAttrViewSet):
     """Manage tags in the database."""
     serializer_class = serializers.TagSerializer
     queryset = Tag.objects.all()
+    links = Vehicle.tags.through
+    link_field = 'tag_id'
+    query_budgets = {
+        'list': 1,
+        'update': 3,
+        'partial_update': 3,
+        'destroy': 3,
+        'autocomplete': 1,
+    }
 
 
 class PartViewSet(BaseVehicleAttrViewSet):
     """Manage parts in the database."""
     serializer_class = serializers.PartSerializer
     queryset = Part.objects.all()
+    links = Vehicle.parts.through
+    link_field = 'part_id'
+    query_budgets = {
+        'list': 1,
+        'update': 6,
+        'partial_update': 6,
+        'destroy': 5,
+        'autocomplete': 1,
+    }